@@ -0,0 +1,275 @@
+"""batched.py contains a level synchronous version of the expectiminimax search
+
+Instead of recursing node by node, the tree is expanded one ply at a time into
+NumPy arrays of bitboards: player levels hold boards before a move, chance
+levels hold the afterstates waiting for a tile. All leaves of a level are
+scored with one evaluate_boards call and values are backed up from the
+deepest level with array operations.
+
+Node values are combined in exactly the same order and with the same
+arithmetic as the recursive search, so every root move gets the same score.
+The transposition table of the context is not used.
+"""
+import time
+import numpy as np
+from algorithms.expectiminimax import (score_root_moves, spawn_probabilities,
+                                       SearchTimeout, UP, DOWN, LEFT, RIGHT)
+from batch_evaluation import evaluate_boards, unpack_bitboards, game_over_mask
+from bitboard import ROW_LEFT, ROW_RIGHT, move
+
+ENGINE_RECURSIVE = "recursive"
+ENGINE_BATCHED = "batched"
+
+_ROW_LEFT = np.array(ROW_LEFT, dtype=np.uint64)
+_ROW_RIGHT = np.array(ROW_RIGHT, dtype=np.uint64)
+_ROW_MASK = np.uint64(0xFFFF)
+_NIBBLE_MASK = np.uint64(0xF)
+_DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
+
+
+def _u64(value):
+    """NumPy uint64 constant"""
+    return np.uint64(value)
+
+
+def transpose_boards(bits):
+    """Swap rows and columns of every board, see bitboard.transpose"""
+    a1 = bits & _u64(0xF0F00F0FF0F00F0F)
+    a2 = bits & _u64(0x0000F0F00000F0F0)
+    a3 = bits & _u64(0x0F0F00000F0F0000)
+    bits = a1 | (a2 << _u64(12)) | (a3 >> _u64(12))
+    b1 = bits & _u64(0xFF00FF0000FF00FF)
+    b2 = bits & _u64(0x00FF00FF00000000)
+    b3 = bits & _u64(0x00000000FF00FF00)
+    return b1 | (b2 >> _u64(24)) | (b3 << _u64(24))
+
+
+def _move_rows(bits, table):
+    """Look up the four rows of every board in a move table"""
+    new_bits = np.zeros_like(bits)
+    for shift in (0, 16, 32, 48):
+        row = (bits >> _u64(shift)) & _ROW_MASK
+        new_bits |= table[row.astype(np.intp)] << _u64(shift)
+    return new_bits
+
+
+def move_boards(bits, direction):
+    """
+    Move every board of a uint64 array in the direction given
+    Returns: uint64 array of new boards, a board did not move if it is unchanged
+    """
+    if direction == LEFT:
+        return _move_rows(bits, _ROW_LEFT)
+    if direction == RIGHT:
+        return _move_rows(bits, _ROW_RIGHT)
+    if direction == UP:
+        return transpose_boards(_move_rows(transpose_boards(bits), _ROW_LEFT))
+    if direction == DOWN:
+        return transpose_boards(_move_rows(transpose_boards(bits), _ROW_RIGHT))
+    return bits.copy()
+
+
+def _empty_mask(bits):
+    """(N, 16) bool array of the empty cells, in nibble order"""
+    shifts = np.arange(0, 64, 4, dtype=np.uint64)
+    return ((bits[:, None] >> shifts) & _NIBBLE_MASK) == 0
+
+
+def _evaluate_leaves(bits, context):
+    """Score a batch of boards with the evaluator of the context"""
+    if context.evaluator is not None:
+        return np.array([context.evaluator(int(board)) for board in bits],
+                        dtype=np.float64)
+    return evaluate_boards(unpack_bitboards(bits))
+
+
+class _Level:  # pylint: disable=too-few-public-methods
+    """
+    One ply of the tree.
+    Expanded node k has the children first[k] ... first[k] + count[k] - 1 of
+    the next level, every other node is a leaf.
+    """
+
+    def __init__(self, bits, probability, is_player_turn):
+        self.bits = bits
+        self.probability = probability
+        self.is_player_turn = is_player_turn
+        self.expanded = np.zeros(len(bits), dtype=bool)
+        self.count = np.zeros(len(bits), dtype=np.int64)
+        self.num_cells = None
+        self.skip_fours = False
+
+
+def _expand_player(level, nodes):
+    """Children of the player nodes: the boards after every valid move"""
+    bits = level.bits[nodes]
+    moved = np.zeros((len(nodes), 4), dtype=bool)
+    children = np.zeros((len(nodes), 4), dtype=np.uint64)
+    for column, direction in enumerate(_DIRECTIONS):
+        children[:, column] = move_boards(bits, direction)
+        moved[:, column] = children[:, column] != bits
+
+    # Row major order keeps the children of a node together, in move order
+    parent, column = np.nonzero(moved)
+    level.count[nodes] = moved.sum(axis=1)
+    return children[parent, column], level.probability[nodes][parent]
+
+
+def _expand_chance(level, nodes, depth, context):
+    """Children of the chance nodes: a 2 and a 4 on every empty cell"""
+    bits = level.bits[nodes]
+    empty = _empty_mask(bits)
+    num_cells = empty.sum(axis=1)
+    level.num_cells = np.zeros(len(level.bits), dtype=np.int64)
+    level.num_cells[nodes] = num_cells
+
+    skip_fours, _, _ = spawn_probabilities(depth, context, 1.0, 1)
+    level.skip_fours = skip_fours
+    level.count[nodes] = num_cells if skip_fours else 2 * num_cells
+    parent, cell = np.nonzero(empty)
+    return _spawn_children(bits[parent], cell, level.probability[nodes][parent],
+                           num_cells[parent], skip_fours)
+
+
+def _spawn_children(bits, cell, probability, cells, skip_fours):
+    """
+    Boards and path probabilities after a spawn on cell of the parent
+    boards bits, every cell has its 2-child followed by its 4-child
+    """
+    cell_bits = np.left_shift(np.uint64(1), (cell * 4).astype(np.uint64))
+    # Same operation order as spawn_probabilities
+    bits_2 = bits | cell_bits
+    probability_2 = probability * (1.0 if skip_fours else 0.9) / cells
+    if skip_fours:
+        return bits_2, probability_2
+
+    bits_4 = bits | (cell_bits << np.uint64(1))
+    probability_4 = probability * 0.1 / cells
+    return (np.stack([bits_2, bits_4], axis=1).reshape(-1),
+            np.stack([probability_2, probability_4], axis=1).reshape(-1))
+
+
+def _build_levels(root_bits, depth, context):
+    """Expand the tree below the root afterstates one ply at a time"""
+    levels = []
+    level = _Level(root_bits, np.ones(len(root_bits)), False)
+    remaining = depth - 1
+    while len(level.bits):
+        if context.deadline is not None and time.perf_counter() > context.deadline:
+            raise SearchTimeout()
+        levels.append(level)
+        if remaining <= 0:
+            break
+
+        # Nodes expanded by expectiminimax, the rest are leaves
+        level.expanded = ((level.probability >= context.min_probability)
+                          & ~game_over_mask(unpack_bitboards(level.bits)))
+        nodes = np.flatnonzero(level.expanded)
+        if level.is_player_turn:
+            bits, probability = _expand_player(level, nodes)
+        else:
+            bits, probability = _expand_chance(level, nodes, remaining, context)
+        if context.stats is not None:
+            _count_level(context.stats, level, nodes, context)
+
+        level = _Level(bits, probability, not level.is_player_turn)
+        remaining -= 1
+    if context.stats is not None:
+        context.stats.nodes += len(level.bits)
+    return levels
+
+
+def _count_level(stats, level, nodes, context):
+    """Add the nodes of an expanded level to the search stats, counted like
+    the recursive search counts them"""
+    pruned = int((level.probability < context.min_probability).sum())
+    stats.nodes += len(level.bits)
+    stats.pruned_branches += pruned
+    stats.game_over_checks += len(level.bits) - pruned
+    if level.is_player_turn:
+        stats.player_nodes += len(nodes)
+    else:
+        stats.chance_nodes += len(nodes)
+        if level.skip_fours:
+            stats.pruned_branches += int(level.num_cells.sum())
+
+
+def _back_up(level, child_values, context):
+    """Values of the nodes of a level from the values of the next level"""
+    inner = level.expanded & (level.count > 0)
+    values = np.empty(len(level.bits))
+    if context.stats is not None:
+        context.stats.leaf_evaluations += int((~inner).sum())
+    if (~inner).any():
+        values[~inner] = _evaluate_leaves(level.bits[~inner], context)
+    if not inner.any():
+        return values
+
+    counts = level.count[inner]
+    first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    if level.is_player_turn:
+        values[inner] = np.maximum.reduceat(child_values, first)
+        return values
+
+    values[inner] = _chance_values(level, inner, child_values)
+    return values
+
+
+def _chance_values(level, inner, child_values):
+    """Expected values of the expanded chance nodes of a level"""
+    # Weighted value of every cell, then a sequential sum in cell order
+    if level.skip_fours:
+        cell_values = child_values
+    else:
+        pairs = child_values.reshape(-1, 2)
+        cell_values = 0.9 * pairs[:, 0] + 0.1 * pairs[:, 1]
+    num_cells = level.num_cells[inner]
+    parent = np.repeat(np.arange(len(num_cells)), num_cells)
+    rank = np.arange(len(cell_values)) - np.repeat(
+        np.concatenate(([0], np.cumsum(num_cells)[:-1])), num_cells)
+    alpha = np.zeros(len(num_cells))
+    for position in range(int(num_cells.max())):
+        selected = rank == position
+        owners = parent[selected]
+        alpha[owners] += cell_values[selected] / num_cells[owners]
+    return alpha
+
+
+def score_root_moves_batched(game, depth, context, directions):
+    """
+    Search every valid root move to the given depth, level by level
+    Returns: dict direction -> expected value, equal to score_root_moves
+    """
+    bits = game.get_bitboard()
+    valid = []
+    afterstates = []
+    for direction in directions:
+        new_bits, moved = move(bits, direction)
+        if moved:
+            valid.append(direction)
+            afterstates.append(new_bits)
+    if not valid:
+        return {}
+
+    levels = _build_levels(np.array(afterstates, dtype=np.uint64), depth,
+                           context)
+    values = None
+    for level in reversed(levels):
+        values = _back_up(level, values, context)
+    return {direction: float(value) for direction, value in zip(valid, values)}
+
+
+ENGINES = {
+    ENGINE_RECURSIVE: score_root_moves,
+    ENGINE_BATCHED: score_root_moves_batched
+}
+
+
+def get_engine(name):
+    """
+    Look up a search engine for get_best_move_expectiminimax by name
+    Raises ValueError for unknown names
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown search engine: {name}")
+    return ENGINES[name]
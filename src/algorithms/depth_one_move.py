@@ -1,6 +1,8 @@
 """depth_one_move.py contains an algorythm mostly for testing purposes"""
 
-from evaluation import evaluate_board
+from algorithms.expectiminimax import root_moves
+from bitboard import legal_moves
+from evaluation import evaluate_bitboard
 
 UP = "up"
 DOWN = "down"
@@ -15,22 +17,19 @@ def depth_one_move(game):
     Args: game: Game2048
     Returns: str: Best direction to move
     """
-    directions = [UP, DOWN, LEFT, RIGHT]
     best_score = 0
     best_move = None
 
-    for direction in directions:
-        # Save current board state
-        original_board = game.get_board_copy()
+    # Moves are tried on the bitboard, the game itself is never touched
+    directions, _ = root_moves(game)
+    for direction, new_bits in legal_moves(game.get_bitboard()):
+        if direction not in directions:
+            continue
+        score = evaluate_bitboard(new_bits)
 
-        # Try the move
-        if game.make_move(direction):
-            score = evaluate_board(game.board)
+        # Update best if better
+        if score > best_score:
+            best_score = score
+            best_move = direction
 
-            # Update best if better
-            if score > best_score:
-                best_score = score
-                best_move = direction
-
-        game.set_board(original_board)
-    return best_move if best_move else directions[0]  # Fallback to UP
+    return best_move if best_move else UP  # Fallback to UP
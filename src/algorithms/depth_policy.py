@@ -0,0 +1,70 @@
+"""depth_policy.py contains ways to pick the search depth from the board
+
+A depth policy is any function policy(bits, depth) -> int that receives the
+bitboard of the current position and the configured base depth. Crowded
+boards have few spawn cells, so they are both cheap and critical to search
+deeper, while open early game boards can be searched shallower.
+"""
+from bitboard import count_empty
+
+# Deepest search distinct_tiles_depth asks for above the base depth, a
+# bitboard can hold 15 distinct tiles and each ply costs about 10x
+MAX_POLICY_DEPTH = 6
+
+
+def fixed_depth(bits, depth):  # pylint: disable=unused-argument
+    """Always use the configured depth"""
+    return depth
+
+
+def empty_cells_depth(bits, depth):
+    """
+    Search deeper when the board fills up
+    Receives: bits, base depth
+    Returns: base - 1 with 10+ empty cells, base with 6-9, base + 1 with 3-5
+    and base + 2 with 2 or less (never below 1)
+    """
+    empty = count_empty(bits)
+    if empty >= 10:
+        return max(1, depth - 1)
+    if empty >= 6:
+        return depth
+    if empty >= 3:
+        return depth + 1
+    return depth + 2
+
+
+def distinct_tiles(bits):
+    """Count the different tile values on the board"""
+    exponents = set()
+    while bits:
+        exponents.add(bits & 0xF)
+        bits >>= 4
+    exponents.discard(0)
+    return len(exponents)
+
+
+def distinct_tiles_depth(bits, depth):
+    """
+    Search deeper when the board holds many different tiles, they are hard
+    to merge and mistakes are costly
+    Returns: max(base, min(MAX_POLICY_DEPTH, distinct tiles - 4))
+    """
+    return max(depth, min(MAX_POLICY_DEPTH, distinct_tiles(bits) - 4))
+
+
+DEPTH_POLICIES = {
+    "fixed": fixed_depth,
+    "empty": empty_cells_depth,
+    "distinct": distinct_tiles_depth
+}
+
+
+def get_depth_policy(name):
+    """
+    Look up a built-in policy by name
+    Raises ValueError for unknown names
+    """
+    if name not in DEPTH_POLICIES:
+        raise ValueError(f"Unknown depth policy: {name}")
+    return DEPTH_POLICIES[name]
@@ -1,134 +1,361 @@
 """expectiminimax.py contains an algorythm for using expectiminimax to find the best move"""
 
-import random
-from unittest.mock import Mock
+import math
+import time
+from algorithms.search_context import SearchContext
+from bitboard import (to_bitboard, to_board, fits_bitboard, move, count_empty,
+                      is_game_over, spawn_tile)
 from evaluation import evaluate_board
-from game import Game2048
 
 
 UP = "up"
 DOWN = "down"
 RIGHT = "right"
 LEFT = "left"
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
 
-_cached_game = Game2048()
+# Upper bound for the iterations of a time limited search
+MAX_ITERATIVE_DEPTH = 20
+# Low bits of the table depth that hold the probability bucket of a node
+_BUCKET_BITS = 11
+# Values within rounding error of the probability cutoff are not stored
+_CUTOFF_MARGIN = 1 + 1e-9
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time limit has passed"""
 
 
 def apply_move(board, direction):
     """Apply move to board and return new board state (without modifying original)"""
-    # Handle Mock objects in tests
-    try:
-        _cached_game.set_board(board)
-    except TypeError:
-        # If board is a Mock, return a different Mock so new_board != board
-        return Mock()
-
-    if direction == LEFT:
-        new_board = [_cached_game.combine_row(
-            row) for row in _cached_game.board]
-    elif direction == RIGHT:
-        new_board = [_cached_game.combine_row(
-            row[::-1])[::-1] for row in _cached_game.board]
-    elif direction == UP:
-        new_board = [[_cached_game.combine_row([_cached_game.board[i][j] for i in range(4)])[i]
-                     for j in range(4)] for i in range(4)]
-    elif direction == DOWN:
-        new_board = [[_cached_game.combine_row([_cached_game.board[i][j]
-                     for i in range(4)][::-1])[::-1][i]
-                     for j in range(4)] for i in range(4)]
-
-    return new_board
-
-
-def expectiminimax(game, depth, is_player_turn=True):
+    new_bits, _ = move(to_bitboard(board), direction)
+    return to_board(new_bits)
+
+
+def _evaluate(bits, context):
+    """Score a leaf with the evaluator of the context"""
+    if context.stats is not None:
+        context.stats.leaf_evaluations += 1
+    if context.evaluator is not None:
+        return context.evaluator(bits)
+    return evaluate_board(to_board(bits))
+
+
+def expectiminimax(game, depth, is_player_turn=True, context=None,
+                   probability=1.0):
     """
     Expectiminimax algorithm for 2048.
     Args:
         game: Game_2048
         depth: Search depth remaining
         is_player_turn: True if player move, False if random tile placement
+        context: SearchContext - optional settings and caches
+        probability: Probability of reaching this node from the root
+    Returns: float: Expected value of position
+    """
+    if context is None:
+        context = SearchContext()
+    return search(to_bitboard(game.board, clamp=True), depth, is_player_turn, context,
+                  probability)
+
+
+def search(bits, depth, is_player_turn, context, probability=1.0):
+    """
+    Expectiminimax on a bitboard, the search itself never builds a Game2048
+    Args:
+        bits: int board (see bitboard.py)
+        depth, is_player_turn, context, probability: see expectiminimax
     Returns: float: Expected value of position
     """
-    if depth == 0 or game.is_game_over():
-        return evaluate_board(game.board)
+    if context.deadline is not None and time.perf_counter() > context.deadline:
+        raise SearchTimeout()
+
+    stats = context.stats
+    if stats is not None:
+        _count_node(stats, depth, probability, context)
+
+    if depth and probability < context.lowest_probability:
+        context.lowest_probability = probability
+    # Unlikely paths are not worth expanding, evaluate them as they are
+    if (depth == 0 or probability < context.min_probability
+            or is_game_over(bits)):
+        return _evaluate(bits, context)
 
+    table = _table(context)
+    if table is not None:
+        table_depth, bucket_low = _table_key(depth, probability, context)
+        cached = table.lookup(bits, table_depth, is_player_turn)
+        if cached is not None:
+            if stats is not None:
+                stats.cache_hits += 1
+            # Stored values are exact from the low end of the bucket up
+            context.lowest_probability = min(
+                context.lowest_probability,
+                probability * _CUTOFF_MARGIN * context.min_probability / bucket_low)
+            return cached
+
+    if stats is not None:
+        _count_expanded(stats, is_player_turn)
+
+    outer = context.lowest_probability
+    context.lowest_probability = 1.0
     if is_player_turn:
-        alpha = float('-inf')
-        directions = [UP, DOWN, LEFT, RIGHT]
+        value = _player_node(bits, depth, context, probability)
+    else:
+        value = _chance_node(bits, depth, context, probability)
+    lowest = context.lowest_probability
+    context.lowest_probability = min(outer, lowest)
 
-        for direction in directions:
-            new_board = apply_move(game.board, direction)
+    # Only values that no path probability of the bucket would cut off are
+    # stored, so a lookup gives what the search itself would return
+    if (table is not None and lowest * bucket_low
+            >= _CUTOFF_MARGIN * context.min_probability * probability):
+        table.store(bits, table_depth, is_player_turn, value)
+    return value
 
-            # Check if move is valid
-            if new_board != game.board:
-                temp_game = Game2048()
-                temp_game.set_board(new_board)
 
-                value = expectiminimax(temp_game, depth - 1, False)
-                alpha = max(alpha, value)
+def _count_node(stats, depth, probability, context):
+    """Count a node entered by the search and the check made on it"""
+    stats.nodes += 1
+    if depth and probability < context.min_probability:
+        stats.pruned_branches += 1
+    elif depth:
+        stats.game_over_checks += 1
 
-        if alpha == float('-inf'):
-            return evaluate_board(game.board)
-        return alpha
 
+def _count_expanded(stats, is_player_turn):
+    """Count a node that is expanded and not taken from the table"""
+    if is_player_turn:
+        stats.player_nodes += 1
     else:
-        # Expectation off random tile
-        empty_cells = [(i, j) for i in range(4)
-                       for j in range(4) if game.board[i][j] == 0]
+        stats.chance_nodes += 1
 
-        if not empty_cells:
-            return evaluate_board(game.board)
 
-        # Sample limited cells if too many (7 seemed to be the safe point where
-        # gameplay wasnt impacted)
-        if len(empty_cells) > 7:
-            empty_cells = random.sample(empty_cells, 7)
+def _table(context):
+    """
+    Transposition table of the context, None in root searches that skip
+    4-spawns: the value of a node would then depend on its ply
+    """
+    if (context.four_spawn_max_ply is not None and context.root_depth is not None
+            and context.root_depth - 1 > context.four_spawn_max_ply):
+        return None
+    return context.table
+
 
-        alpha = 0
-        num_cells = len(empty_cells)
+def _table_key(depth, probability, context):
+    """
+    Depth given to the transposition table for a node, the power of two
+    bucket of its path probability packed into the low bits (one bucket
+    for every probability when nothing is cut off)
+    Returns: tuple (table depth, lowest probability of the bucket)
+    """
+    if context.min_probability <= 0:
+        return depth << _BUCKET_BITS, 1.0
+    exponent = math.frexp(probability)[1]
+    return (depth << _BUCKET_BITS) | (1 - exponent), math.ldexp(0.5, exponent)
 
-        for i, j in empty_cells:
-            # Placing a 2 (90% probability)
-            original_value = game.board[i][j]
-            game.board[i][j] = 2
-            value_2 = expectiminimax(game, depth - 1, True)
 
-            # Placing a 4 (10% probability)
-            game.board[i][j] = 4
-            value_4 = expectiminimax(game, depth - 1, True)
+def _player_node(bits, depth, context, probability):
+    """Maximize over the valid moves"""
+    alpha = float('-inf')
+
+    for direction in DIRECTIONS:
+        new_bits, moved = move(bits, direction)
+
+        # Check if move is valid
+        if moved:
+            value = search(new_bits, depth - 1, False, context, probability)
+            alpha = max(alpha, value)
+
+    if alpha == float('-inf'):
+        return _evaluate(bits, context)
+    return alpha
 
-            game.board[i][j] = original_value
 
-            # Weighted average for this cell
-            cell_value = 0.9 * value_2 + 0.1 * value_4
-            alpha += cell_value / num_cells
+def _chance_node(bits, depth, context, probability):
+    """Expectation off random tile over every empty cell"""
+    num_cells = count_empty(bits)
+    if not num_cells:
+        return _evaluate(bits, context)
 
-        return alpha
+    alpha = 0
+    spawn = spawn_probabilities(depth, context, probability, num_cells)
 
+    # Empty cells in row major order, cell (i, j) is nibble 4 * i + j
+    for index in range(16):
+        if not (bits >> (4 * index)) & 0xF:
+            alpha += cell_value(bits, index, depth, context, spawn) / num_cells
 
-def get_best_move_expectiminimax(game, depth=3):
+    return alpha
+
+
+def spawn_probabilities(depth, context, probability, num_cells):
     """
-    Get the best move using expectiminimax algorithm.
-    Args:
-        game: Game2048 instance
-        depth: Search depth
-    Returns: str: Best direction
+    Probabilities of the children of a chance node
+    Returns: tuple (skip 4-spawns, probability of a 2, probability of a 4)
     """
-    directions = [UP, DOWN, LEFT, RIGHT]
-    best_score = float('-inf')
-    best_move = None
+    # 4-spawns are skipped deep in the tree, the cell then always gets a 2
+    skip_fours = (context.four_spawn_max_ply is not None
+                  and context.root_depth is not None
+                  and context.root_depth - depth > context.four_spawn_max_ply)
+    probability_2 = probability * (1.0 if skip_fours else 0.9) / num_cells
+    probability_4 = probability * 0.1 / num_cells
+    return skip_fours, probability_2, probability_4
+
 
+def cell_value(bits, index, depth, context, spawn):
+    """Expected value of a tile spawning on empty nibble index of a chance node"""
+    skip_fours, probability_2, probability_4 = spawn
+
+    # Placing a 2 (90% probability)
+    value_2 = search(spawn_tile(bits, index, 1), depth - 1, True, context,
+                     probability_2)
+    if skip_fours:
+        if context.stats is not None:
+            context.stats.pruned_branches += 1
+        return value_2
+
+    # Placing a 4 (10% probability)
+    value_4 = search(spawn_tile(bits, index, 2), depth - 1, True, context,
+                     probability_4)
+
+    # Weighted average for this cell
+    return 0.9 * value_2 + 0.1 * value_4
+
+
+def score_root_moves(game, depth, context, directions):
+    """
+    Search every valid root move to the given depth
+    Returns: dict direction -> expected value
+    """
+    scores = {}
+    bits = game.get_bitboard()
     for direction in directions:
-        new_board = apply_move(game.board, direction)
+        new_bits, moved = move(bits, direction)
 
         # Check if move is valid
-        if new_board != game.board:
-            temp_game = Game2048()
-            temp_game.set_board(new_board)
+        if moved:
+            scores[direction] = search(new_bits, depth - 1, False, context)
+    return scores
 
-            score = expectiminimax(temp_game, depth - 1, False)
-            if score > best_score:
-                best_score = score
-                best_move = direction
 
+def pick_best_move(scores):
+    """Pick the highest scoring move, ties go to the first of UP, DOWN, LEFT, RIGHT"""
+    best_score = float('-inf')
+    best_move = None
+    for direction in [UP, DOWN, LEFT, RIGHT]:
+        if direction in scores and scores[direction] > best_score:
+            best_score = scores[direction]
+            best_move = direction
     return best_move if best_move else UP
+
+
+def root_moves(game):
+    """
+    Root directions to search and the position cache key of a game
+    Boards with a tile above 32768 are searched with it packed as 32768,
+    which can merge tiles that do not merge on the real board: only the
+    directions that change the real board are searched and the cache key
+    is None
+    Returns: tuple (directions, bits or None)
+    """
+    if fits_bitboard(game.board):
+        return [UP, DOWN, LEFT, RIGHT], game.get_bitboard()
+    return game.legal_directions(), None
+
+
+def cached_move(context, bits, depth):
+    """Best move of an earlier search from the position cache, or None"""
+    if context.position_cache is None or bits is None:
+        return None
+    cached = context.position_cache.lookup(bits, depth)
+    if cached is None:
+        return None
+    context.completed_depth = depth
+    return cached[1]
+
+
+def remember_move(context, bits, depth, scores):
+    """Pick the best move and add it to a writable position cache"""
+    best_move = pick_best_move(scores)
+    cache = context.position_cache
+    if cache is not None and not cache.readonly and scores and bits is not None:
+        cache.store(bits, depth, scores[best_move], best_move)
+    return best_move
+
+
+def timed_search(engine, game, depth, context, directions):
+    """Run a root search and add its time and nodes to the context stats"""
+    stats = context.stats
+    if stats is None:
+        return engine(game, depth, context, directions)
+    nodes = stats.nodes
+    start = time.perf_counter()
+    scores = engine(game, depth, context, directions)
+    stats.record_depth(depth, time.perf_counter() - start, stats.nodes - nodes)
+    return scores
+
+
+def get_best_move_expectiminimax(game, depth=3, context=None, time_limit_ms=None,
+                                 engine=None):
+    """
+    Get the best move using expectiminimax algorithm.
+    Args:
+        game: Game2048 instance
+        depth: Search depth (ignored when time_limit_ms is given)
+        context: SearchContext - optional settings and caches, pass the same
+            context between moves to keep its transposition table. Its
+            depth policy picks the depth for this board from the base depth
+        time_limit_ms: float - search depth 1, 2, 3, ... until this many
+            milliseconds have passed and use the deepest finished depth
+        engine: function(game, depth, context, directions) -> dict - searches
+            the root moves, default score_root_moves, see batched.py
+        The position cache of the context is only used by fixed depth
+        searches.
+    Returns: str: Best direction (the depth used is in context.completed_depth)
+    """
+    if context is None:
+        context = SearchContext()
+    if engine is None:
+        engine = score_root_moves
+
+    directions, key = root_moves(game)
+    if context.depth_policy is not None:
+        depth = context.depth_policy(game.get_bitboard(), depth)
+
+    if time_limit_ms is None:
+        cached = cached_move(context, key, depth)
+        if cached is not None:
+            return cached
+        context.root_depth = depth
+        scores = timed_search(engine, game, depth, context, directions)
+        context.completed_depth = depth
+        return remember_move(context, key, depth, scores)
+
+    return _iterative_deepening(game, context, time_limit_ms, engine,
+                                directions)
+
+
+def _iterative_deepening(game, context, time_limit_ms, engine, directions):
+    """Anytime search, see get_best_move_expectiminimax"""
+    start = time.perf_counter()
+    scores = {}
+    context.completed_depth = 0
+
+    for depth in range(1, MAX_ITERATIVE_DEPTH + 1):
+        context.root_depth = depth
+        # Depth 1 always finishes so there is a move to return
+        if depth > 1:
+            context.deadline = start + time_limit_ms / 1000
+        try:
+            scores = timed_search(engine, game, depth, context, directions)
+        except SearchTimeout:
+            break
+        finally:
+            context.deadline = None
+        context.completed_depth = depth
+
+        if not scores or time.perf_counter() - start >= time_limit_ms / 1000:
+            break
+
+    return pick_best_move(scores)
@@ -0,0 +1,217 @@
+"""parallel.py contains a root parallel version of the expectiminimax search
+
+The subtrees below the root are independent, so they are searched in a
+persistent process pool. The pool is created on first use and reused across
+moves and games. Values are combined in exactly the same order and with the
+same arithmetic as the serial search, so the chosen move is identical.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from algorithms.expectiminimax import (search, spawn_probabilities,
+                                       cell_value, cached_move, remember_move,
+                                       root_moves)
+from algorithms.search_context import SearchContext
+from algorithms.search_stats import SearchStats
+from algorithms.shared_table import SharedTranspositionTable
+from algorithms.transposition import TranspositionTable
+from bitboard import legal_moves, empty_cells, is_game_over
+
+SPLIT_MOVES = "move"
+SPLIT_SPAWNS = "spawn"
+
+_pool = None  # pylint: disable=invalid-name
+_pool_workers = None  # pylint: disable=invalid-name
+
+# Search context of a worker process, kept between tasks
+_worker_context = None  # pylint: disable=invalid-name
+_worker_settings = None  # pylint: disable=invalid-name
+
+
+def get_pool(workers):
+    """Get the shared process pool, it is only rebuilt if workers changes"""
+    global _pool, _pool_workers  # pylint: disable=global-statement
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the shared process pool"""
+    global _pool, _pool_workers  # pylint: disable=global-statement
+    if _pool is not None:
+        _pool.shutdown()
+    _pool = None
+    _pool_workers = None
+
+
+def _table_settings(table):
+    """Describe the table of the workers: a table of the same size, or
+    the same table if it lives in shared memory"""
+    if table is None:
+        return None
+    name = None
+    if isinstance(table, SharedTranspositionTable):
+        name = table.name
+    return (table.bucket_count * 2, table.symmetries, name)
+
+
+def _settings(context):
+    """Picklable copy of the context settings for the workers"""
+    return (context.evaluator, context.min_probability,
+            context.four_spawn_max_ply, _table_settings(context.table),
+            context.stats is not None)
+
+
+def _detach_table(context, table_settings):
+    """Unmap the shared table of an old worker context unless it is kept"""
+    if context is None or not isinstance(context.table, SharedTranspositionTable):
+        return
+    if table_settings is None or table_settings[2] != context.table.name:
+        context.table.detach()
+
+
+def _get_worker_context(settings, root_depth):
+    """Reuse the worker context (and its table) while the settings match"""
+    global _worker_context, _worker_settings  # pylint: disable=global-statement
+    if _worker_context is None or _worker_settings != settings:
+        (evaluator, min_probability, four_spawn_max_ply, table_settings,
+         collect_stats) = settings
+        _detach_table(_worker_context, table_settings)
+        table = None
+        if table_settings is not None:
+            table_entries, symmetries, name = table_settings
+            if name is not None:
+                table = SharedTranspositionTable(
+                    max_entries=table_entries, symmetries=symmetries, name=name)
+            else:
+                table = TranspositionTable(max_entries=table_entries,
+                                           symmetries=symmetries)
+        _worker_context = SearchContext(
+            table=table, evaluator=evaluator, min_probability=min_probability,
+            four_spawn_max_ply=four_spawn_max_ply,
+            stats=SearchStats() if collect_stats else None)
+        _worker_settings = settings
+    _worker_context.root_depth = root_depth
+    return _worker_context
+
+
+def _take_stats(context):
+    """Stats of the finished task, sent back with its value"""
+    stats = context.stats
+    if stats is not None:
+        context.stats = SearchStats()
+    return stats
+
+
+def _move_task(bits, depth, settings):
+    """Worker: value of the chance node after a root move and its stats"""
+    context = _get_worker_context(settings, depth)
+    value = search(bits, depth - 1, False, context)
+    return value, _take_stats(context)
+
+
+def _spawn_task(bits, cell, depth, settings, spawn):
+    """Worker: value of a single spawn cell below a root move and its stats"""
+    context = _get_worker_context(settings, depth)
+    value = cell_value(bits, cell, depth - 1, context, spawn)
+    return value, _take_stats(context)
+
+
+def _task_value(future, context):
+    """Value of a finished task, its stats go to the context stats"""
+    value, stats = future.result()
+    if stats is not None and context.stats is not None:
+        context.stats.merge(stats)
+    return value
+
+
+def _expands_chance_node(bits, depth, context):
+    """Check if the root chance node would be expanded by expectiminimax"""
+    return (depth - 1 > 0 and 1.0 >= context.min_probability
+            and not is_game_over(bits) and bool(empty_cells(bits)))
+
+
+def score_root_moves_parallel(game, depth, workers, context, split=SPLIT_MOVES):
+    """
+    Search every valid root move in the process pool
+    Returns: dict direction -> expected value, equal to score_root_moves
+    """
+    context.root_depth = depth
+    pending = _submit_tasks(get_pool(workers), game.get_bitboard(), depth,
+                            context, split)
+
+    scores = {}
+    for direction, (num_cells, futures) in pending.items():
+        if num_cells is None:
+            scores[direction] = _task_value(futures, context)
+        else:
+            # Same summation order as the serial chance node
+            alpha = 0
+            for future in futures:
+                alpha += _task_value(future, context) / num_cells
+            scores[direction] = alpha
+    return scores
+
+
+def _submit_tasks(pool, bits, depth, context, split):
+    """
+    Send the searches below the root to the pool
+    Returns: dict direction -> (None, future) for a whole move or
+    (number of spawn cells, list of futures) for a move split by spawns
+    """
+    settings = _settings(context)
+    pending = {}
+    for direction, new_bits in legal_moves(bits):
+        if split == SPLIT_SPAWNS and _expands_chance_node(new_bits, depth, context):
+            cells = empty_cells(new_bits)
+            spawn = spawn_probabilities(depth - 1, context, 1.0, len(cells))
+            if context.stats is not None:
+                # The root chance node itself is searched here
+                context.stats.nodes += 1
+                context.stats.game_over_checks += 1
+                context.stats.chance_nodes += 1
+            pending[direction] = (len(cells), [
+                pool.submit(_spawn_task, new_bits, cell, depth, settings, spawn)
+                for cell in cells])
+        else:
+            pending[direction] = (None, pool.submit(
+                _move_task, new_bits, depth, settings))
+    return pending
+
+
+def get_best_move_parallel(game, depth=3, workers=4, context=None,
+                           split=SPLIT_MOVES):
+    """
+    Get the best move with the root moves searched in a process pool.
+    Args:
+        game: Game2048 instance
+        depth: Search depth
+        workers: int - number of worker processes
+        context: SearchContext - settings, the evaluator must be picklable,
+            its depth policy picks a board dependent depth
+        split: "move" sends each valid move to a worker, "spawn" sends each
+            (move, spawn cell) pair for better balance
+    Returns: str: Best direction
+    """
+    if context is None:
+        context = SearchContext()
+    directions, key = root_moves(game)
+    if context.depth_policy is not None:
+        depth = context.depth_policy(game.get_bitboard(), depth)
+
+    cached = cached_move(context, key, depth)
+    if cached is not None:
+        return cached
+    stats = context.stats
+    nodes = stats.nodes if stats is not None else 0
+    start = time.perf_counter()
+    scores = score_root_moves_parallel(game, depth, workers, context, split)
+    scores = {direction: value for direction, value in scores.items()
+              if direction in directions}
+    if stats is not None:
+        stats.record_depth(depth, time.perf_counter() - start,
+                           stats.nodes - nodes)
+    context.completed_depth = depth
+    return remember_move(context, key, depth, scores)
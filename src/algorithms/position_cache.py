@@ -0,0 +1,260 @@
+"""position_cache.py contains a persistent cache of searched root positions
+
+The same early and mid game positions come up in many games, so the best
+move of a fixed depth root search is stored in a memory mapped file that
+outlives the process. The file is a header followed by fixed size slots of
+an open addressing hash table:
+
+    header: magic, settings hash, slot count, stored positions
+    slot:   canonical board, value, depth, move (0 marks an empty slot)
+
+Boards are stored in their canonical form (see symmetry.py) with the move
+relabelled to match, so mirrored positions share an entry. The settings hash
+covers the evaluation weights and the search parameters; a file written with
+other settings is treated as empty by readers and cleared by the writer.
+
+Any number of processes can open the file read only while one writer adds
+to it. A reader racing the writer may miss an entry but never gets a move
+for another board, because the move is written last. The writer holds an
+exclusive flock on PATH.lock, a second writer gets a read only cache. A
+stale file is never shrunk under its readers: the writer builds a new file
+and renames it over the old one, readers keep the old file mapped.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import evaluation
+from bitboard import UP, DOWN, LEFT, RIGHT
+from symmetry import canonical_form, transform_move, restore_move
+
+MAGIC = b"2048POS1"
+DEFAULT_MAX_BYTES = 64 << 20
+# Slots probed after the home slot before giving up
+PROBE_LIMIT = 8
+
+_HEADER = struct.Struct("<8sQQQ")
+_ENTRIES_OFFSET = 24
+_SLOT = struct.Struct("<QdHH4x")
+_MOVE_OFFSET = 18
+_MOVES = (None, UP, DOWN, LEFT, RIGHT)
+_MOVE_CODES = {UP: 1, DOWN: 2, LEFT: 3, RIGHT: 4}
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_DEPTH_MULTIPLIER = 0xD6E8FEB86659FD93
+_MASK_64 = (1 << 64) - 1
+
+
+def settings_hash(context):
+    """
+    Hash of everything that changes the value of a root search
+    Args:
+        context: SearchContext
+    Returns: int - 64-bit hash
+    """
+    evaluator = context.evaluator
+    settings = (
+        MAGIC,
+        evaluation.EMPTY_WEIGHT, evaluation.MONOTONICITY_WEIGHT,
+        evaluation.CORNER_WEIGHT, evaluation.MERGE_WEIGHT,
+        evaluation.WEIGHTED_SUM_WEIGHT, evaluation.MAX_TILE_WEIGHT,
+        getattr(evaluator, "__qualname__", repr(evaluator)),
+        context.min_probability, context.four_spawn_max_ply
+    )
+    digest = hashlib.sha256(repr(settings).encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class PositionCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Memory mapped table of (board, depth) -> (value, best move) for one
+    settings hash, see the module docstring for the file layout
+    """
+
+    def __init__(self, path, settings, max_bytes=DEFAULT_MAX_BYTES,
+                 readonly=False):
+        """
+        Args:
+            path: str - cache file, created by the writer if missing
+            settings: int - settings_hash of the search context
+            max_bytes: int - size cap of the file
+            readonly: bool - open for lookups only, a writer is read only
+                too while another process writes to the file
+        """
+        self.path = path
+        self.settings = settings
+        self.readonly = readonly
+        self.slot_count = max(1, (max_bytes - _HEADER.size) // _SLOT.size)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._file = None
+        self._map = None
+        self._lock = None
+        if not readonly:
+            self._lock_writer()
+        if self.readonly:
+            self._open_reader()
+        else:
+            self._open_writer()
+
+    def _header_matches(self, header):
+        """Check the magic and settings of a file header"""
+        magic, settings, slot_count, _ = _HEADER.unpack(header)
+        return magic == MAGIC and settings == self.settings and slot_count > 0
+
+    def _open_reader(self):
+        """Map an existing file, a missing or stale file stays unmapped"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as file:
+            header = file.read(_HEADER.size)
+            if len(header) < _HEADER.size or not self._header_matches(header):
+                return
+            slot_count = _HEADER.unpack(header)[2]
+            if os.fstat(file.fileno()).st_size < _HEADER.size + slot_count * _SLOT.size:
+                return
+            self.slot_count = slot_count
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _lock_writer(self):
+        """Take the writer lock, the cache is read only if another has it"""
+        self._lock = open(self.path + ".lock", "a+b")  # pylint: disable=consider-using-with
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock.close()
+            self._lock = None
+            self.readonly = True
+
+    def _open_writer(self):
+        """Map the file for writing, replacing it if it does not match"""
+        size = _HEADER.size + self.slot_count * _SLOT.size
+        if not self._file_matches(size):
+            self._replace_file(size)
+        self._file = open(self.path, "r+b")  # pylint: disable=consider-using-with
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def _file_matches(self, size):
+        """Check if the file exists with these settings and this size"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as file:
+            header = file.read(_HEADER.size)
+            return (len(header) == _HEADER.size and self._header_matches(header)
+                    and _HEADER.unpack(header)[2] == self.slot_count
+                    and os.fstat(file.fileno()).st_size == size)
+
+    def _replace_file(self, size):
+        """Write an empty file of the given size in place of the old one"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                file.write(_HEADER.pack(MAGIC, self.settings, self.slot_count, 0))
+                file.truncate(size)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def _slots(self, board, depth):
+        """Byte offsets of the slots probed for a key"""
+        home = (((board * _HASH_MULTIPLIER) ^ (depth * _DEPTH_MULTIPLIER))
+                & _MASK_64) % self.slot_count
+        for probe in range(min(PROBE_LIMIT, self.slot_count)):
+            yield _HEADER.size + ((home + probe) % self.slot_count) * _SLOT.size
+
+    def lookup(self, bits, depth):
+        """
+        Find the result of an earlier root search
+        Args:
+            bits: int - bitboard of the root
+            depth: int - search depth
+        Returns: tuple (value, best move) or None if not stored
+        """
+        if self._map is not None:
+            canonical, name = canonical_form(bits)
+            for offset in self._slots(canonical, depth):
+                board, value, slot_depth, code = _SLOT.unpack_from(self._map,
+                                                                   offset)
+                if not code:
+                    break
+                if board == canonical and slot_depth == depth:
+                    self.hits += 1
+                    return value, restore_move(_MOVES[code], name)
+        self.misses += 1
+        return None
+
+    def store(self, bits, depth, value, direction):
+        """
+        Store the result of a root search, a full probe window keeps its
+        deepest entries
+        Raises ValueError if the cache is read only
+        """
+        if self.readonly:
+            raise ValueError("Position cache is read only")
+        canonical, name = canonical_form(bits)
+        code = _MOVE_CODES[transform_move(direction, name)]
+
+        target = None
+        target_depth = None
+        for offset in self._slots(canonical, depth):
+            board, _, slot_depth, slot_code = _SLOT.unpack_from(self._map, offset)
+            if not slot_code:
+                target = offset
+                self._add_entries(1)
+                break
+            if board == canonical and slot_depth == depth:
+                target = offset
+                break
+            if slot_depth <= depth and (target is None or slot_depth < target_depth):
+                target = offset
+                target_depth = slot_depth
+        if target is None:
+            return
+
+        # Readers skip the slot while its move is cleared
+        struct.pack_into("<H", self._map, target + _MOVE_OFFSET, 0)
+        _SLOT.pack_into(self._map, target, canonical, value, depth, 0)
+        struct.pack_into("<H", self._map, target + _MOVE_OFFSET, code)
+        self.stores += 1
+
+    def _add_entries(self, count):
+        """Update the number of stored positions in the header"""
+        entries = struct.unpack_from("<Q", self._map, _ENTRIES_OFFSET)[0]
+        struct.pack_into("<Q", self._map, _ENTRIES_OFFSET, entries + count)
+
+    def __len__(self):
+        """Number of stored positions"""
+        if self._map is None:
+            return 0
+        return struct.unpack_from("<Q", self._map, _ENTRIES_OFFSET)[0]
+
+    def stats(self):
+        """
+        Get usage counters
+        Returns: dict with hits, misses, stores and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        """Write the file back and unmap it"""
+        if self._map is not None:
+            if not self.readonly:
+                self._map.flush()
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
@@ -0,0 +1,48 @@
+"""search_context.py contains the state shared by one expectiminimax search"""
+
+# Default probability cutoff for chance node expansion
+MIN_PROBABILITY = 0.0001
+
+
+class SearchContext:  # pylint: disable=too-many-instance-attributes,too-few-public-methods
+    """
+    Settings and shared state passed through every node of a search.
+    A context can be reused across moves and games, for example to keep
+    the transposition table warm.
+    """
+
+    def __init__(self, table=None, evaluator=None,
+                 min_probability=MIN_PROBABILITY, four_spawn_max_ply=None,
+                 stats=None):
+        """
+        Args:
+            table: TranspositionTable - optional cache of node values
+            evaluator: function(bits) -> float - leaf evaluator taking a
+                bitboard, for example evaluate_with_tables (default is
+                evaluate_board on the list board)
+            min_probability: float - paths less likely than this (product of
+                the spawn probabilities from the root) are not expanded
+            four_spawn_max_ply: int - chance nodes more than this many plies
+                below the root only consider 2-spawns
+            stats: SearchStats - optional node counters and timings, the
+                search does no counting without it
+        """
+        self.table = table
+        self.evaluator = evaluator
+        self.min_probability = min_probability
+        self.four_spawn_max_ply = four_spawn_max_ply
+        self.stats = stats
+        # Optional PositionCache of the best moves of fixed depth root searches
+        self.position_cache = None
+        # Optional function(bits, depth) -> int that picks the depth of a
+        # root search from the base depth, see depth_policy.py
+        self.depth_policy = None
+        # Depth of the current root search, set by the entry point
+        self.root_depth = None
+        # Deepest finished root search of the last move
+        self.completed_depth = None
+        # perf_counter() time after which a time limited search gives up
+        self.deadline = None
+        # Lowest path probability met in the subtree being searched, decides
+        # which node values may go to the transposition table
+        self.lowest_probability = 1.0
@@ -0,0 +1,110 @@
+"""search_stats.py contains optional counters of an expectiminimax search
+
+Set a SearchStats as context.stats to collect them. The search only checks
+whether context.stats is None, so a search without stats does no counting.
+
+Depth counts plies, a player move and a tile spawn are one ply each. The
+effective branching factor of a depth d search of N nodes is the b with
+b + b^2 + ... + b^d = N.
+"""
+
+# Node counters, in the order they are printed
+COUNTERS = ("nodes", "player_nodes", "chance_nodes", "leaf_evaluations",
+            "game_over_checks", "cache_hits", "pruned_branches")
+
+
+def effective_branching_factor(nodes, depth):
+    """
+    Solve b + b^2 + ... + b^depth = nodes for b
+    Args:
+        nodes: float - nodes of one search, the root not included
+        depth: int - plies searched
+    Returns: float - 0.0 for an empty search
+    """
+    if nodes <= 0 or depth <= 0:
+        return 0.0
+    low, high = 0.0, max(1.0, float(nodes))
+    for _ in range(100):
+        middle = (low + high) / 2
+        if sum(middle ** ply for ply in range(1, depth + 1)) < nodes:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+class SearchStats:  # pylint: disable=too-many-instance-attributes
+    """
+    Counters of every node the search visits and the time and size of the
+    root searches at each depth. Stats of several searches, games or
+    processes are combined with merge.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.player_nodes = 0
+        self.chance_nodes = 0
+        self.leaf_evaluations = 0
+        self.game_over_checks = 0
+        self.cache_hits = 0
+        self.pruned_branches = 0
+        # Root depth -> [searches, seconds, nodes]
+        self.depths = {}
+
+    def record_depth(self, depth, seconds, nodes):
+        """Add a finished root search of the given depth"""
+        entry = self.depths.setdefault(depth, [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += nodes
+
+    def merge(self, other):
+        """Add the counters of another SearchStats to these"""
+        for name in COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for depth, (searches, seconds, nodes) in other.depths.items():
+            entry = self.depths.setdefault(depth, [0, 0.0, 0])
+            entry[0] += searches
+            entry[1] += seconds
+            entry[2] += nodes
+
+    def as_dict(self):
+        """
+        Plain copy of the counters for game results
+        Returns: dict with the COUNTERS and depths
+        """
+        result = {name: getattr(self, name) for name in COUNTERS}
+        result['depths'] = {depth: list(entry)
+                            for depth, entry in self.depths.items()}
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild stats from as_dict output"""
+        stats = cls()
+        for name in COUNTERS:
+            setattr(stats, name, data[name])
+        stats.depths = {int(depth): list(entry)
+                        for depth, entry in data['depths'].items()}
+        return stats
+
+    def summary(self):
+        """
+        Derived figures of every root depth
+        Returns: list of dicts with depth, searches, nodes_per_search,
+        nodes_per_second, ms_per_search and branching_factor
+        """
+        rows = []
+        for depth in sorted(self.depths):
+            searches, seconds, nodes = self.depths[depth]
+            per_search = nodes / searches
+            rows.append({
+                'depth': depth,
+                'searches': searches,
+                'nodes_per_search': per_search,
+                'nodes_per_second': nodes / seconds if seconds else 0.0,
+                'ms_per_search': seconds * 1000 / searches,
+                'branching_factor': effective_branching_factor(per_search,
+                                                               depth)
+            })
+        return rows
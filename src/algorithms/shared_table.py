@@ -0,0 +1,186 @@
+"""shared_table.py contains a transposition table in shared memory
+
+Worker processes that search games or root moves attach to the same block
+of multiprocessing.shared_memory, so a node searched by one process is a
+cache hit for all of them. There are no locks: every slot stores
+
+    check = board ^ value bits ^ meta, value, meta = depth, node type, valid
+
+and a reader only accepts a slot whose check matches the other two words.
+A slot torn by two processes writing at the same time fails the check and
+reads as a miss, so updates can be lost but never give a wrong value.
+
+The table has the interface of TranspositionTable and can be set as the
+table of a SearchContext. Pickling it only sends the name of the block, the
+receiving process attaches to the same memory.
+"""
+import struct
+from multiprocessing import shared_memory
+from symmetry import canonical_key
+from algorithms.transposition import usage_stats
+
+_SLOT = struct.Struct("<QdQ")
+_SLOT_BITS = struct.Struct("<QQQ")
+_FLOAT = struct.Struct("<d")
+_BITS = struct.Struct("<Q")
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK_64 = (1 << 64) - 1
+
+# Blocks this process has attached to, by name. A process attaches once
+# however many tables are unpickled, so file descriptors do not pile up.
+# A block stays mapped until SharedTranspositionTable.detach is called.
+_attached = {}
+
+
+def _attach(name):
+    """Shared memory block of another process"""
+    if name not in _attached:
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    return _attached[name]
+
+
+def _detach(name):
+    """Unmap a block attached with _attach"""
+    memory = _attached.pop(name, None)
+    if memory is not None:
+        memory.close()
+
+
+def _value_bits(value):
+    """Raw 64 bits of a float"""
+    return _BITS.unpack(_FLOAT.pack(value))[0]
+
+
+class SharedTranspositionTable:  # pylint: disable=too-many-instance-attributes
+    """
+    Fixed size table of node values keyed by (board, depth, node type) in
+    shared memory. Like TranspositionTable each bucket has a depth preferred
+    slot and an always replace slot.
+    """
+
+    def __init__(self, max_entries=1 << 18, symmetries=None, name=None):
+        """
+        Args:
+            max_entries: int - upper bound for stored entries (rounded down
+                to a power of two, at least 4)
+            symmetries: tuple of transform names - key boards by their
+                canonical form, see TranspositionTable
+            name: str - attach to an existing table instead of creating one
+        """
+        self.index_bits = max(1, (max(2, max_entries) // 2).bit_length() - 1)
+        self.bucket_count = 1 << self.index_bits
+        self.symmetries = symmetries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stores = 0
+        self.owner = name is None
+        size = 2 * self.bucket_count * _SLOT.size
+        if self.owner:
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+            self.clear()
+        else:
+            self._memory = _attach(name)
+        self._buffer = self._memory.buf
+        self.name = self._memory.name
+
+    def __getstate__(self):
+        """Only the name and the settings are sent to other processes"""
+        return (self.name, self.bucket_count * 2, self.symmetries)
+
+    def __setstate__(self, state):
+        """Attach to the table of the sending process"""
+        name, max_entries, symmetries = state
+        self.__init__(max_entries, symmetries, name)
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        self._memory.buf[:] = bytes(len(self._memory.buf))
+
+    def _offset(self, key, slot):
+        """Byte offset of a slot of the bucket of the key"""
+        index = ((key * _HASH_MULTIPLIER) & _MASK_64) >> (64 - self.index_bits)
+        return (2 * index + slot) * _SLOT.size
+
+    def _read(self, offset):
+        """
+        Read a slot
+        Returns: tuple (board, value, meta) or None if empty or torn
+        """
+        data = bytes(self._buffer[offset:offset + _SLOT.size])
+        check, value_bits, meta = _SLOT_BITS.unpack(data)
+        if not meta:
+            return None
+        return check ^ value_bits ^ meta, _SLOT.unpack(data)[1], meta
+
+    def lookup(self, bits, depth, is_player_turn):
+        """
+        Find a stored value
+        Args:
+            bits: int - bitboard
+            depth: int - remaining search depth
+            is_player_turn: bool - node type
+        Returns: float or None if not stored
+        """
+        if self.symmetries is not None:
+            bits = canonical_key(bits, self.symmetries)
+        meta = (depth << 2) | (is_player_turn << 1) | 1
+        key = bits ^ meta
+        for slot in (0, 1):
+            entry = self._read(self._offset(key, slot))
+            if entry is not None and entry[0] == bits and entry[2] == meta:
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+        return None
+
+    def store(self, bits, depth, is_player_turn, value):
+        """Store the value of a searched node"""
+        if self.symmetries is not None:
+            bits = canonical_key(bits, self.symmetries)
+        meta = (depth << 2) | (is_player_turn << 1) | 1
+        key = bits ^ meta
+        self.stores += 1
+
+        offset = self._offset(key, 0)
+        deep = self._read(offset)
+        if deep is not None and depth < deep[2] >> 2:
+            offset = self._offset(key, 1)
+            recent = self._read(offset)
+            if recent is not None and (recent[0], recent[2]) != (bits, meta):
+                self.evictions += 1
+        elif deep is not None and (deep[0], deep[2]) != (bits, meta):
+            self.evictions += 1
+
+        check = bits ^ _value_bits(value) ^ meta
+        _SLOT.pack_into(self._buffer, offset, check, value, meta)
+
+    def __len__(self):
+        """Number of valid entries"""
+        size = 2 * self.bucket_count * _SLOT.size
+        return sum(1 for offset in range(0, size, _SLOT.size)
+                   if self._read(offset) is not None)
+
+    def stats(self):
+        """
+        Get usage counters of this process
+        Returns: dict with hits, misses, evictions, stores, entries, hit_rate
+        """
+        return usage_stats(self)
+
+    def detach(self):
+        """
+        Unmap the table in a process that attached to it, every table of
+        this process with the same name is unusable afterwards. The
+        creating process frees the memory with close instead.
+        """
+        if not self.owner:
+            self._buffer = None
+            _detach(self.name)
+
+    def close(self):
+        """Free the memory, only the creating process does anything"""
+        if self.owner:
+            self._buffer = None
+            self._memory.close()
+            self._memory.unlink()
@@ -0,0 +1,117 @@
+"""transposition.py contains a bounded cache of expectiminimax node values"""
+from symmetry import canonical_key
+
+# Rough CPython cost of one stored entry (tuple + ints + float + slot)
+ENTRY_BYTES = 128
+
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK_64 = (1 << 64) - 1
+
+
+def usage_stats(table):
+    """
+    Usage counters of a TranspositionTable or a SharedTranspositionTable
+    Returns: dict with hits, misses, evictions, stores, entries, hit_rate
+    """
+    lookups = table.hits + table.misses
+    return {
+        'hits': table.hits,
+        'misses': table.misses,
+        'evictions': table.evictions,
+        'stores': table.stores,
+        'entries': len(table),
+        'hit_rate': table.hits / lookups if lookups else 0.0
+    }
+
+
+class TranspositionTable:  # pylint: disable=too-many-instance-attributes
+    """
+    Fixed size table of node values keyed by (board, depth, node type).
+    Each bucket holds two entries: a depth preferred slot that is only
+    replaced by an equally deep or deeper result, and an always replace
+    slot for everything else, so deep subtrees survive shallow churn.
+    """
+
+    def __init__(self, max_entries=1 << 18, max_bytes=None, symmetries=None):
+        """
+        Args:
+            max_entries: int - upper bound for stored entries (rounded down
+                to a power of two, at least 4)
+            max_bytes: int - optional memory cap, overrides max_entries
+            symmetries: tuple of transform names (see symmetry.py) - boards
+                are keyed by their canonical form so symmetric positions
+                share one entry, the evaluator must be symmetric under them
+        """
+        self.symmetries = symmetries
+        if max_bytes is not None:
+            max_entries = max_bytes // ENTRY_BYTES
+        # Power of two bucket count, two entries per bucket
+        self.index_bits = max(1, (max(2, max_entries) // 2).bit_length() - 1)
+        self.bucket_count = 1 << self.index_bits
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stores = 0
+        self.clear()
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        self._deep = [None] * self.bucket_count
+        self._recent = [None] * self.bucket_count
+
+    def _index(self, key):
+        """Spread the packed key over the buckets"""
+        return ((key * _HASH_MULTIPLIER) & _MASK_64) >> (64 - self.index_bits)
+
+    def lookup(self, bits, depth, is_player_turn):
+        """
+        Find a stored value
+        Args:
+            bits: int - bitboard
+            depth: int - remaining search depth
+            is_player_turn: bool - node type
+        Returns: float or None if not stored
+        """
+        if self.symmetries is not None:
+            bits = canonical_key(bits, self.symmetries)
+        key = (bits << 1) | is_player_turn
+        index = self._index(key)
+        for entry in (self._deep[index], self._recent[index]):
+            if entry is not None and entry[0] == key and entry[1] == depth:
+                self.hits += 1
+                return entry[2]
+        self.misses += 1
+        return None
+
+    def store(self, bits, depth, is_player_turn, value):
+        """Store the value of a searched node"""
+        if self.symmetries is not None:
+            bits = canonical_key(bits, self.symmetries)
+        key = (bits << 1) | is_player_turn
+        index = self._index(key)
+        entry = (key, depth, value)
+        self.stores += 1
+
+        deep = self._deep[index]
+        if deep is None or depth >= deep[1]:
+            if deep is not None and deep[0] != key:
+                self.evictions += 1
+            self._deep[index] = entry
+            return
+
+        recent = self._recent[index]
+        if recent is not None and recent[0] != key:
+            self.evictions += 1
+        self._recent[index] = entry
+
+    def __len__(self):
+        """Number of stored entries"""
+        return (sum(entry is not None for entry in self._deep) +
+                sum(entry is not None for entry in self._recent))
+
+    def stats(self):
+        """
+        Get usage counters
+        Returns: dict with hits, misses, evictions, stores, entries, hit_rate
+        """
+        return usage_stats(self)
@@ -0,0 +1,117 @@
+"""batch_evaluation.py contains a NumPy version of evaluate_board for many boards
+
+evaluate_boards scores a whole batch of boards with array operations, which
+is the building block for evaluating search frontiers and position datasets.
+Results agree with evaluate_board to floating point tolerance.
+"""
+import numpy as np
+from evaluation import WEIGHTS
+
+# Weight matrices of get_best_weighted_score, one per corner
+ORIENTATION_WEIGHTS = np.array([
+    [[15, 14, 13, 12], [11, 10, 9, 8], [7, 6, 5, 4], [3, 2, 1, 0]],
+    [[12, 13, 14, 15], [8, 9, 10, 11], [4, 5, 6, 7], [0, 1, 2, 3]],
+    [[3, 2, 1, 0], [7, 6, 5, 4], [11, 10, 9, 8], [15, 14, 13, 12]],
+    [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11], [12, 13, 14, 15]]
+], dtype=np.int64)
+
+_NIBBLE_SHIFTS = np.arange(0, 64, 4, dtype=np.uint64)
+
+
+def unpack_bitboards(bits):
+    """
+    Unpack bitboards (see bitboard.py) into tile values
+    Receives: sequence or array of N ints
+    Returns: (N, 4, 4) int64 array
+    """
+    bits = np.asarray(bits, dtype=np.uint64).reshape(-1, 1)
+    exponents = ((bits >> _NIBBLE_SHIFTS) & np.uint64(0xF)).astype(np.int64)
+    tiles = np.where(exponents > 0, 1 << exponents, 0)
+    return tiles.reshape((-1, 4, 4))
+
+
+def _line_monotonicity(boards):
+    """Sum of max(increase, decrease) over the rows of every board"""
+    left = boards[:, :, :-1]
+    right = boards[:, :, 1:]
+    both = (left != 0) & (right != 0)
+    inc = np.where(both & (left < right), right - left, 0).sum(axis=2)
+    dec = np.where(both & (left > right), left - right, 0).sum(axis=2)
+    return np.maximum(inc, dec).sum(axis=1)
+
+
+def _equal_neighbours(boards):
+    """Boolean masks of cells equal to their right and bottom neighbour"""
+    horizontal = boards[:, :, :-1] == boards[:, :, 1:]
+    vertical = boards[:, :-1, :] == boards[:, 1:, :]
+    return horizontal, vertical
+
+
+def game_over_mask(boards):
+    """
+    Find the boards without moves
+    Receives: (N, 4, 4) or (N, 16) array
+    Returns: (N,) bool array
+    """
+    boards = np.asarray(boards, dtype=np.int64).reshape(-1, 4, 4)
+    return _game_over(boards, *_equal_neighbours(boards))
+
+
+def _game_over(boards, horizontal, vertical):
+    """Game over mask from precomputed neighbour masks"""
+    has_empty = (boards == 0).any(axis=(1, 2))
+    return ~(has_empty | horizontal.any(axis=(1, 2)) | vertical.any(axis=(1, 2)))
+
+
+def evaluate_boards(boards):
+    """
+    Evaluates many 2048 boards at once with the evaluate_board heuristics
+    Receives: (N, 4, 4) or (N, 16) integer array of tile values
+    Returns: (N,) float64 array of scores between 0 and 1
+    """
+    boards = np.asarray(boards, dtype=np.int64).reshape(-1, 4, 4)
+    if boards.shape[0] == 0:
+        return np.zeros(0)
+
+    board_sum = boards.sum(axis=(1, 2))
+    max_val = boards.max(axis=(1, 2))
+    has_sum = board_sum > 0
+    safe_sum = np.where(has_sum, board_sum, 1)
+    safe_max = np.where(max_val > 0, max_val, 1)
+
+    # 1. Empty cells score, the terms are in the order of WEIGHTS
+    terms = [(boards == 0).sum(axis=(1, 2)) / 16.0]
+
+    # 2. Monotonicity of rows and columns
+    total_mono = (_line_monotonicity(boards) +
+                  _line_monotonicity(boards.transpose(0, 2, 1)))
+    terms.append(np.where(
+        has_sum, np.minimum(1.0, total_mono / (safe_sum * 2)), 0.0))
+
+    # 3. Corner weight
+    corners = np.stack([boards[:, 0, 0], boards[:, 0, 3],
+                        boards[:, 3, 0], boards[:, 3, 3]], axis=1)
+    terms.append(np.where(max_val > 0, corners.max(axis=1) / safe_max, 0.0))
+
+    # 4. Merge potential
+    horizontal, vertical = _equal_neighbours(boards)
+    merge_potential = (
+        np.where(horizontal & (boards[:, :, :-1] != 0),
+                 boards[:, :, :-1], 0).sum(axis=(1, 2)) +
+        np.where(vertical & (boards[:, :-1, :] != 0),
+                 boards[:, :-1, :], 0).sum(axis=(1, 2)))
+    terms.append(np.where(has_sum, merge_potential / safe_sum, 0.0))
+
+    # 5. Weighted sum for the best orientation
+    weighted = np.einsum('nij,oij->no', boards, ORIENTATION_WEIGHTS)
+    terms.append(np.where(has_sum, np.maximum(weighted.max(axis=1), 0) /
+                          (safe_sum * 15), 0.0))
+
+    # 6. Max tile score
+    terms.append(np.where(max_val > 0, np.log2(safe_max) / 17.0, 0.0))
+
+    # Added in the same order as evaluate_board
+    total_score = sum(weight * term for weight, term in zip(WEIGHTS, terms))
+    scores = np.clip(total_score, 0.0, 1.0)
+    scores[_game_over(boards, horizontal, vertical)] = 0.0
+    return scores
@@ -0,0 +1,129 @@
+"""allocations.py counts the objects the expectiminimax search builds per node
+
+Every Game2048 and every 4x4 list board (an outer list and four row lists)
+built while searching is counted with a profile hook, together with the
+number of search nodes. Bitboards are plain ints, so a search that stays on
+bitboards builds neither.
+
+Run from src: python -m benchmarks.allocations [--depth 3] [--boards 20]
+"""
+import argparse
+import random
+import sys
+import time
+from algorithms.expectiminimax import get_best_move_expectiminimax, search
+from algorithms.search_context import SearchContext
+from bitboard import to_board
+from evaluation_tables import evaluate_with_tables
+from game import Game2048
+
+# Objects in one list board: the outer list and four rows
+BOARD_OBJECTS = 5
+
+_NODE_CODES = {search.__code__}
+_GAME_CODES = {Game2048.__init__.__code__}
+_BOARD_CODES = {Game2048.create_empty_board.__code__,
+                Game2048.set_board.__code__,
+                Game2048.get_board_copy.__code__,
+                to_board.__code__}
+
+
+class AllocationCounter:
+    """Profile hook counting search nodes, games and list boards"""
+
+    def __init__(self):
+        self.nodes = 0
+        self.games = 0
+        self.boards = 0
+
+    def __call__(self, frame, event, arg):  # pylint: disable=unused-argument
+        if event != "call":
+            return
+        code = frame.f_code
+        if code in _NODE_CODES:
+            self.nodes += 1
+        elif code in _GAME_CODES:
+            self.games += 1
+        elif code in _BOARD_CODES:
+            self.boards += 1
+
+
+def sample_boards(count, seed=0):
+    """Bitboards of a randomly played game, one every five moves"""
+    rng = random.Random(seed)
+    state = random.getstate()
+    random.seed(seed)
+    game = Game2048()
+    boards = []
+    while not game.is_game_over() and len(boards) < count:
+        boards.append(game.get_bitboard())
+        for _ in range(5):
+            game.make_move(rng.choice("wasd"))
+    random.setstate(state)
+    return boards
+
+
+def _search_all(games, depth, evaluator):
+    """Pick a move on every game with a fresh context"""
+    for game in games:
+        get_best_move_expectiminimax(game, depth,
+                                     context=SearchContext(evaluator=evaluator))
+
+
+def measure_allocations(boards, depth, evaluator=None):
+    """
+    Search every board once with and once without the profile hook
+    Returns: dict with nodes and games, list boards, objects and
+    microseconds per node
+    """
+    games = []
+    for bits in boards:
+        game = Game2048()
+        game.set_bitboard(bits)
+        games.append(game)
+
+    counter = AllocationCounter()
+    sys.setprofile(counter)
+    try:
+        _search_all(games, depth, evaluator)
+    finally:
+        sys.setprofile(None)
+
+    start = time.perf_counter()
+    _search_all(games, depth, evaluator)
+    elapsed = time.perf_counter() - start
+
+    nodes = max(counter.nodes, 1)
+    return {
+        'nodes': counter.nodes,
+        'games_per_node': counter.games / nodes,
+        'boards_per_node': counter.boards / nodes,
+        'objects_per_node': (counter.games +
+                             BOARD_OBJECTS * counter.boards) / nodes,
+        'us_per_node': elapsed * 1e6 / nodes
+    }
+
+
+def main(argv=None):
+    """Print the allocation counts for both leaf evaluators"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--boards", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    boards = sample_boards(args.boards)
+    print(f"Depth {args.depth}, {len(boards)} boards")
+    print(f"{'evaluator':<22}{'nodes':>9}{'games':>8}{'boards':>8}"
+          f"{'objects':>9}{'us':>8}   (per node)")
+    for name, evaluator in (("evaluate_board", None),
+                            ("evaluate_with_tables", evaluate_with_tables)):
+        result = measure_allocations(boards, args.depth, evaluator)
+        print(f"{name:<22}{result['nodes']:>9}"
+              f"{result['games_per_node']:>8.2f}"
+              f"{result['boards_per_node']:>8.2f}"
+              f"{result['objects_per_node']:>9.2f}"
+              f"{result['us_per_node']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""canonical_cache.py compares a transposition table keyed by board with one keyed
+by the canonical form of the board (see symmetry.py in src)
+
+For every depth the same boards are searched with a fresh table per move.
+Every table miss is a node that had to be expanded, so the effective hit
+rate is the share of the probes of the plain search that did not need an
+expansion, and effective nodes per second is the number of probes of the
+plain search divided by the time taken.
+
+Run from src: python -m benchmarks.canonical_cache [--depths 3 4 5] [--boards 10]
+"""
+import argparse
+import time
+from algorithms.expectiminimax import get_best_move_expectiminimax
+from algorithms.search_context import SearchContext
+from algorithms.transposition import TranspositionTable
+from benchmarks.allocations import sample_boards
+from evaluation_tables import evaluate_with_tables
+from game import Game2048
+from symmetry import EVALUATION_SYMMETRIES
+
+
+def run_searches(boards, depth, symmetries):
+    """
+    Pick a move on every board with a fresh table
+    Returns: dict with moves, misses, probes and seconds
+    """
+    moves = []
+    misses = probes = 0
+    elapsed = 0.0
+    for bits in boards:
+        game = Game2048()
+        game.set_bitboard(bits)
+        table = TranspositionTable(symmetries=symmetries)
+        context = SearchContext(table=table, evaluator=evaluate_with_tables)
+        start = time.perf_counter()
+        moves.append(get_best_move_expectiminimax(game, depth, context=context))
+        elapsed += time.perf_counter() - start
+        stats = table.stats()
+        misses += stats['misses']
+        probes += stats['hits'] + stats['misses']
+    return {'moves': moves, 'misses': misses, 'probes': probes,
+            'seconds': elapsed}
+
+
+def compare(boards, depth):
+    """
+    Search the boards with and without canonical keys
+    Returns: dict with both hit rates, effective nodes per second and the
+    number of boards where the chosen move is the same
+    """
+    plain = run_searches(boards, depth, None)
+    symmetric = run_searches(boards, depth, EVALUATION_SYMMETRIES)
+    probes = max(plain['probes'], 1)
+    return {
+        'plain_hit_rate': 1 - plain['misses'] / probes,
+        'symmetric_hit_rate': 1 - symmetric['misses'] / probes,
+        'plain_nodes_per_second': plain['probes'] / plain['seconds'],
+        'symmetric_nodes_per_second': plain['probes'] / symmetric['seconds'],
+        'same_moves': sum(a == b for a, b in zip(plain['moves'],
+                                                  symmetric['moves']))
+    }
+
+
+def main(argv=None):
+    """Print the comparison for every depth"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depths", type=int, nargs="+", default=[3, 4, 5])
+    parser.add_argument("--boards", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    boards = sample_boards(args.boards)
+    print(f"{len(boards)} boards, fresh table per move")
+    print(f"{'depth':>5}{'hit rate':>18}{'nodes/s':>22}{'same move':>11}")
+    for depth in args.depths:
+        result = compare(boards, depth)
+        print(f"{depth:>5}"
+              f"{result['plain_hit_rate']:>8.1%} ->{result['symmetric_hit_rate']:>7.1%}"
+              f"{result['plain_nodes_per_second']:>10.0f} ->"
+              f"{result['symmetric_nodes_per_second']:>9.0f}"
+              f"{result['same_moves']:>7}/{len(boards)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""corpus.py contains a frozen set of boards for benchmarks
+
+The boards were taken from four seeded depth 2 expectiminimax games (seeds
+0 to 3): the board after 10 moves, the board halfway through the game and
+the board 10 moves before the game ended. They are stored as bitboards (see
+bitboard.py), so later changes to the game or the search cannot change the
+positions the benchmarks time.
+"""
+
+# Many empty cells, small tiles
+OPENING = (0x0000000100004222, 0x3110300010000020,
+           0x0000100000300024, 0x0010000000021133)
+
+# 2 to 4 empty cells, largest tile 128 to 512
+MIDGAME = (0x1100130065327543, 0x7263274265121300,
+           0x2349156242212100, 0x0020223014614517)
+
+# At most one empty cell, close to the end of the game
+ENDGAME = (0x3131454176528220, 0x7325691343713201,
+           0x23A1247536231412, 0x2316463834111416)
+
+PHASES = {"opening": OPENING, "midgame": MIDGAME, "endgame": ENDGAME}
+
+CORPUS = OPENING + MIDGAME + ENDGAME
+
+# Seeds of the whole game workloads
+GAME_SEEDS = (0, 1)
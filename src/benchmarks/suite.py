@@ -0,0 +1,264 @@
+"""suite.py times the game and the search on the frozen corpus
+
+Micro benchmarks time single operations over every corpus board, macro
+benchmarks time a move choice at depths 2 to 5 and whole seeded games. Each
+benchmark is timed with timeit (enough calls for 0.2 s, repeated) and the
+best time per call is kept, the least noisy figure on a busy machine.
+
+Every run is appended to a JSON history file. With a baseline file the run
+is compared against it and the exit status is 1 if any benchmark got slower
+than the threshold allows.
+
+Run from src: python -m benchmarks.suite [--save-baseline] [--names move]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from algorithms.expectiminimax import get_best_move_expectiminimax
+from algorithms.search_context import SearchContext
+from benchmarks.corpus import CORPUS, GAME_SEEDS
+from bitboard import to_board
+from evaluation import evaluate_board
+from game import Game2048, UP, DOWN, LEFT, RIGHT
+from spawns import SpawnStream
+
+HISTORY_FILE = "benchmark_history.json"
+BASELINE_FILE = "benchmark_baseline.json"
+# Allowed slowdown against the baseline, 0.1 is 10 %
+THRESHOLD = 0.1
+SEARCH_DEPTHS = (2, 3, 4, 5)
+GAME_DEPTH = 2
+
+
+def _games():
+    """A game for every corpus board"""
+    games = []
+    for bits in CORPUS:
+        game = Game2048()
+        game.set_bitboard(bits)
+        games.append(game)
+    return games
+
+
+def combine_row_workload():
+    """Combine every row of every corpus board"""
+    game = Game2048()
+    rows = [row for bits in CORPUS for row in to_board(bits)]
+    return lambda: [game.combine_row(list(row)) for row in rows]
+
+
+def make_move_workload():
+    """Make every move on every corpus board, spawns come from a fixed seed"""
+    game = Game2048()
+
+    def run():
+        game.rng = SpawnStream(0)
+        for bits in CORPUS:
+            for direction in (UP, DOWN, LEFT, RIGHT):
+                game.set_bitboard(bits)
+                game.make_move(direction)
+    return run
+
+
+def evaluate_board_workload():
+    """Evaluate every corpus board"""
+    boards = [to_board(bits) for bits in CORPUS]
+    return lambda: [evaluate_board(board) for board in boards]
+
+
+def has_moves_available_workload():
+    """Check every corpus board for moves"""
+    games = _games()
+    return lambda: [game.has_moves_available() for game in games]
+
+
+def search_workload(depth):
+    """Pick a move on every corpus board with a fresh context"""
+    games = _games()
+    return lambda: [get_best_move_expectiminimax(game, depth,
+                                                 context=SearchContext())
+                    for game in games]
+
+
+def game_workload(depth=GAME_DEPTH):
+    """Play the seeded games to the end"""
+    def run():
+        for seed in GAME_SEEDS:
+            game = Game2048(rng=SpawnStream(seed))
+            while not game.is_game_over():
+                game.make_move(get_best_move_expectiminimax(game, depth))
+    return run
+
+
+def benchmarks(depths=SEARCH_DEPTHS):
+    """
+    All benchmarks in the order they run
+    Returns: dict name -> function building the timed callable
+    """
+    suite = {
+        "combine_row": combine_row_workload,
+        "make_move": make_move_workload,
+        "evaluate_board": evaluate_board_workload,
+        "has_moves_available": has_moves_available_workload,
+    }
+    for depth in depths:
+        suite[f"search_depth_{depth}"] = lambda depth=depth: search_workload(depth)
+    suite[f"games_depth_{GAME_DEPTH}"] = game_workload
+    return suite
+
+
+def time_workload(workload, repeat=3):
+    """
+    Time a callable with timeit
+    Returns: dict with best and median seconds per call, calls per timing
+    and repeat
+    """
+    timer = timeit.Timer(workload)
+    number, _ = timer.autorange()
+    times = [elapsed / number for elapsed in timer.repeat(repeat, number)]
+    return {'best': min(times), 'median': statistics.median(times),
+            'number': number, 'repeat': repeat}
+
+
+def run_suite(names=None, depths=SEARCH_DEPTHS, repeat=3):
+    """
+    Run the benchmarks
+    Args:
+        names: list of str - only run benchmarks whose name contains one of
+            these (all if not given)
+        depths: search depths of the search benchmarks
+        repeat: int - timings per benchmark
+    Returns: dict - run record with the results by benchmark name
+    """
+    results = {}
+    for name, build in benchmarks(depths).items():
+        if names and not any(part in name for part in names):
+            continue
+        results[name] = time_workload(build(), repeat)
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec="seconds"),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results
+    }
+
+
+def _git_commit():
+    """Commit of the working tree, None outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True,
+                              timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def append_history(record, path=HISTORY_FILE):
+    """Add a run record to the JSON list in the history file"""
+    history = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            history = json.load(file)
+    history.append(record)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(history, file, indent=1)
+
+
+def load_record(path):
+    """Read a run record, None if the file does not exist"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_record(record, path):
+    """Write a run record, for example as the new baseline"""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(record, file, indent=1)
+
+
+def compare(record, baseline, threshold=THRESHOLD):
+    """
+    Compare the best times of a run with a baseline run
+    Args:
+        threshold: float - allowed slowdown, 0.1 allows 10 %
+    Returns: list of dicts with name, baseline, current, ratio and
+    regressed for the benchmarks found in both runs
+    """
+    rows = []
+    for name, result in record['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['best']
+        ratio = result['best'] / before
+        rows.append({'name': name, 'baseline': before,
+                     'current': result['best'], 'ratio': ratio,
+                     'regressed': ratio > 1 + threshold})
+    return rows
+
+
+def _format_time(seconds):
+    """Seconds with a readable unit"""
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def main(argv=None):
+    """Run the suite, store it and compare it with the baseline"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", nargs="+", default=None,
+                        help="only run benchmarks containing these names")
+    parser.add_argument("--depths", type=int, nargs="+",
+                        default=list(SEARCH_DEPTHS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    record = run_suite(args.names, args.depths, args.repeat)
+    append_history(record, args.history)
+    baseline = load_record(args.baseline)
+    if args.save_baseline:
+        save_record(record, args.baseline)
+
+    print(f"{'benchmark':<22}{'best':>11}{'median':>11}", end="")
+    rows = {}
+    if baseline is not None and not args.save_baseline:
+        rows = {row['name']: row for row in
+                compare(record, baseline, args.threshold)}
+        print(f"{'baseline':>11}{'change':>9}", end="")
+    print()
+    for name, result in record['results'].items():
+        line = (f"{name:<22}{_format_time(result['best']):>11}"
+                f"{_format_time(result['median']):>11}")
+        if name in rows:
+            row = rows[name]
+            line += (f"{_format_time(row['baseline']):>11}"
+                     f"{row['ratio'] - 1:>+8.1%}"
+                     + (" REGRESSION" if row['regressed'] else ""))
+        print(line)
+
+    regressions = [row['name'] for row in rows.values() if row['regressed']]
+    if regressions:
+        print(f"{len(regressions)} benchmarks slower than the baseline "
+              f"by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""table_sharing.py compares per-process transposition tables with one table
+in shared memory when games are played in several processes
+
+The same seeded games are played at every worker count, once with a table
+that each process keeps for the games it plays and once with a single
+SharedTranspositionTable. The hit rate is over all table probes of all
+processes.
+
+Run from src: python -m benchmarks.table_sharing [--workers 1 2 4 8]
+"""
+import argparse
+import time
+from algorithms.shared_table import SharedTranspositionTable
+from measure import (game_seeds, iter_game_results, reset_process_table,
+                     TABLE_ENTRIES)
+
+
+def play(num_games, depth, workers, shared, seed):
+    """
+    Play the games with one kind of table
+    Returns: dict with seconds, hit_rate and moves
+    """
+    options = {}
+    table = None
+    reset_process_table()
+    if shared:
+        table = SharedTranspositionTable(max_entries=TABLE_ENTRIES)
+        options['shared_table'] = table
+    else:
+        options['table_entries'] = TABLE_ENTRIES
+
+    start = time.perf_counter()
+    try:
+        config = {'algorithm': "expectiminimax", 'depth': depth,
+                  'options': options}
+        results = list(iter_game_results(config, game_seeds(num_games, seed),
+                                         workers))
+    finally:
+        if table is not None:
+            table.close()
+    elapsed = time.perf_counter() - start
+
+    lookups = sum(r['table_lookups'] for r in results)
+    return {
+        'seconds': elapsed,
+        'hit_rate': sum(r['table_hits'] for r in results) / max(lookups, 1),
+        'moves': sum(r['moves'] for r in results)
+    }
+
+
+def main(argv=None):
+    """Print the comparison for every worker count"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--games", type=int, default=8)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{args.games} games at depth {args.depth}, seed {args.seed}")
+    print(f"{'workers':>7}{'hit rate':>20}{'moves/s':>20}")
+    for workers in args.workers:
+        local = play(args.games, args.depth, workers, False, args.seed)
+        shared = play(args.games, args.depth, workers, True, args.seed)
+        print(f"{workers:>7}"
+              f"{local['hit_rate']:>9.1%} ->{shared['hit_rate']:>7.1%}"
+              f"{local['moves'] / local['seconds']:>11.0f} ->"
+              f"{shared['moves'] / shared['seconds']:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
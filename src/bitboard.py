@@ -0,0 +1,233 @@
+"""bitboard.py contains a 64-bit integer representation of the 2048 board
+
+Every cell is stored as a 4-bit log2 exponent (0 = empty, 1 = 2, 2 = 4, ...,
+15 = 32768). Cell (i, j) lives in nibble 4 * i + j, so row i is the 16-bit
+value (bits >> 16 * i) & 0xFFFF with column 0 in its lowest nibble.
+Boards are plain ints: immutable, cheap to copy and hashable.
+"""
+import random
+
+UP = "up"
+DOWN = "down"
+RIGHT = "right"
+LEFT = "left"
+
+ROW_MASK = 0xFFFF
+MAX_EXPONENT = 15
+MAX_TILE = 1 << MAX_EXPONENT
+
+_EXPONENTS = {0: 0}
+for _exponent in range(1, MAX_EXPONENT + 1):
+    _EXPONENTS[1 << _exponent] = _exponent
+
+
+def to_bitboard(board, clamp=False):
+    """
+    Pack a 4x4 list board into an int
+    Args:
+        clamp: bool - pack tiles larger than 32768 as 32768 instead of
+            raising, the board then no longer unpacks to itself
+    Raises ValueError for tiles that are not representable (not a power of
+    two or larger than 32768)
+    """
+    bits = 0
+    shift = 0
+    for row in board:
+        for cell in row:
+            if clamp and cell > MAX_TILE:
+                cell = MAX_TILE
+            try:
+                bits |= _EXPONENTS[cell] << shift
+            except KeyError as error:
+                raise ValueError(f"Tile {cell} does not fit a bitboard") from error
+            shift += 4
+    return bits
+
+
+def to_board(bits):
+    """Unpack an int board back into a 4x4 list board"""
+    board = []
+    for _ in range(4):
+        row = []
+        for _ in range(4):
+            exponent = bits & 0xF
+            row.append(1 << exponent if exponent else 0)
+            bits >>= 4
+        board.append(row)
+    return board
+
+
+def fits_bitboard(board):
+    """Check if every tile of a list board can be packed"""
+    return all(cell in _EXPONENTS for row in board for cell in row)
+
+
+def get_tile(bits, i, j):
+    """Get the tile value (not the exponent) at row i, column j"""
+    exponent = (bits >> (4 * (4 * i + j))) & 0xF
+    return 1 << exponent if exponent else 0
+
+
+def transpose(bits):
+    """Swap rows and columns of the board"""
+    a1 = bits & 0xF0F00F0FF0F00F0F
+    a2 = bits & 0x0000F0F00000F0F0
+    a3 = bits & 0x0F0F00000F0F0000
+    bits = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = bits & 0xFF00FF0000FF00FF
+    b2 = bits & 0x00FF00FF00000000
+    b3 = bits & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def reverse_row(row):
+    """Mirror a 16-bit row so column 0 becomes column 3"""
+    return (((row & 0xF) << 12) | ((row & 0xF0) << 4)
+            | ((row >> 4) & 0xF0) | ((row >> 12) & 0xF))
+
+
+def move_row_left(row):
+    """
+    Slide and combine a single 16-bit row to the left
+    Two 32768 tiles are not combined because the result would not fit a nibble
+    """
+    exponents = [(row >> shift) & 0xF for shift in (0, 4, 8, 12)]
+    tiles = [exponent for exponent in exponents if exponent]
+    result = []
+    i = 0
+    while i < len(tiles):
+        if i + 1 < len(tiles) and tiles[i + 1] == tiles[i] < MAX_EXPONENT:
+            result.append(tiles[i] + 1)
+            i += 2
+        else:
+            result.append(tiles[i])
+            i += 1
+    new_row = 0
+    for position, exponent in enumerate(result):
+        new_row |= exponent << (4 * position)
+    return new_row
+
+
+def move_row_right(row):
+    """Slide and combine a single 16-bit row to the right"""
+    return reverse_row(move_row_left(reverse_row(row)))
+
+
+# Every possible 16-bit row is moved once at import time. A move on the whole
+# board is then four table lookups, UP and DOWN go through transpose.
+ROW_LEFT = [move_row_left(row) for row in range(1 << 16)]
+ROW_RIGHT = [reverse_row(ROW_LEFT[reverse_row(row)]) for row in range(1 << 16)]
+ROW_LEFT_MOVED = bytes(ROW_LEFT[row] != row for row in range(1 << 16))
+ROW_RIGHT_MOVED = bytes(ROW_RIGHT[row] != row for row in range(1 << 16))
+
+
+def _move_rows(bits, table, moved_table):
+    """Look up the four rows of the board in a move table"""
+    row0 = bits & ROW_MASK
+    row1 = (bits >> 16) & ROW_MASK
+    row2 = (bits >> 32) & ROW_MASK
+    row3 = bits >> 48
+    new_bits = (table[row0] | (table[row1] << 16)
+                | (table[row2] << 32) | (table[row3] << 48))
+    moved = (moved_table[row0] or moved_table[row1]
+             or moved_table[row2] or moved_table[row3])
+    return new_bits, bool(moved)
+
+
+def move(bits, direction):
+    """
+    Move in the direction given
+    Returns: tuple (new bits, True if the board changed)
+    """
+    if direction == LEFT:
+        return _move_rows(bits, ROW_LEFT, ROW_LEFT_MOVED)
+    if direction == RIGHT:
+        return _move_rows(bits, ROW_RIGHT, ROW_RIGHT_MOVED)
+    if direction == UP:
+        new_bits, moved = _move_rows(transpose(bits), ROW_LEFT, ROW_LEFT_MOVED)
+        return transpose(new_bits), moved
+    if direction == DOWN:
+        new_bits, moved = _move_rows(
+            transpose(bits), ROW_RIGHT, ROW_RIGHT_MOVED)
+        return transpose(new_bits), moved
+    return bits, False
+
+
+def legal_moves(bits):
+    """
+    Get the moves that change the board
+    Returns: list of (direction, new bits) in UP, DOWN, LEFT, RIGHT order
+    """
+    moves = []
+    for direction in (UP, DOWN, LEFT, RIGHT):
+        new_bits, moved = move(bits, direction)
+        if moved:
+            moves.append((direction, new_bits))
+    return moves
+
+
+def empty_cells(bits):
+    """Get the nibble indexes (4 * i + j) of all empty cells"""
+    return [index for index in range(16) if not (bits >> (4 * index)) & 0xF]
+
+
+def count_empty(bits):
+    """Count the empty cells of the board"""
+    # Fold every nibble into its lowest bit: 1 if the cell is occupied
+    bits |= (bits >> 2) & 0x3333333333333333
+    bits |= bits >> 1
+    bits &= 0x1111111111111111
+    return 16 - bin(bits).count("1")
+
+
+def max_exponent(bits):
+    """Get the largest exponent on the board"""
+    best = 0
+    while bits:
+        best = max(best, bits & 0xF)
+        bits >>= 4
+    return best
+
+
+def max_tile(bits):
+    """Get the largest tile value on the board"""
+    exponent = max_exponent(bits)
+    return 1 << exponent if exponent else 0
+
+
+def spawn_tile(bits, index, exponent):
+    """Place a tile with the given exponent into empty nibble index"""
+    return bits | (exponent << (4 * index))
+
+
+def add_random_tile(bits, rng=None):
+    """
+    Add a random tile (2 or 4) to an empty cell, drawing like
+    Game2048.add_random_tile from rng (the random module if not given)
+    """
+    cells = empty_cells(bits)
+    if not cells:
+        return bits
+    if rng is None:
+        rng = random
+    index = rng.choice(cells)
+    # 90% chance for 2, 10% chance for 4
+    return spawn_tile(bits, index, 1 if rng.random() < 0.9 else 2)
+
+
+def _count_zero_nibbles(bits, nibble_mask):
+    """Count the zero nibbles of bits inside the 0x1-per-nibble mask"""
+    bits |= (bits >> 2) & 0x3333333333333333
+    bits |= bits >> 1
+    return bin(nibble_mask).count("1") - bin(bits & nibble_mask).count("1")
+
+
+def is_game_over(bits):
+    """Check if the game is over (no moves available)"""
+    if count_empty(bits):
+        return False
+    # Full board: a move is possible only if two neighbours are equal.
+    # XOR with the right (lower) neighbour leaves a zero nibble for each pair
+    if _count_zero_nibbles(bits ^ (bits >> 4), 0x0111011101110111):
+        return False
+    return not _count_zero_nibbles(bits ^ (bits >> 16), 0x0000111111111111)
@@ -0,0 +1,261 @@
+"""compare.py plays two configurations on the same seeds and compares them
+
+Both configurations of a pair play a game with the same SpawnStream seed,
+so they see the same tiles for as long as their boards allow. Much of the
+luck of a seed (a bad early spawn, a lucky 4) then hits both, and the
+difference B - A per seed varies far less than two independent runs do.
+The report shows the 95 % confidence interval of the mean difference next
+to the interval independent runs of the same size would give.
+
+Run from the repository root:
+python src/compare.py 200 "expectiminimax 3" "expectiminimax 4" --workers 4
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from algorithms.batched import ENGINES
+from algorithms.depth_policy import DEPTH_POLICIES, get_depth_policy
+from algorithms.search_context import MIN_PROBABILITY
+from evaluation import WEIGHTS
+from game_results import RunningStat
+from measure import (game_seeds, iter_seeded_results, play_seeded_game,
+                     with_defaults)
+from stopping import Z_95
+
+# Per game metrics, ms per move is CPU time of the playing process
+METRICS = ("score", "moves", "max_tile", "won", "ms_per_move")
+
+
+# Search settings of a configuration and their defaults
+CONFIGURATION_OPTIONS = {
+    'time_per_move': None,
+    'depth_policy': None,
+    'engine': None,
+    'min_probability': MIN_PROBABILITY,
+    'weights': None
+}
+
+
+def parse_weights(text):
+    """
+    Parse heuristic weights like "0.2,0.2,0.2,0.15,0.15,0.1"
+    Returns: tuple of floats in the order of evaluation.WEIGHTS
+    Raises ValueError for a value that is not a list of 6 numbers
+    """
+    weights = tuple(float(weight) for weight in text.split(","))
+    if len(weights) != len(WEIGHTS):
+        raise ValueError(f"Expected {len(WEIGHTS)} weights, got {text!r}")
+    return weights
+
+
+def _format_option(value):
+    """Option value as parse_configuration reads it back"""
+    if isinstance(value, float):
+        return f"{value:g}"
+    if isinstance(value, tuple):
+        return ",".join(f"{weight:g}" for weight in value)
+    return str(value)
+
+
+def make_configuration(algorithm, depth=3, label=None, **options):
+    """
+    Build a configuration, the label defaults to the string
+    parse_configuration reads back
+    Args:
+        options: search settings, CONFIGURATION_OPTIONS has the defaults,
+            depth_policy is a name in DEPTH_POLICIES and weights a tuple
+            of heuristic weights (see evaluation.WEIGHTS)
+    Returns: dict with label, algorithm, depth and the options of
+    run_single_game
+    Raises TypeError for an unknown option
+    """
+    options = with_defaults(CONFIGURATION_OPTIONS, options)
+    if label is None:
+        label = f"{algorithm} {depth}"
+        for name, default in CONFIGURATION_OPTIONS.items():
+            value = options[name]
+            if value != default:
+                flag = name.replace("_", "-")
+                label += f" --{flag} {_format_option(value)}"
+    if options['depth_policy'] is not None:
+        options['depth_policy'] = get_depth_policy(options['depth_policy'])
+    return {
+        'label': label,
+        'algorithm': algorithm,
+        'depth': depth,
+        'options': options
+    }
+
+
+def parse_configuration(spec):
+    """
+    Parse a configuration like "expectiminimax 4 --engine batched"
+    Returns: dict, see make_configuration
+    """
+    parser = argparse.ArgumentParser(prog=f"configuration {spec!r}",
+                                     add_help=False)
+    parser.add_argument("algorithm")
+    parser.add_argument("depth", nargs="?", type=int, default=3)
+    parser.add_argument("--time-per-move", type=float, default=None)
+    parser.add_argument("--depth-policy", choices=sorted(DEPTH_POLICIES),
+                        default=None)
+    parser.add_argument("--engine", choices=ENGINES, default=None)
+    parser.add_argument("--min-probability", type=float,
+                        default=MIN_PROBABILITY)
+    parser.add_argument("--weights", type=parse_weights, default=None)
+    args = parser.parse_args(spec.split())
+    return make_configuration(
+        args.algorithm, args.depth, label=spec,
+        **{name: getattr(args, name) for name in CONFIGURATION_OPTIONS})
+
+
+def play_paired_game(seed, configurations):
+    """
+    Play the seed with every configuration
+    Returns: dict with the seed and the results in configuration order
+    """
+    return {'seed': seed,
+            'results': [play_seeded_game(seed, config['algorithm'],
+                                         config['depth'], config['options'])
+                        for config in configurations]}
+
+
+def metric_value(result, metric):
+    """Value of one of METRICS in a game result"""
+    if metric == "won":
+        return int(result['won'])
+    if metric == "ms_per_move":
+        return 1000 * result.get('cpu_seconds', 0.0) / max(result['moves'], 1)
+    return result[metric]
+
+
+class PairedSummary:
+    """Running statistics of both configurations and of B - A per seed"""
+
+    def __init__(self):
+        self.pairs = 0
+        self.a = {metric: RunningStat() for metric in METRICS}
+        self.b = {metric: RunningStat() for metric in METRICS}
+        self.difference = {metric: RunningStat() for metric in METRICS}
+
+    def add(self, pair):
+        """Add the results of one seed, see play_paired_game"""
+        first, second = pair['results']
+        self.pairs += 1
+        for metric in METRICS:
+            value_a = metric_value(first, metric)
+            value_b = metric_value(second, metric)
+            self.a[metric].add(value_a)
+            self.b[metric].add(value_b)
+            self.difference[metric].add(value_b - value_a)
+
+    def interval(self, metric, z=Z_95):
+        """
+        Confidence interval of the mean difference B - A
+        Returns: tuple (low, high)
+        """
+        stat = self.difference[metric]
+        half = z * stat.stdev / math.sqrt(self.pairs) if self.pairs else math.inf
+        return (stat.mean - half, stat.mean + half)
+
+    def independent_half_width(self, metric, z=Z_95):
+        """Half width the interval would have with independent games"""
+        if not self.pairs:
+            return math.inf
+        return z * math.sqrt((self.a[metric].variance +
+                              self.b[metric].variance) / self.pairs)
+
+
+def compare_configurations(num_games, configurations, workers=None,
+                           seed=None):
+    """
+    Play every seed with both configurations, Ctrl-C stops the run and
+    reports the pairs played so far
+    Args:
+        configurations: two dicts, see parse_configuration
+        workers: int - play pairs in this many processes
+        seed: int - master seed (random if not given)
+    Returns: PairedSummary
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(1 << 32)
+    for name, config in zip("AB", configurations):
+        print(f"{name}: {config['label']}")
+    print(f"{num_games} seeds | Seed: {seed}" +
+          (f" | Workers: {workers}" if workers else ""))
+    print("-" * 50)
+
+    summary = PairedSummary()
+    start_time = time.time()
+    pairs = iter_seeded_results(play_paired_game, (configurations,),
+                                game_seeds(num_games, seed), workers)
+    try:
+        for pair in pairs:
+            summary.add(pair)
+            if summary.pairs % 10 == 0:
+                print(f"Progress: {summary.pairs}/{num_games} seeds completed...")
+    except KeyboardInterrupt:
+        print(f"\nInterrupted after {summary.pairs}/{num_games} seeds")
+    finally:
+        pairs.close()
+
+    if summary.pairs:
+        print_comparison(summary, time.time() - start_time)
+    return summary
+
+
+def print_comparison(summary, elapsed_time):
+    """Print the means and the paired differences, see PairedSummary"""
+    print("\n" + "=" * 50)
+    print("PAIRED COMPARISON")
+    print("=" * 50)
+    print(f"Seeds played: {summary.pairs} ({elapsed_time:.1f} seconds)")
+    print(f"{'metric':<12}{'A':>10}{'B':>10}{'B - A':>11}"
+          f"{'95% CI paired':>24}{'independent':>14}")
+    for metric in METRICS:
+        low, high = summary.interval(metric)
+        mark = " *" if low > 0 or high < 0 else ""
+        print(f"{metric:<12}{summary.a[metric].mean:>10.4g}"
+              f"{summary.b[metric].mean:>10.4g}"
+              f"{summary.difference[metric].mean:>+11.4g}"
+              f"{f'{low:+.4g} .. {high:+.4g}':>24}"
+              f"{f'+-{summary.independent_half_width(metric):.4g}':>14}"
+              f"{mark}")
+    print("* the interval excludes zero")
+    low, high = summary.interval("score")
+    paired = (high - low) / 2
+    if paired > 0:
+        ratio = (summary.independent_half_width("score") / paired) ** 2
+        print(f"Independent runs would need about {ratio:.1f} times the "
+              "games for the same score precision")
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Compare two configurations on the same seeds")
+    parser.add_argument("games", type=int, help="number of seeds, each is "
+                        "played by both configurations")
+    parser.add_argument("a", help='configuration A, e.g. "expectiminimax 3"')
+    parser.add_argument("b", help='configuration B, e.g. '
+                        '"expectiminimax 3 --engine batched"')
+    parser.add_argument("--workers", type=int, default=None,
+                        help="play pairs in this many processes")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="master seed, the same seed gives the same "
+                        "spawns")
+    args = parser.parse_args(argv)
+    args.configurations = [parse_configuration(args.a),
+                           parse_configuration(args.b)]
+    return args
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    try:
+        compare_configurations(ARGS.games, ARGS.configurations, ARGS.workers,
+                               ARGS.seed)
+    except ValueError as error:
+        sys.exit(f"Error: {error}")
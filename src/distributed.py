@@ -0,0 +1,315 @@
+"""distributed.py hands out the games of a measurement run over TCP
+
+The coordinator (measure.py --listen HOST:PORT) owns the game seeds of the
+run. Workers on any machine (measure.py --connect HOST:PORT) take one seed
+at a time, play it and send the result back. The protocol is one JSON
+object per line, a request of the worker and the answer of the coordinator:
+
+    take      {"op": "take", "worker": id}
+              -> {"job": n, "seed": s, "config": {...}, "heartbeat": seconds}
+                 or {"wait": seconds} or {"done": true}
+    heartbeat {"op": "heartbeat", "worker": id, "job": n} -> {"ok": true}
+    finish    {"op": "finish", "worker": id, "job": n, "result": {...}}
+              -> {"ok": true}
+    fail      {"op": "fail", "worker": id, "job": n, "error": text}
+              -> {"ok": true}
+
+A taken job is leased to its worker and the worker renews the lease with
+heartbeats while it plays. The job goes back to the queue when the worker's
+connection drops or the lease runs out (a machine that hangs or is cut
+off), and a result arriving after that is only counted if the job has not
+been finished by someone else meanwhile.
+
+Only JSON is exchanged, but anyone who can reach the port can take jobs and
+send results, so listen on a trusted network.
+"""
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+
+DEFAULT_PORT = 50700
+# A job goes back to the queue this long after the last heartbeat
+LEASE_SECONDS = 60.0
+# Idle workers ask again after this long when every job is leased
+WAIT_SECONDS = 1.0
+# Workers wait this long for the coordinator to start
+CONNECT_TIMEOUT = 30.0
+# Returned by JobBoard.take when there is nothing left to do
+DONE = "done"
+
+
+def parse_address(text, default_host="127.0.0.1"):
+    """
+    Parse HOST:PORT, :PORT or HOST
+    Returns: tuple (host, port)
+    """
+    host, _, port = text.rpartition(":") if ":" in text else (text, "", "")
+    return (host or default_host, int(port) if port else DEFAULT_PORT)
+
+
+class JobBoard:  # pylint: disable=too-many-instance-attributes
+    """Waiting, leased and finished jobs, safe to use from many threads"""
+
+    def __init__(self, seeds, lease_seconds=LEASE_SECONDS,
+                 clock=time.monotonic):
+        """
+        Args:
+            seeds: game seeds, job n is seeds[n]
+            lease_seconds: float - time a worker may go without a heartbeat
+            clock: function() -> float - time source, for tests
+        """
+        self.lease_seconds = lease_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._waiting = deque(enumerate(seeds))
+        # job -> [worker, seed, deadline]
+        self._leases = {}
+        self._finished = set()
+        self._total = len(self._waiting)
+        self._closed = False
+        # (job, result) of every finished job, (job, error text) on failure
+        self.results = queue.Queue()
+        self.requeued = 0
+
+    def take(self, worker):
+        """
+        Lease the next waiting job to a worker
+        Returns: tuple (job, seed), None if every job is leased, or DONE
+        """
+        with self._lock:
+            if self._closed or len(self._finished) == self._total:
+                return DONE
+            self._expire()
+            if not self._waiting:
+                return None
+            job, seed = self._waiting.popleft()
+            self._leases[job] = [worker, seed,
+                                 self._clock() + self.lease_seconds]
+            return job, seed
+
+    def heartbeat(self, worker, job):
+        """Renew the lease of a job the worker is still playing"""
+        with self._lock:
+            lease = self._leases.get(job)
+            if lease is not None and lease[0] == worker:
+                lease[2] = self._clock() + self.lease_seconds
+
+    def finish(self, job, result):
+        """
+        Record the result of a job, whoever played it
+        Returns: bool - False if the job was already finished
+        """
+        with self._lock:
+            if job in self._finished:
+                return False
+            self._finished.add(job)
+            if self._leases.pop(job, None) is None:
+                self._waiting = deque(item for item in self._waiting
+                                      if item[0] != job)
+            self.results.put((job, result))
+            return True
+
+    def fail(self, job, error):
+        """Report a game that raised an error on the worker"""
+        self.results.put((job, RuntimeError(error)))
+
+    def drop_worker(self, worker):
+        """Put the jobs of a worker that went away back in the queue"""
+        with self._lock:
+            for job, lease in list(self._leases.items()):
+                if lease[0] == worker:
+                    self._requeue(job)
+
+    def close(self):
+        """Hand out no more jobs, workers are told they are done"""
+        with self._lock:
+            self._closed = True
+
+    def _expire(self):
+        """Requeue the jobs whose lease ran out, call with the lock held"""
+        now = self._clock()
+        for job, lease in list(self._leases.items()):
+            if lease[2] < now:
+                self._requeue(job)
+
+    def _requeue(self, job):
+        """Move a leased job to the front of the queue"""
+        _, seed, _ = self._leases.pop(job)
+        self._waiting.appendleft((job, seed))
+        self.requeued += 1
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answers the requests of one worker connection"""
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker = None
+        try:
+            for line in self.rfile:
+                request = json.loads(line)
+                worker = request.get('worker', worker)
+                answer = coordinator.answer(request)
+                self.wfile.write(json.dumps(answer).encode() + b"\n")
+        except (OSError, ValueError):
+            pass
+        finally:
+            if worker is not None:
+                coordinator.board.drop_worker(worker)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    """TCP server with a thread per worker connection"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Coordinator:
+    """Serves the jobs of a JobBoard to workers, use as a context manager"""
+
+    def __init__(self, board, config, address=("127.0.0.1", DEFAULT_PORT)):
+        """
+        Args:
+            board: JobBoard - the jobs
+            config: dict - JSON game settings sent with every job
+            address: tuple (host, port) to listen on, port 0 picks a free one
+        """
+        self.board = board
+        self.config = config
+        self._server = _Server(address, _Handler)
+        self._server.coordinator = self
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+
+    @property
+    def address(self):
+        """(host, port) the coordinator listens on"""
+        return self._server.server_address[:2]
+
+    def answer(self, request):
+        """Answer one worker request, see the protocol above"""
+        operation = request.get('op')
+        worker = request.get('worker')
+        if operation == "take":
+            job = self.board.take(worker)
+            if job == DONE:
+                return {'done': True}
+            if job is None:
+                return {'wait': WAIT_SECONDS}
+            return {'job': job[0], 'seed': job[1], 'config': self.config,
+                    'heartbeat': self.board.lease_seconds / 3}
+        if operation == "heartbeat":
+            self.board.heartbeat(worker, request['job'])
+        elif operation == "finish":
+            self.board.finish(request['job'], request['result'])
+        elif operation == "fail":
+            self.board.fail(request['job'], f"{worker}: {request['error']}")
+        else:
+            return {'error': f"Unknown operation: {operation}"}
+        return {'ok': True}
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.board.close()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _Connection:
+    """Line based JSON requests to the coordinator, shared by threads"""
+
+    def __init__(self, address, timeout=CONNECT_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self._socket = socket.create_connection(address, timeout=5)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(WAIT_SECONDS)
+        self._socket.settimeout(None)
+        self._file = self._socket.makefile("rwb")
+        self._lock = threading.Lock()
+
+    def request(self, message):
+        """
+        Send one request and read the answer
+        Raises ConnectionError if the coordinator has gone away
+        """
+        with self._lock:
+            self._file.write(json.dumps(message).encode() + b"\n")
+            self._file.flush()
+            line = self._file.readline()
+        if not line:
+            raise ConnectionError("Coordinator closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        """Close the connection"""
+        self._file.close()
+        self._socket.close()
+
+
+def _send_heartbeats(connection, worker, job, interval, stop):
+    """Renew a lease until stop is set"""
+    while not stop.wait(interval):
+        try:
+            connection.request({'op': "heartbeat", 'worker': worker,
+                                'job': job})
+        except OSError:
+            return
+
+
+def run_worker(address, play, worker=None, timeout=CONNECT_TIMEOUT):
+    """
+    Take and play jobs until the coordinator is done or goes away
+    Args:
+        address: tuple (host, port) of the coordinator
+        play: function(seed, config) -> dict - plays one game, the result
+            must be JSON serializable
+        worker: str - name of this worker, host and process id by default
+        timeout: float - seconds to wait for the coordinator to start
+    Returns: int - games played
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    connection = _Connection(address, timeout)
+    played = 0
+    try:
+        while True:
+            answer = connection.request({'op': "take", 'worker': worker})
+            if answer.get('done'):
+                return played
+            if 'wait' in answer:
+                time.sleep(answer['wait'])
+                continue
+            stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=_send_heartbeats, daemon=True,
+                args=(connection, worker, answer['job'], answer['heartbeat'],
+                      stop))
+            heartbeat.start()
+            try:
+                result = play(answer['seed'], answer['config'])
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                connection.request({'op': "fail", 'worker': worker,
+                                    'job': answer['job'], 'error': repr(error)})
+                continue
+            finally:
+                stop.set()
+                heartbeat.join()
+            connection.request({'op': "finish", 'worker': worker,
+                                'job': answer['job'], 'result': result})
+            played += 1
+    except ConnectionError:
+        return played
+    finally:
+        connection.close()
@@ -1,11 +1,24 @@
 """evaluation.py contains functions for evaluating any arbitrary 2048 board state"""
 import math
+from bitboard import to_board
 
+# Weights of the heuristic terms in evaluate_board
+EMPTY_WEIGHT = 0.20
+MONOTONICITY_WEIGHT = 0.20
+CORNER_WEIGHT = 0.20
+MERGE_WEIGHT = 0.15
+WEIGHTED_SUM_WEIGHT = 0.15
+MAX_TILE_WEIGHT = 0.10
+# The weights in the order evaluate_board adds the terms
+WEIGHTS = (EMPTY_WEIGHT, MONOTONICITY_WEIGHT, CORNER_WEIGHT, MERGE_WEIGHT,
+           WEIGHTED_SUM_WEIGHT, MAX_TILE_WEIGHT)
 
-def evaluate_board(board):
+
+def evaluate_board(board, weights=WEIGHTS):
     """
     Evaluates a 2048 board position using multiple heuristics
-    Receives: 4x4 board
+    Receives: 4x4 board, optional weights of the terms in the order of
+    WEIGHTS
     Returns: float score between 0 and 1 (higher is better)
     """
 
@@ -41,8 +54,8 @@ def evaluate_board(board):
     mono_score = calculate_monotonicity(board, board_sum)
 
     # 3. Corner weight biggest tile in corner is good
-    corners = [board[0][0], board[0][3], board[3][0], board[3][3]]
-    corner_score = max(corners) / max_val if max_val > 0 else 0
+    corner_score = (max(board[0][0], board[0][3], board[3][0], board[3][3])
+                    / max_val if max_val > 0 else 0)
 
     # 4. focus on merging adjacent equal tiles
     merge_score = merge_potential / board_sum if board_sum > 0 else 0
@@ -53,17 +66,49 @@ def evaluate_board(board):
     # 6. Prefer boards with larger maximum tiles
     max_tile_score = math.log2(max_val) / 17.0 if max_val > 0 else 0
 
-    # Calculate all scores + weights
-    total_score = (
-        0.20 * empty_score +
-        0.20 * mono_score +
-        0.20 * corner_score +
-        0.15 * merge_score +
-        0.15 * weighted_score +
-        0.10 * max_tile_score
-    )
+    # Calculate all scores + weights, clamped to [0, 1]
+    return min(1.0, max(0.0, (
+        weights[0] * empty_score +
+        weights[1] * mono_score +
+        weights[2] * corner_score +
+        weights[3] * merge_score +
+        weights[4] * weighted_score +
+        weights[5] * max_tile_score
+    )))
+
+
+def evaluate_bitboard(bits):
+    """
+    Evaluates a board packed into an int (see bitboard.py)
+    Returns: the same score as evaluate_board
+    """
+    return evaluate_board(to_board(bits))
+
+
+class WeightedEvaluator:  # pylint: disable=too-few-public-methods
+    """
+    Leaf evaluator of evaluate_board with other weights, for a
+    SearchContext. Unlike a lambda it can be sent to worker processes, and
+    its repr names the weights for the position cache settings hash.
+    """
+
+    def __init__(self, weights):
+        """
+        Args:
+            weights: sequence of 6 floats in the order of WEIGHTS
+        Raises ValueError for a different number of weights
+        """
+        if len(weights) != len(WEIGHTS):
+            raise ValueError(f"Expected {len(WEIGHTS)} weights, "
+                             f"got {len(weights)}")
+        self.weights = tuple(float(weight) for weight in weights)
+
+    def __call__(self, bits):
+        """Score a bitboard"""
+        return evaluate_board(to_board(bits), self.weights)
 
-    return min(1.0, max(0.0, total_score))
+    def __repr__(self):
+        return f"WeightedEvaluator({self.weights})"
 
 
 def has_moves_available(board):
@@ -104,8 +149,7 @@ def get_best_weighted_score(board, board_sum):
             board[3][0] * weights[3][0] + board[3][1] * weights[3][1] +
             board[3][2] * weights[3][2] + board[3][3] * weights[3][3]
         )
-        if weighted_sum > max_weighted:
-            max_weighted = weighted_sum
+        max_weighted = max(max_weighted, weighted_sum)
     return max_weighted / (board_sum * 15) if board_sum > 0 else 0
 
 
@@ -0,0 +1,134 @@
+"""evaluation_tables.py contains a lookup table version of evaluate_board
+
+Every term of evaluate_board is a sum or a max over rows and columns, so
+each possible 16-bit row (see bitboard.py) is scored once at import time.
+A leaf evaluation is then 4 row and 4 column lookups per table. All sums are
+exact integers combined in the same order as evaluate_board, so there is no
+tolerance to speak of: scores are identical for every board a bitboard can
+hold (tiles up to 32768).
+"""
+from bitboard import transpose, is_game_over, ROW_MASK
+from evaluation import (EMPTY_WEIGHT, MONOTONICITY_WEIGHT, CORNER_WEIGHT,
+                        MERGE_WEIGHT, WEIGHTED_SUM_WEIGHT, MAX_TILE_WEIGHT)
+
+
+def _score_row(row):
+    """
+    Score a single 16-bit row
+    Returns: tuple (empty cells, tile sum, sum of column * tile,
+                    monotonicity, merge potential, max exponent)
+    """
+    exponents = [(row >> shift) & 0xF for shift in (0, 4, 8, 12)]
+    tiles = [1 << exponent if exponent else 0 for exponent in exponents]
+
+    inc = dec = 0
+    merge = 0
+    for i in range(3):
+        if tiles[i] and tiles[i + 1]:
+            if tiles[i] < tiles[i + 1]:
+                inc += tiles[i + 1] - tiles[i]
+            elif tiles[i] > tiles[i + 1]:
+                dec += tiles[i] - tiles[i + 1]
+            else:
+                merge += tiles[i]
+
+    return (tiles.count(0), sum(tiles),
+            sum(column * tile for column, tile in enumerate(tiles)),
+            max(inc, dec), merge, max(exponents))
+
+
+_SCORES = [_score_row(row) for row in range(1 << 16)]
+ROW_EMPTY = [score[0] for score in _SCORES]
+ROW_SUM = [score[1] for score in _SCORES]
+ROW_POSITION_SUM = [score[2] for score in _SCORES]
+ROW_MONOTONICITY = [score[3] for score in _SCORES]
+ROW_MERGE = [score[4] for score in _SCORES]
+ROW_MAX_EXPONENT = [score[5] for score in _SCORES]
+del _SCORES
+
+
+# Rows and columns are unrolled into locals, this is the leaf evaluator
+def evaluate_with_tables(bits):  # pylint: disable=too-many-locals
+    """
+    Evaluates a bitboard with the precomputed row tables
+    Receives: int board (see bitboard.py)
+    Returns: float score between 0 and 1, equal to evaluate_board
+    """
+    if is_game_over(bits):
+        return 0.0
+
+    row0 = bits & ROW_MASK
+    row1 = (bits >> 16) & ROW_MASK
+    row2 = (bits >> 32) & ROW_MASK
+    row3 = bits >> 48
+    columns = transpose(bits)
+    col0 = columns & ROW_MASK
+    col1 = (columns >> 16) & ROW_MASK
+    col2 = (columns >> 32) & ROW_MASK
+    col3 = columns >> 48
+
+    sum0 = ROW_SUM[row0]
+    sum1 = ROW_SUM[row1]
+    sum2 = ROW_SUM[row2]
+    sum3 = ROW_SUM[row3]
+    board_sum = sum0 + sum1 + sum2 + sum3
+    max_exponent = max(ROW_MAX_EXPONENT[row0], ROW_MAX_EXPONENT[row1],
+                       ROW_MAX_EXPONENT[row2], ROW_MAX_EXPONENT[row3])
+    max_val = 1 << max_exponent if max_exponent else 0
+
+    # 1. Empty cells score
+    empty_cells = ROW_EMPTY[row0] + ROW_EMPTY[row1] + \
+        ROW_EMPTY[row2] + ROW_EMPTY[row3]
+    empty_score = empty_cells / 16.0
+
+    if board_sum == 0:
+        # Empty board, every other term is zero
+        return min(1.0, max(0.0, EMPTY_WEIGHT * empty_score))
+
+    # 2. Monotonicity of rows and columns
+    total_mono = (ROW_MONOTONICITY[row0] + ROW_MONOTONICITY[row1] +
+                  ROW_MONOTONICITY[row2] + ROW_MONOTONICITY[row3] +
+                  ROW_MONOTONICITY[col0] + ROW_MONOTONICITY[col1] +
+                  ROW_MONOTONICITY[col2] + ROW_MONOTONICITY[col3])
+    mono_score = min(1.0, total_mono / (board_sum * 2))
+
+    # 3. Corner weight, corners are nibbles 0, 3, 12 and 15
+    corner_exponent = max(bits & 0xF, (bits >> 12) & 0xF,
+                          (bits >> 48) & 0xF, bits >> 60)
+    corner_max = 1 << corner_exponent if corner_exponent else 0
+    corner_score = corner_max / max_val
+
+    # 4. Merge potential of rows and columns
+    merge_potential = (ROW_MERGE[row0] + ROW_MERGE[row1] +
+                       ROW_MERGE[row2] + ROW_MERGE[row3] +
+                       ROW_MERGE[col0] + ROW_MERGE[col1] +
+                       ROW_MERGE[col2] + ROW_MERGE[col3])
+    merge_score = merge_potential / board_sum
+
+    # 5. Weighted sum, every orientation is a linear mix of the row sums and
+    # the column weighted row sums
+    positions = (ROW_POSITION_SUM[row0] + ROW_POSITION_SUM[row1] +
+                 ROW_POSITION_SUM[row2] + ROW_POSITION_SUM[row3])
+    top_left = 15 * sum0 + 11 * sum1 + 7 * sum2 + 3 * sum3 - positions
+    top_right = 12 * sum0 + 8 * sum1 + 4 * sum2 + positions
+    bottom_left = 3 * sum0 + 7 * sum1 + 11 * sum2 + 15 * sum3 - positions
+    bottom_right = 4 * sum1 + 8 * sum2 + 12 * sum3 + positions
+    max_weighted = max(top_left, top_right, bottom_left, bottom_right)
+    weighted_score = max_weighted / (board_sum * 15)
+
+    # 6. Max tile score
+    max_tile_score = max_exponent / 17.0
+
+    # Same sum in the same order as evaluate_board, the scores are equal
+    # pylint: disable=duplicate-code
+    total_score = (
+        EMPTY_WEIGHT * empty_score +
+        MONOTONICITY_WEIGHT * mono_score +
+        CORNER_WEIGHT * corner_score +
+        MERGE_WEIGHT * merge_score +
+        WEIGHTED_SUM_WEIGHT * weighted_score +
+        MAX_TILE_WEIGHT * max_tile_score
+    )
+    # pylint: enable=duplicate-code
+
+    return min(1.0, max(0.0, total_score))
@@ -1,16 +1,26 @@
 """game.py contains core logic for the game"""
 import random
+import bitboard
+from bitboard import to_bitboard, to_board, fits_bitboard, MAX_TILE
 
 UP = "up"
 DOWN = "down"
 RIGHT = "right"
 LEFT = "left"
 
+_KEYS = {'w': UP, 's': DOWN, 'a': LEFT, 'd': RIGHT}
+
 
 class Game2048:
     """Class encompassing the game"""
 
-    def __init__(self):
+    def __init__(self, rng=None):
+        """
+        Args:
+            rng: random.Random or spawns.SpawnStream - source of the tile
+                spawns (the random module if not given)
+        """
+        self.rng = rng
         self.board = self.create_empty_board()
         self.add_random_tile()
         self.add_random_tile()
@@ -39,9 +49,10 @@ class Game2048:
         empty_cells = [(i, j) for i in range(4)
                        for j in range(4) if not self.board[i][j]]
         if empty_cells:
-            i, j = random.choice(empty_cells)
+            rng = self.rng if self.rng is not None else random
+            i, j = rng.choice(empty_cells)
             # 90% chance for 2, 10% chance for 4
-            self.board[i][j] = 2 if random.random() < 0.9 else 4
+            self.board[i][j] = 2 if rng.random() < 0.9 else 4
 
     def has_moves_available(self):
         """Check if any moves are still possible"""
@@ -74,51 +85,51 @@ class Game2048:
         Move in the direction given
         Returns True if the move was valid (board changed)
         """
-        moved = False
+        direction = _KEYS.get(direction, direction)
+        if direction not in (UP, DOWN, LEFT, RIGHT):
+            return False  # Invalid direction
 
-        if direction in ('a', LEFT):  # Left
-            for i in range(4):
-                # Combine
-                new_row = self.combine_row(self.board[i])
-                if new_row != self.board[i]:
-                    moved = True
-                    self.board[i] = new_row
-
-        elif direction in ('d', RIGHT):  # Right
-            for i in range(4):
-                # Reverse, combine, reverse
-                new_row = self.combine_row(self.board[i][::-1])[::-1]
-                if new_row != self.board[i]:
-                    moved = True
-                    self.board[i] = new_row
-
-        elif direction in ('w', UP):  # Up
-            for j in range(4):
-                # Transpose, combine, transpose back
-                col = [self.board[i][j] for i in range(4)]
-                new_col = self.combine_row(col)
-                if new_col != col:
-                    moved = True
-                    for i in range(4):
-                        self.board[i][j] = new_col[i]
-
-        elif direction in ('s', DOWN):  # Down
-            for j in range(4):
-                # Transpose, reverse, combine, reverse, transpose back
-                col = [self.board[i][j] for i in range(4)]
-                new_col = self.combine_row(col[::-1])[::-1]
-                if new_col != col:
-                    moved = True
-                    for i in range(4):
-                        self.board[i][j] = new_col[i]
+        if fits_bitboard(self.board) and max(map(max, self.board)) < MAX_TILE:
+            # Table driven move, see bitboard.py
+            new_bits, moved = bitboard.move(to_bitboard(self.board), direction)
+            if moved:
+                self.board = to_board(new_bits)
         else:
-            return False  # Invalid direction
+            moved = self.make_move_lists(direction)
 
         # Add new tile only if the board changed
         if moved:
             self.add_random_tile()
         return moved
 
+    def make_move_lists(self, direction):
+        """
+        Move without the lookup tables, used once a tile reaches 32768
+        Returns True if the board changed (no tile is added)
+        """
+        moved = False
+        horizontal = direction in (LEFT, RIGHT)
+        for i in range(4):
+            # Rows for left and right, columns for up and down
+            if horizontal:
+                line = self.board[i]
+            else:
+                line = [self.board[j][i] for j in range(4)]
+            # Reverse, combine, reverse for right and down
+            if direction in (RIGHT, DOWN):
+                new_line = self.combine_row(line[::-1])[::-1]
+            else:
+                new_line = self.combine_row(line)
+            if new_line == line:
+                continue
+            moved = True
+            if horizontal:
+                self.board[i] = new_line
+            else:
+                for j in range(4):
+                    self.board[j][i] = new_line[j]
+        return moved
+
     def board_to_string(self):
         """Convert board to string for testing"""
         lines = []
@@ -139,6 +150,29 @@ class Game2048:
         """Set the board state (useful for testing)"""
         self.board = [row[:] for row in board]
 
+    def get_bitboard(self):
+        """
+        Get the current board state packed into an int (see bitboard.py)
+        Tiles above 32768 are packed as 32768, so moves found on the
+        bitboard must be checked with legal_directions on such boards
+        """
+        return to_bitboard(self.board, clamp=True)
+
+    def legal_directions(self):
+        """Directions that change the board, checked on the list board"""
+        board = self.board
+        directions = []
+        for direction in (UP, DOWN, LEFT, RIGHT):
+            self.board = [row[:] for row in board]
+            if self.make_move_lists(direction):
+                directions.append(direction)
+        self.board = board
+        return directions
+
+    def set_bitboard(self, bits):
+        """Set the board state from an int board"""
+        self.board = to_board(bits)
+
     def is_game_over(self):
         """Check if the game is over (no moves available)"""
         return not self.has_moves_available()
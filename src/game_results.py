@@ -0,0 +1,262 @@
+"""game_results.py contains online aggregation of game results and sinks
+that write every result to a file as soon as the game has finished
+
+A GameSummary keeps running totals only, so memory stays flat however many
+games are played, and a summary can be printed at any point of a run.
+"""
+import csv
+import json
+import math
+import os
+from algorithms.search_stats import SearchStats
+from latency import MoveLatencies
+
+# Columns of a CSV sink, nested values like search stats only go to JSONL
+CSV_FIELDS = ("seed", "moves", "score", "max_tile", "won", "avg_depth",
+              "table_hits", "table_lookups", "cache_hits", "cpu_seconds")
+
+
+class RunningStat:
+    """Count, mean, variance, min and max of a stream of numbers"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        # Welford's running mean and sum of squared deviations
+        self._mean = 0.0
+        self._squares = 0.0
+
+    def add(self, value):
+        """Add one number"""
+        self.count += 1
+        self.total += value
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._squares += delta * (value - self._mean)
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other):
+        """Add the numbers of another RunningStat to these"""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other._mean - self._mean  # pylint: disable=protected-access
+        self._squares += (other._squares  # pylint: disable=protected-access
+                          + delta * delta * self.count * other.count / count)
+        self._mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        for value in (other.minimum, other.maximum):
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+
+    @property
+    def mean(self):
+        """Average, 0.0 before the first number"""
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def variance(self):
+        """Sample variance, 0.0 for fewer than two numbers"""
+        return self._squares / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        """Sample standard deviation"""
+        return math.sqrt(self.variance)
+
+
+class GameSummary:  # pylint: disable=too-many-instance-attributes
+    """Running aggregates of the results of run_single_game"""
+
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.moves = RunningStat()
+        self.score = RunningStat()
+        self.tile_counts = {}
+        # Search depth summed over moves, for the average depth per move
+        self.depth_moves = 0
+        self.depth_total = 0.0
+        self.table_hits = 0
+        self.table_lookups = 0
+        self.cache_hits = 0
+        self.cpu_seconds = 0.0
+        self.search_stats = None
+        self.move_latency = None
+
+    def add(self, result):
+        """Add the result of one game"""
+        self.games += 1
+        if result['won']:
+            self.wins += 1
+        self.moves.add(result['moves'])
+        self.score.add(result['score'])
+        max_tile = result['max_tile']
+        self.tile_counts[max_tile] = self.tile_counts.get(max_tile, 0) + 1
+        if result.get('avg_depth') is not None:
+            self.depth_moves += result['moves']
+            self.depth_total += result['avg_depth'] * result['moves']
+        self.table_hits += result.get('table_hits', 0)
+        self.table_lookups += result.get('table_lookups', 0)
+        self.cache_hits += result.get('cache_hits', 0)
+        self.cpu_seconds += result.get('cpu_seconds', 0.0)
+        if 'search_stats' in result:
+            if self.search_stats is None:
+                self.search_stats = SearchStats()
+            self.search_stats.merge(SearchStats.from_dict(result['search_stats']))
+        if 'move_latency' in result:
+            if self.move_latency is None:
+                self.move_latency = MoveLatencies()
+            self.move_latency.merge(MoveLatencies.from_dict(result['move_latency']))
+
+    @property
+    def win_rate(self):
+        """Share of won games, 0.0 before the first game"""
+        return self.wins / self.games if self.games else 0.0
+
+    @property
+    def avg_depth(self):
+        """Search depth per move, None if no game reported it"""
+        return self.depth_total / self.depth_moves if self.depth_moves else None
+
+
+class JsonlSink:
+    """Writes every result as one JSON line and flushes it"""
+
+    def __init__(self, path, append=False):
+        """
+        Args:
+            path: str - output file
+            append: bool - add to an existing file instead of replacing it
+        """
+        self.path = path
+        if append:
+            _drop_torn_line(path)
+        mode = "a" if append else "w"
+        self._file = open(path, mode, encoding="utf-8")  # pylint: disable=consider-using-with
+
+    def write(self, result):
+        """Write one result"""
+        self._file.write(json.dumps(result) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """Close the file"""
+        self._file.close()
+
+
+class CsvSink:
+    """Writes the CSV_FIELDS of every result as one row and flushes it"""
+
+    def __init__(self, path, append=False):
+        """
+        Args:
+            path: str - output file
+            append: bool - add rows to an existing file instead of replacing
+                it, the header is only written to an empty file
+        """
+        self.path = path
+        if append:
+            _drop_torn_line(path)
+        mode = "a" if append else "w"
+        self._file = open(path, mode, encoding="utf-8", newline="")  # pylint: disable=consider-using-with
+        self._writer = csv.DictWriter(self._file, CSV_FIELDS,
+                                      extrasaction="ignore")
+        if self._file.tell() == 0:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def write(self, result):
+        """Write one result"""
+        self._writer.writerow(result)
+        self._file.flush()
+
+    def close(self):
+        """Close the file"""
+        self._file.close()
+
+
+class CheckpointLog:
+    """
+    Append-only JSON lines log of a run: the run parameters on the first
+    line and then every finished game. Each line is synced to disk, so a
+    crash loses at most the game being written.
+    """
+
+    def __init__(self, path, run):
+        """
+        Args:
+            path: str - log file, appended to if it exists
+            run: dict - parameters of the run, written to a new log
+        """
+        self.path = path
+        _drop_torn_line(path)
+        self._file = open(path, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+        if self._file.tell() == 0:
+            self._append({'run': run})
+
+    def _append(self, record):
+        """Write one line and sync it to disk"""
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def write(self, result):
+        """Record one finished game"""
+        self._append({'result': result})
+
+    def close(self):
+        """Close the file"""
+        self._file.close()
+
+
+def _drop_torn_line(path):
+    """Cut a line left half written by a crash from the end of a log"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as file:
+        data = file.read()
+        if data and not data.endswith(b"\n"):
+            file.truncate(data.rfind(b"\n") + 1)
+
+
+def read_checkpoint(path):
+    """
+    Read a checkpoint log, a half written last line is ignored
+    Returns: tuple (run parameters, list of results), (None, []) if the
+    log does not exist
+    """
+    if not os.path.exists(path):
+        return None, []
+    run = None
+    results = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.endswith("\n"):
+                break
+            record = json.loads(line)
+            if 'run' in record:
+                run = record['run']
+            else:
+                results.append(record['result'])
+    return run, results
+
+
+def open_sink(path, append=False):
+    """
+    Open a result sink, the format comes from the file name
+    Args:
+        append: bool - add to an existing file, for example on resume
+    Returns: CsvSink for .csv files, JsonlSink otherwise
+    """
+    if path.lower().endswith(".csv"):
+        return CsvSink(path, append)
+    return JsonlSink(path, append)
@@ -0,0 +1,163 @@
+"""latency.py contains log-bucketed histograms of move think times
+
+A bucket covers a fixed ratio of times, BUCKETS_PER_DOUBLING buckets per
+doubling, so every bucket is about 9 % wide whether a move takes 50 us or
+5 s. A histogram is a sparse dict of bucket counts: a few dozen integers
+hold any number of moves, and histograms from different games and worker
+processes merge by adding counts. Percentiles are read from the buckets and
+are at most one bucket width too high.
+
+MoveLatencies keeps one histogram per empty cell count and one per search
+depth, the histogram of all moves is their merge.
+"""
+import math
+
+# Bucket i holds times from BASE_SECONDS * 2 ** (i / BUCKETS_PER_DOUBLING)
+BASE_SECONDS = 1e-6
+BUCKETS_PER_DOUBLING = 8
+PERCENTILES = (50, 90, 99)
+
+
+def bucket_index(seconds):
+    """Bucket of a time, times below BASE_SECONDS go to bucket 0"""
+    if seconds <= BASE_SECONDS:
+        return 0
+    return int(math.log2(seconds / BASE_SECONDS) * BUCKETS_PER_DOUBLING)
+
+
+def bucket_bounds(index):
+    """Returns: tuple (low, high) seconds of a bucket"""
+    return (BASE_SECONDS * 2 ** (index / BUCKETS_PER_DOUBLING),
+            BASE_SECONDS * 2 ** ((index + 1) / BUCKETS_PER_DOUBLING))
+
+
+class LatencyHistogram:
+    """Counts of times per bucket, with the exact count, total and max"""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        """Add one time"""
+        index = bucket_index(seconds)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def merge(self, other):
+        """Add the times of another histogram to these"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def mean(self):
+        """Average time, 0.0 before the first time"""
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """
+        Time that percent % of the times do not exceed, the upper bound of
+        its bucket but never above the maximum
+        """
+        if not self.count:
+            return 0.0
+        rank = math.ceil(percent / 100 * self.count)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_bounds(index)[1], self.maximum)
+        return self.maximum
+
+    def buckets(self):
+        """Returns: list of (low, high, count) in time order, for plotting"""
+        return [(*bucket_bounds(index), self.counts[index])
+                for index in sorted(self.counts)]
+
+    def as_dict(self):
+        """Plain dict that survives JSON and pickling"""
+        return {'counts': dict(self.counts), 'count': self.count,
+                'total': self.total, 'maximum': self.maximum}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a histogram from as_dict, JSON string keys included"""
+        histogram = cls()
+        histogram.counts = {int(index): count
+                            for index, count in data['counts'].items()}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.maximum = data['maximum']
+        return histogram
+
+
+class MoveLatencies:
+    """Move think times by empty cell count and by search depth"""
+
+    def __init__(self):
+        self.by_empty = {}
+        self.by_depth = {}
+
+    def add(self, seconds, empty, depth=None):
+        """
+        Add the think time of one move
+        Args:
+            empty: int - empty cells of the board the move was chosen on
+            depth: int - deepest finished search, None if unknown
+        """
+        self.by_empty.setdefault(empty, LatencyHistogram()).add(seconds)
+        if depth is not None:
+            self.by_depth.setdefault(depth, LatencyHistogram()).add(seconds)
+
+    def merge(self, other):
+        """Add the times of another MoveLatencies to these"""
+        for mine, theirs in ((self.by_empty, other.by_empty),
+                             (self.by_depth, other.by_depth)):
+            for key, histogram in theirs.items():
+                mine.setdefault(key, LatencyHistogram()).merge(histogram)
+
+    def overall(self):
+        """Histogram of every move"""
+        total = LatencyHistogram()
+        for histogram in self.by_empty.values():
+            total.merge(histogram)
+        return total
+
+    def as_dict(self):
+        """Plain dict that survives JSON and pickling"""
+        return {'by_empty': {key: histogram.as_dict()
+                             for key, histogram in self.by_empty.items()},
+                'by_depth': {key: histogram.as_dict()
+                             for key, histogram in self.by_depth.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild from as_dict, JSON string keys included"""
+        latencies = cls()
+        for name in ('by_empty', 'by_depth'):
+            setattr(latencies, name,
+                    {int(key): LatencyHistogram.from_dict(histogram)
+                     for key, histogram in data[name].items()})
+        return latencies
+
+    def dump(self):
+        """
+        Bucket lists of every histogram for plotting
+        Returns: dict with the bucket layout and (low, high, count) lists
+        """
+        return {
+            'base_seconds': BASE_SECONDS,
+            'buckets_per_doubling': BUCKETS_PER_DOUBLING,
+            'all': self.overall().buckets(),
+            'by_empty': {key: self.by_empty[key].buckets()
+                         for key in sorted(self.by_empty)},
+            'by_depth': {key: self.by_depth[key].buckets()
+                         for key in sorted(self.by_depth)}
+        }
@@ -1,130 +1,919 @@
 """measure.py will contain code to analyze lage quantaties of games
 Such as: average 2048 rate, average game length, average score, etc"""
 
-import sys
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import signal
 import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from algorithms.batched import ENGINES, get_engine
+from algorithms.depth_policy import DEPTH_POLICIES, get_depth_policy
 from algorithms.expectiminimax import get_best_move_expectiminimax
+from algorithms.parallel import get_best_move_parallel
+from algorithms.position_cache import PositionCache, settings_hash
+from algorithms.search_context import SearchContext, MIN_PROBABILITY
+from algorithms.search_stats import SearchStats, COUNTERS
+from algorithms.shared_table import SharedTranspositionTable
+from algorithms.transposition import TranspositionTable
 from algorithms.depth_one_move import depth_one_move
+from distributed import (Coordinator, JobBoard, WAIT_SECONDS, parse_address,
+                         run_worker)
+from bitboard import count_empty
+from evaluation import WeightedEvaluator
 from game import Game2048
+from game_results import (CheckpointLog, GameSummary, open_sink,
+                          read_checkpoint)
+from latency import MoveLatencies, PERCENTILES
+from spawns import SpawnStream
+from stopping import (METRICS, METRIC_WIN_RATE, MIN_GAMES, PrecisionRule,
+                      SprtRule)
 
+# Game seeds are master_seed * GAME_SEED_STRIDE + game index
+GAME_SEED_STRIDE = 1 << 32
 
-def run_single_game(algorithm="expectiminimax", depth=3):
+TABLE_LOCAL = "local"
+TABLE_SHARED = "shared"
+TABLE_ENTRIES = 1 << 20
+
+# Transposition table of this process, reused by every game it plays
+_process_table = None  # pylint: disable=invalid-name
+
+
+def process_table(entries):
+    """Get the transposition table of this process, it is only rebuilt if
+    the size changes"""
+    global _process_table  # pylint: disable=global-statement
+    if _process_table is None or _process_table.bucket_count * 2 != entries:
+        _process_table = TranspositionTable(max_entries=entries)
+    return _process_table
+
+
+def reset_process_table():
+    """Start the next games with an empty process table, worker processes
+    forked later inherit it"""
+    global _process_table  # pylint: disable=global-statement
+    _process_table = None
+
+
+# Keyword options of run_single_game and their defaults
+GAME_OPTIONS = {
+    'time_per_move': None,
+    'depth_policy': None,
+    'root_workers': None,
+    'engine': None,
+    'position_cache': None,
+    'cache_readonly': False,
+    'table_entries': None,
+    'shared_table': None,
+    'collect_stats': False,
+    'min_probability': MIN_PROBABILITY,
+    'weights': None,
+    'collect_latency': False
+}
+
+# Keyword options of analyze_games and their defaults
+RUN_OPTIONS = {
+    'time_per_move': None,
+    'depth_policy': None,
+    'root_workers': None,
+    'workers': None,
+    'seed': None,
+    'engine': None,
+    'position_cache': None,
+    'table': None,
+    'table_entries': TABLE_ENTRIES,
+    'min_probability': MIN_PROBABILITY,
+    'stats': False,
+    'output': None,
+    'stop_rule': None,
+    'checkpoint': None,
+    'resume': False,
+    'listen': None,
+    'latency': False,
+    'latency_dump': None
+}
+
+
+def with_defaults(defaults, options):
+    """
+    Complete keyword options with their defaults
+    Raises TypeError for a name that is not in defaults
+    """
+    unknown = sorted(set(options) - set(defaults))
+    if unknown:
+        raise TypeError(f"Unknown options: {', '.join(unknown)}")
+    return dict(defaults, **options)
+
+
+def run_single_game(algorithm="expectiminimax", depth=3, rng=None,
+                    **options):
     """
     Run a single game and return statistics
+    Args:
+        rng: random.Random or SpawnStream - source of the tile spawns
+        options: settings of the game, GAME_OPTIONS has the defaults
+            time_per_move: float - milliseconds per expectiminimax move,
+                replaces the fixed depth with iterative deepening
+            depth_policy: function(bits, depth) -> int - board dependent
+                depth
+            root_workers: int - search the root moves in this many processes
+            engine: str - expectiminimax search engine, see batched.ENGINES
+            position_cache: str - file of the persistent position cache
+            cache_readonly: bool - only warm start from the position cache
+            table_entries: int - search with a transposition table of this
+                size that the process keeps between games
+            shared_table: SharedTranspositionTable - search with a table
+                shared by every process instead
+            collect_stats: bool - count the search nodes, the counters are
+                in result['search_stats'] (see SearchStats.as_dict)
+            min_probability: float - chance node cutoff of the search, see
+                SearchContext
+            weights: tuple of 6 floats - evaluate the leaves with these
+                heuristic weights (see evaluation.WEIGHTS) instead of the
+                defaults
+            collect_latency: bool - time every move, the histograms are in
+                result['move_latency'] (see MoveLatencies.as_dict)
     Returns: dict with game statistics
+    Raises TypeError for an unknown option
     """
-    game = Game2048()
+    options = with_defaults(GAME_OPTIONS, options)
+    context = SearchContext(
+        stats=SearchStats() if options['collect_stats'] else None,
+        min_probability=options['min_probability'])
+    context.depth_policy = options['depth_policy']
+    if options['weights'] is not None:
+        context.evaluator = WeightedEvaluator(options['weights'])
+    if options['shared_table'] is not None:
+        context.table = options['shared_table']
+    elif options['table_entries']:
+        context.table = process_table(options['table_entries'])
+    if options['position_cache'] is None:
+        return _play_game(context, algorithm, depth, rng, options)
+
+    cache = PositionCache(options['position_cache'], settings_hash(context),
+                          readonly=options['cache_readonly'])
+    context.position_cache = cache
+    try:
+        result = _play_game(context, algorithm, depth, rng, options)
+    finally:
+        cache.close()
+    result['cache_hits'] = cache.hits
+    return result
+
+
+def _play_game(context, algorithm, depth, rng, options):
+    """Play one game with the given search context, see run_single_game"""
+    cpu_start = time.process_time()
+    table = context.table
+    table_hits = table_lookups = 0
+    if table is not None:
+        table_hits = table.hits
+        table_lookups = table.hits + table.misses
+
+    game = Game2048(rng=rng)
+    moves, won, depths, latencies = _play_moves(game, context, algorithm,
+                                                depth, options)
+    result = {
+        'moves': moves,
+        'score': game.get_board_sum(),
+        'max_tile': max(max(row) for row in game.board),
+        'won': won,
+        'avg_depth': sum(depths) / len(depths) if depths else None,
+        # CPU time of this process, root worker processes are not included
+        'cpu_seconds': time.process_time() - cpu_start
+    }
+    if table is not None:
+        result['table_hits'] = table.hits - table_hits
+        result['table_lookups'] = table.hits + table.misses - table_lookups
+    if context.stats is not None:
+        result['search_stats'] = context.stats.as_dict()
+    if latencies is not None:
+        result['move_latency'] = latencies.as_dict()
+    return result
+
+
+def _play_moves(game, context, algorithm, depth, options):
+    """
+    Play the game until it is over
+    Returns: tuple (moves made, whether 2048 was reached, list of finished
+    search depths, MoveLatencies or None)
+    """
+    latencies = MoveLatencies() if options['collect_latency'] else None
     moves = 0
     won = False
-
+    depths = []
     while not game.is_game_over():
-        if algorithm == "expectiminimax":
-            move = get_best_move_expectiminimax(game, depth)
-        elif algorithm == "depth_one":
-            move = depth_one_move(game)
-        else:
-            raise ValueError(f"Unknown algorithm: {algorithm}")
+        if latencies is not None:
+            empty = count_empty(game.get_bitboard())
+            started = time.perf_counter()
+        move, searched = _choose_move(game, context, algorithm, depth,
+                                      options)
+        if searched is not None:
+            depths.append(searched)
+        if latencies is not None:
+            latencies.add(time.perf_counter() - started, empty, searched)
 
         if game.make_move(move):
             moves += 1
-            if game.is_won() and not won:
-                won = True
+            won = won or game.is_won()
+    return moves, won, depths, latencies
 
-    # Get final board statistics
-    final_score = game.get_board_sum()
-    max_tile = max(max(row) for row in game.board)
 
-    return {
-        'moves': moves,
-        'score': final_score,
-        'max_tile': max_tile,
-        'won': won
-    }
+def _choose_move(game, context, algorithm, depth, options):
+    """
+    Choose the next move, see run_single_game
+    Returns: tuple (move, depth of the finished search or None)
+    """
+    if algorithm == "depth_one":
+        return depth_one_move(game), 1
+    if algorithm != "expectiminimax":
+        raise ValueError(f"Unknown algorithm: {algorithm}")
+    if options['root_workers']:
+        move = get_best_move_parallel(game, depth, options['root_workers'],
+                                      context=context)
+    else:
+        engine = options['engine']
+        move = get_best_move_expectiminimax(
+            game, depth, context=context,
+            time_limit_ms=options['time_per_move'],
+            engine=get_engine(engine) if engine is not None else None)
+    return move, context.completed_depth
+
+
+def describe_search(algorithm, depth, time_per_move=None, depth_policy=None,
+                    engine=None):
+    """Describe the search settings for printing"""
+    if algorithm != "expectiminimax":
+        return ""
+    if time_per_move is not None:
+        settings = f"time per move={time_per_move:g} ms"
+    elif depth_policy is not None:
+        settings = f"depth={depth}, policy={depth_policy.__name__}"
+    else:
+        settings = f"depth={depth}"
+    if engine is not None:
+        settings += f", engine={engine}"
+    return f" ({settings})"
+
+
+def game_seed(master_seed, index):
+    """Seed of game number index, the same whichever process plays it"""
+    return master_seed * GAME_SEED_STRIDE + index
+
+
+def game_seeds(num_games, master_seed=0, skip=()):
+    """
+    Seeds of the games of a run, see game_seed
+    Args:
+        skip: container of seeds already played, for example on resume
+    """
+    return (seed for seed in (game_seed(master_seed, i)
+                              for i in range(num_games))
+            if seed not in skip)
+
+
+def play_seeded_game(seed, algorithm, depth, options):
+    """
+    Run a single game with the tile spawns of SpawnStream(seed), the same
+    seed gives the same spawns to any algorithm
+    Returns: dict with game statistics and the seed
+    """
+    result = run_single_game(algorithm, depth, rng=SpawnStream(seed),
+                             **options)
+    result['seed'] = seed
+    return result
+
+
+def ignore_interrupts():
+    """Worker initializer: Ctrl-C is handled by the main process"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def stop_pool(pool, finished):
+    """Shut a game pool down, an interrupted run does not wait for the
+    games still being played"""
+    processes = list((pool._processes or {}).values())  # pylint: disable=protected-access
+    pool.shutdown(wait=finished, cancel_futures=True)
+    if not finished:
+        for process in processes:
+            process.terminate()
+
+
+def iter_pool_results(next_job, workers=None):
+    """
+    Run jobs in a pool of worker processes and yield the results as they
+    finish. Two jobs per worker are submitted ahead, so next_job is asked
+    again as results come in and can pick the job from what it has seen.
+    Args:
+        next_job: function() -> tuple (key, function, args) of the next job,
+            None when there is no job left. function must be a picklable
+            module level function
+        workers: int - number of processes, the jobs are run in this
+            process without one
+    Yields: tuple (key, function(*args))
+    """
+    if not workers or workers <= 1:
+        for key, function, args in iter(next_job, None):
+            yield key, function(*args)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers,
+                               initializer=ignore_interrupts)
+    # Future -> key of its job
+    pending = {}
+    finished = False
+    try:
+        while True:
+            for key, function, args in itertools.islice(
+                    iter(next_job, None), 2 * workers - len(pending)):
+                pending[pool.submit(function, *args)] = key
+            if not pending:
+                finished = True
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    finally:
+        stop_pool(pool, finished)
+
+
+def iter_game_results(config, seeds, workers=None, ordered=False):
+    """
+    Play games and yield their results in the order they finish
+    Args:
+        config: dict with the algorithm, the depth and the options of
+            run_single_game
+        seeds: iterable of game seeds, see game_seeds
+        workers: int - spread games over this many processes
+        ordered: bool - yield the results in seed order, short games
+            finish first so early results in finishing order are biased
+    """
+    return iter_seeded_results(
+        play_seeded_game, (config['algorithm'], config['depth'],
+                           config['options']),
+        seeds, workers, ordered)
+
 
+def iter_seeded_results(play, args, seeds, workers=None, ordered=False):
+    """
+    Call play(seed, *args) for every seed and yield the results, see
+    iter_game_results and iter_pool_results. In seed order the results that
+    finish before an earlier game are held back, the workers keep playing
+    while a slow game blocks the output.
+    Args:
+        play: function - picklable module level function playing one seed
+    """
+    jobs = ((index, play, (seed, *args))
+            for index, seed in enumerate(seeds))
+    results = iter_pool_results(lambda: next(jobs, None), workers)
+    # Finished results waiting for earlier games
+    held = {}
+    next_index = 0
+    try:
+        for index, result in results:
+            if not ordered:
+                yield result
+                continue
+            held[index] = result
+            next_index = yield from _release_in_order(held, next_index)
+    finally:
+        results.close()
+
+
+def _release_in_order(held, next_index):
+    """
+    Yield the held results from next_index on until the first missing one
+    Returns: int - index of the first missing result
+    """
+    while next_index in held:
+        yield held.pop(next_index)
+        next_index += 1
+    return next_index
+
+
+def job_options(options):
+    """
+    JSON version of run_single_game options for remote workers
+    Raises ValueError for options a remote worker cannot use
+    """
+    if options.get('shared_table') is not None:
+        raise ValueError("Remote workers cannot use a shared memory table")
+    job = dict(options, cache_readonly=True)
+    if options.get('depth_policy') is not None:
+        names = {policy: name for name, policy in DEPTH_POLICIES.items()}
+        if options['depth_policy'] not in names:
+            raise ValueError("Remote workers only know the built-in depth "
+                             "policies")
+        job['depth_policy'] = names[options['depth_policy']]
+    return job
+
+
+def play_job(seed, config):
+    """Play a job of a coordinator, see distributed.run_worker"""
+    options = dict(config['options'])
+    if options.get('depth_policy') is not None:
+        options['depth_policy'] = get_depth_policy(options['depth_policy'])
+    return play_seeded_game(seed, config['algorithm'], config['depth'],
+                            options)
+
+
+def play_worker(address):
+    """Play jobs of the coordinator at address until it is done"""
+    played = run_worker(address, play_job)
+    print(f"Worker {os.getpid()} played {played} games")
 
-def analyze_games(num_games=100, algorithm="expectiminimax", depth=3):
+
+def start_workers(address, processes):
+    """
+    Start processes playing jobs of the coordinator at address
+    Returns: list of the started processes
+    """
+    workers = [multiprocessing.Process(target=play_worker, args=(address,))
+               for _ in range(processes or 0)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def run_workers(address, processes=None):
+    """
+    Play jobs of a coordinator in this many processes
+    Args:
+        address: tuple (host, port) of the coordinator
+    """
+    print(f"Connecting to {address[0]}:{address[1]}"
+          + (f" with {processes} workers" if processes else ""))
+    if not processes or processes <= 1:
+        play_worker(address)
+        return
+    for worker in start_workers(address, processes):
+        worker.join()
+
+
+def iter_distributed_results(config, seeds, address, ordered=False,
+                             local_workers=0):
     """
-    Run multiple games and compile statistics
+    Serve the games to workers over TCP (see distributed.py) and yield the
+    results like iter_game_results
+    Args:
+        address: tuple (host, port) to listen on
+        local_workers: int - also play games in this many local processes
+    Raises RuntimeError if a game fails on a worker
     """
+    seeds = list(seeds)
+    board = JobBoard(seeds)
+    config = dict(config, options=job_options(config['options']))
+    with Coordinator(board, config, address) as coordinator:
+        host, port = coordinator.address
+        print(f"Coordinator on {host}:{port}, start workers with: "
+              f"python src/measure.py --connect {host}:{port}")
+        workers = start_workers(
+            ("127.0.0.1" if host == "0.0.0.0" else host, port), local_workers)
+        try:
+            held = {}
+            next_job = 0
+            for _ in seeds:
+                job, result = board.results.get()
+                if isinstance(result, Exception):
+                    raise result
+                if not ordered:
+                    yield result
+                    continue
+                held[job] = result
+                next_job = yield from _release_in_order(held, next_job)
+        finally:
+            board.close()
+            for worker in workers:
+                worker.join(timeout=2 * WAIT_SECONDS)
+                if worker.is_alive():
+                    worker.terminate()
+    if board.requeued:
+        print(f"{board.requeued} games were handed out again after their "
+              "worker went away")
+
+
+def analyze_games(num_games=100, algorithm="expectiminimax", depth=3,
+                  **options):
+    """
+    Run multiple games and compile statistics. Results are aggregated as
+    they arrive, Ctrl-C stops the run and prints the games played so far.
+    Args:
+        options: settings of the run, RUN_OPTIONS has the defaults
+            time_per_move, depth_policy, root_workers, engine: see
+                run_single_game
+            position_cache: str - warm start from and add to this position
+                cache file, with more than one worker it is only read and
+                does not fill, so fill it with a single process run first
+            table: "local" gives every process its own transposition
+                table, "shared" puts one table in shared memory for all
+                processes
+            table_entries: int - size of the transposition table
+            min_probability: float - chance node cutoff of the search, see
+                SearchContext
+            stats: bool - count the search nodes and print them per depth
+            latency: bool - time every move and print the percentiles by
+                empty cells and by depth
+            latency_dump: str - also write the merged latency histograms to
+                this JSON file
+            output: str - write every result to this file as it arrives,
+                CSV for .csv files and JSON lines otherwise, a resumed run
+                appends to it
+            stop_rule: PrecisionRule or SprtRule (see stopping.py) - stop
+                launching games once the rule is satisfied, results are
+                then taken in seed order
+            checkpoint: str - append every finished game to this log
+            resume: bool - continue the run recorded in the checkpoint log,
+                its games are not played again
+            workers: int - play games in this many processes
+            listen: tuple (host, port) - serve the games to workers on other
+                machines, workers then counts the local worker processes
+            seed: int - master seed, the same seed gives the same games for
+                any number of workers (random if not given)
+    Returns: GameSummary of the finished games
+    Raises ValueError if the checkpoint log is from a different run,
+    TypeError for an unknown option
+    """
+    options = with_defaults(RUN_OPTIONS, options)
+    run = run_identity(algorithm, depth, options)
+    recorded = []
+    if options['checkpoint'] is not None:
+        run, recorded = load_checkpoint(options['checkpoint'], run,
+                                        options['resume'])
+    if run['seed'] is None:
+        run['seed'] = random.SystemRandom().randrange(1 << 32)
     print(f"\nRunning {num_games} games with {algorithm} algorithm" +
-          (f" (depth={depth})" if algorithm == "expectiminimax" else ""))
+          describe_search(algorithm, depth, options['time_per_move'],
+                          options['depth_policy'], options['engine']))
+    print(f"Seed: {run['seed']}" +
+          (f" | Workers: {options['workers']}" if options['workers'] else ""))
+    if recorded:
+        print(f"Resuming: {len(recorded)} games read from "
+              f"{options['checkpoint']}")
     print("-" * 50)
 
-    results = []
-    wins = 0
-    tile_counts = {}
+    summary = GameSummary()
+    for result in recorded:
+        summary.add(result)
     start_time = time.time()
+    reset_process_table()
+    config = {'algorithm': algorithm, 'depth': depth,
+              'options': _game_options(options)}
+    seeds = game_seeds(num_games, run['seed'],
+                       {result['seed'] for result in recorded})
+    ordered = options['stop_rule'] is not None
+    if options['listen'] is not None:
+        games = iter_distributed_results(config, seeds, options['listen'],
+                                         ordered, options['workers'])
+    else:
+        games = iter_game_results(config, seeds, options['workers'], ordered)
+    try:
+        _record_games(games, summary, num_games, run, options)
+    finally:
+        games.close()
+        if config['options'].get('shared_table') is not None:
+            config['options']['shared_table'].close()
 
-    # Run games
-    for i in range(num_games):
-        if (i + 1) % 10 == 0:
-            print(f"Progress: {i + 1}/{num_games} games completed...")
+    if summary.games:
+        print_summary(summary, time.time() - start_time, options['table'],
+                      options['position_cache'], options['stats'])
+    if options['latency_dump'] is not None and \
+            summary.move_latency is not None:
+        with open(options['latency_dump'], "w", encoding="utf-8") as file:
+            json.dump(summary.move_latency.dump(), file, indent=1)
+        print(f"Latency histograms written to {options['latency_dump']}")
+    return summary
 
-        result = run_single_game(algorithm, depth)
-        results.append(result)
 
-        if result['won']:
-            wins += 1
+def run_identity(algorithm, depth, options):
+    """
+    Settings of an analyze_games run that decide its game results, a
+    checkpoint log is only resumed by a run with the same identity
+    Returns: dict of JSON values
+    """
+    policy = options['depth_policy']
+    return {'algorithm': algorithm, 'depth': depth, 'seed': options['seed'],
+            'time_per_move': options['time_per_move'],
+            'depth_policy': policy.__name__ if policy is not None else None,
+            'engine': options['engine'],
+            'table': options['table'],
+            'table_entries': (options['table_entries']
+                              if options['table'] is not None else None),
+            'min_probability': options['min_probability']}
+
+
+def _game_options(options):
+    """run_single_game options of an analyze_games run"""
+    workers = options['workers']
+    game = {'time_per_move': options['time_per_move'],
+            'depth_policy': options['depth_policy'],
+            'root_workers': options['root_workers'],
+            'engine': options['engine'],
+            'position_cache': options['position_cache'],
+            'cache_readonly': bool(workers and workers > 1),
+            'collect_stats': options['stats'],
+            'min_probability': options['min_probability'],
+            'collect_latency': bool(options['latency']
+                                    or options['latency_dump'])}
+    if options['table'] == TABLE_SHARED:
+        game['shared_table'] = SharedTranspositionTable(
+            max_entries=options['table_entries'])
+    elif options['table'] == TABLE_LOCAL:
+        game['table_entries'] = options['table_entries']
+    return game
+
+
+def _record_games(games, summary, num_games, run, options):
+    """
+    Add the results to the summary, the output file and the checkpoint log
+    as they arrive, until the games run out, the stop rule is satisfied or
+    Ctrl-C is pressed, see analyze_games
+    """
+    sink = open_sink(options['output'], options['resume']) \
+        if options['output'] is not None else None
+    log = CheckpointLog(options['checkpoint'], run) \
+        if options['checkpoint'] is not None else None
+    stop_rule = options['stop_rule']
+    try:
+        for result in games:
+            summary.add(result)
+            for writer in (log, sink):
+                if writer is not None:
+                    writer.write(result)
+            if summary.games % 10 == 0:
+                print(f"Progress: {summary.games}/{num_games} games completed...")
+            reason = stop_rule.check(summary) if stop_rule is not None else None
+            if reason is not None:
+                print_early_stop(summary, num_games, reason)
+                return
+    except KeyboardInterrupt:
+        print(f"\nInterrupted after {summary.games}/{num_games} games")
+    finally:
+        for writer in (sink, log):
+            if writer is not None:
+                writer.close()
 
-        # Track max tile distribution
-        max_tile = result['max_tile']
-        tile_counts[max_tile] = tile_counts.get(max_tile, 0) + 1
 
-    elapsed_time = time.time() - start_time
+def load_checkpoint(path, run, resume):
+    """
+    Check a checkpoint log against the run about to start
+    Args:
+        run: dict - parameters of the new run, a seed of None is taken from
+            the log
+        resume: bool - continue a run found in the log
+    Returns: tuple (run parameters, results recorded in the log)
+    Raises ValueError if the log holds a different run, or any games when
+    not resuming
+    """
+    logged, results = read_checkpoint(path)
+    if logged is None:
+        return run, []
+    if not resume:
+        raise ValueError(f"Checkpoint {path} already exists, "
+                         "use --resume to continue it")
+    if run['seed'] is None:
+        run = dict(run, seed=logged['seed'])
+    different = [key for key in run if logged.get(key) != run[key]]
+    if different:
+        raise ValueError(f"Checkpoint {path} is from a different run "
+                         f"({', '.join(different)} differ)")
+    return run, results
+
+
+def print_early_stop(summary, num_games, reason):
+    """Print why a run stopped and the games it did not need to play"""
+    saved = num_games - summary.games
+    cpu_per_game = summary.cpu_seconds / summary.games
+    print(f"\nStopped after {summary.games}/{num_games} games: {reason}")
+    print(f"Saved {saved} games, about {saved * cpu_per_game:.0f} "
+          f"CPU-seconds ({cpu_per_game:.2f} per game)")
 
-    # Statistics
-    total_moves = sum(r['moves'] for r in results)
-    total_score = sum(r['score'] for r in results)
-    avg_moves = total_moves / num_games
-    avg_score = total_score / num_games
-    win_rate = (wins / num_games) * 100
 
-    # Find min and max scores
-    min_score = min(r['score'] for r in results)
-    max_score = max(r['score'] for r in results)
-    min_moves = min(r['moves'] for r in results)
-    max_moves = max(r['moves'] for r in results)
+def print_summary(summary, elapsed_time, table=None, position_cache=None,
+                  stats=False):
+    """Print the results of a run, see analyze_games"""
+    num_games = summary.games
+    total_moves = summary.moves.total
 
-    # Display results
     print("\n" + "=" * 50)
     print("RESULTS SUMMARY")
     print("=" * 50)
     print(f"Games played: {num_games}")
     print(f"Total time: {elapsed_time:.2f} seconds")
     print(f"Time per game: {elapsed_time / num_games:.2f} seconds")
-    print(
-        f"Game speed: {
-            elapsed_time /
-            num_games /
-            avg_moves:.4f} seconds per move")
+    if total_moves:
+        print(f"Game speed: {elapsed_time / total_moves:.4f} "
+              "seconds per move")
+    if summary.avg_depth is not None:
+        print(f"Average search depth: {summary.avg_depth:.2f}")
+    if summary.table_lookups:
+        print(f"Transposition table hit rate: "
+              f"{summary.table_hits / summary.table_lookups:.1%} "
+              f"({table} table)")
+    if position_cache is not None:
+        print(f"Position cache hits: {summary.cache_hits}/{total_moves} moves")
+    if stats and summary.search_stats is not None:
+        print_search_stats(summary.search_stats)
+    if summary.move_latency is not None:
+        print_move_latency(summary.move_latency)
     print()
-    print(f"Win rate (2048 reached): {win_rate:.1f}% ({wins}/{num_games})")
-    print(f"Average moves per game: {avg_moves:.1f}")
-    print(f"Average score: {avg_score:.1f}")
+    print(f"Win rate (2048 reached): {summary.win_rate * 100:.1f}% "
+          f"({summary.wins}/{num_games})")
+    print(f"Average moves per game: {summary.moves.mean:.1f}")
+    print(f"Average score: {summary.score.mean:.1f}")
     print()
-    print(f"Min score: {min_score} | Max score: {max_score}")
-    print(f"Min moves: {min_moves} | Max moves: {max_moves}")
+    print(f"Min score: {summary.score.minimum} | "
+          f"Max score: {summary.score.maximum}")
+    print(f"Min moves: {summary.moves.minimum} | "
+          f"Max moves: {summary.moves.maximum}")
     print()
     print("Max tile distribution:")
+    tile_counts = summary.tile_counts
     for tile in sorted(tile_counts.keys(), reverse=True):
         percentage = (tile_counts[tile] / num_games) * 100
         load_bar = '█' * int(percentage / 2)
-        print(f"  {tile:5}: {
-            tile_counts[tile]:3} games ({
-            percentage:5.1f}%) {load_bar}")
+        print(f"  {tile:5}: {tile_counts[tile]:3} games "
+              f"({percentage:5.1f}%) {load_bar}")
+
+
+def print_move_latency(latencies):
+    """Print the think time percentiles of a MoveLatencies in ms"""
+    print()
+    print("Move latency (ms):")
+    print(f"  {'':<14}{'moves':>8}" +
+          "".join(f"{f'p{percent}':>9}" for percent in PERCENTILES) +
+          f"{'max':>9}")
+    rows = [("all moves", latencies.overall())]
+    rows += [(f"{empty} empty", latencies.by_empty[empty])
+             for empty in sorted(latencies.by_empty)]
+    rows += [(f"depth {depth}", latencies.by_depth[depth])
+             for depth in sorted(latencies.by_depth)]
+    for name, histogram in rows:
+        print(f"  {name:<14}{histogram.count:>8}" +
+              "".join(f"{1000 * histogram.percentile(percent):>9.3g}"
+                      for percent in PERCENTILES) +
+              f"{1000 * histogram.maximum:>9.3g}")
+
+
+def print_search_stats(total):
+    """Print the node counters and the per depth figures of a SearchStats"""
+    print()
+    print("Search nodes:")
+    for name in COUNTERS:
+        print(f"  {name.replace('_', ' '):<17}{getattr(total, name):>14,}")
+    rows = total.summary()
+    if not rows:
+        return
+    print(f"  {'depth':>5}{'searches':>10}{'nodes/search':>14}"
+          f"{'ms/search':>11}{'nodes/s':>10}{'branching':>11}")
+    for row in rows:
+        print(f"  {row['depth']:>5}{row['searches']:>10}"
+              f"{row['nodes_per_search']:>14.0f}{row['ms_per_search']:>11.2f}"
+              f"{row['nodes_per_second']:>10.0f}"
+              f"{row['branching_factor']:>11.2f}")
+
+
+def add_search_arguments(parser):
+    """Add the algorithm, the depth and the search settings shared with
+    play_game.py to a parser"""
+    parser.add_argument("algorithm", nargs="?", default="expectiminimax")
+    parser.add_argument("depth", nargs="?", type=int, default=3)
+    parser.add_argument("--time-per-move", type=float, default=None,
+                        help="milliseconds per move, search deeper until the "
+                        "budget is used (replaces depth)")
+    parser.add_argument("--depth-policy", choices=sorted(DEPTH_POLICIES),
+                        default=None, help="pick the depth from the board "
+                        "(depth is the base depth)")
+    parser.add_argument("--root-workers", type=int, default=None,
+                        help="search the root moves of every move in this "
+                        "many processes")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default=None,
+                        help="expectiminimax search engine, batched expands "
+                        "the tree level by level with NumPy")
+
+
+def check_search_arguments(parser, args):
+    """Reject search settings that do not combine, see add_search_arguments,
+    and look up the depth policy"""
+    if args.root_workers and args.time_per_move is not None:
+        parser.error("--time-per-move cannot be combined with --root-workers")
+    if args.root_workers and args.engine is not None:
+        parser.error("--engine cannot be combined with --root-workers")
+    if args.depth_policy is not None:
+        args.depth_policy = get_depth_policy(args.depth_policy)
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Analyze many 2048 games")
+    parser.add_argument("games", nargs="?", type=int, default=100)
+    add_search_arguments(parser)
+    parser.add_argument("--position-cache", default=None, metavar="FILE",
+                        help="warm start from a persistent cache of searched "
+                        "positions and add new ones to it (read only with "
+                        "more than one worker)")
+    parser.add_argument("--table", choices=[TABLE_LOCAL, TABLE_SHARED],
+                        default=None, help="search with a transposition "
+                        "table per process or one in shared memory")
+    parser.add_argument("--table-entries", type=int, default=TABLE_ENTRIES)
+    parser.add_argument("--min-probability", type=float,
+                        default=MIN_PROBABILITY,
+                        help="do not expand chance nodes less likely than "
+                        "this from the root")
+    parser.add_argument("--stats", action="store_true",
+                        help="count search nodes and time every depth")
+    parser.add_argument("--latency", action="store_true",
+                        help="print move time percentiles by empty cells "
+                        "and by search depth")
+    parser.add_argument("--latency-dump", default=None, metavar="FILE",
+                        help="write the move time histograms to this JSON "
+                        "file (implies --latency)")
+    parser.add_argument("--output", default=None, metavar="FILE",
+                        help="write every game result to this file as it "
+                        "finishes (CSV for .csv, JSON lines otherwise)")
+    parser.add_argument("--checkpoint", default=None, metavar="FILE",
+                        help="append every finished game to this log")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the run in the checkpoint log, "
+                        "its games are not played again")
+    stopping = parser.add_argument_group(
+        "early stopping", "stop once the games answer the question, games "
+        "is then the maximum")
+    stopping.add_argument("--metric", choices=METRICS, default=METRIC_WIN_RATE)
+    stopping.add_argument("--precision", type=float, default=None,
+                          help="stop when the 95%% confidence interval of "
+                          "the metric is within +- this (win rate as a "
+                          "fraction)")
+    stopping.add_argument("--baseline", type=float, default=None,
+                          help="run a sequential test of the metric against "
+                          "this value")
+    stopping.add_argument("--delta", type=float, default=None,
+                          help="difference to the baseline the test should "
+                          "detect, negative for a drop")
+    stopping.add_argument("--alpha", type=float, default=0.05)
+    stopping.add_argument("--beta", type=float, default=0.05)
+    stopping.add_argument("--min-games", type=int, default=MIN_GAMES)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="play games in this many processes")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="master seed, each game gets its own seed "
+                        "derived from it")
+    parser.add_argument("--listen", default=None, metavar="HOST:PORT",
+                        help="serve the games to workers on other machines "
+                        "(0.0.0.0 for every interface, trusted networks only)")
+    parser.add_argument("--connect", default=None, metavar="HOST:PORT",
+                        help="run as a worker of the coordinator at this "
+                        "address, other arguments except --workers are "
+                        "ignored")
+    args = parser.parse_args(argv)
+    if args.listen is not None:
+        args.listen = parse_address(args.listen)
+    if args.connect is not None:
+        args.connect = parse_address(args.connect)
+    if args.listen is not None and args.table == TABLE_SHARED:
+        parser.error("--listen cannot be combined with --table shared")
+    if args.root_workers and args.workers:
+        parser.error("--workers cannot be combined with --root-workers")
+    check_search_arguments(parser, args)
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs --checkpoint")
+    args.stop_rule = _stop_rule(parser, args)
+    return args
+
+
+def _stop_rule(parser, args):
+    """Early stopping rule of the command line, None to play every game"""
+    if args.precision is not None and args.baseline is not None:
+        parser.error("--precision cannot be combined with --baseline")
+    if args.precision is not None:
+        return PrecisionRule(args.metric, args.precision, args.min_games)
+    if args.baseline is None:
+        return None
+    if args.delta is None:
+        parser.error("--baseline needs --delta")
+    try:
+        return SprtRule(args.metric, args.baseline, args.delta,
+                        (args.alpha, args.beta), args.min_games)
+    except ValueError as error:
+        parser.error(str(error))
+    return None
+
+
+def run_options(args):
+    """analyze_games options of parsed command line arguments"""
+    return {name: getattr(args, name) for name in RUN_OPTIONS}
 
 
 if __name__ == "__main__":
-    # Defaults
-    NUM_GAMES = 100
-    ALGORITHM = "expectiminimax"
-    DEPTH = 3
-
-    if len(sys.argv) > 1:
-        NUM_GAMES = int(sys.argv[1])
-    if len(sys.argv) > 2:
-        ALGORITHM = sys.argv[2]
-    if len(sys.argv) > 3:
-        DEPTH = int(sys.argv[3])
-
-    analyze_games(NUM_GAMES, ALGORITHM, DEPTH)
+    ARGS = parse_args()
+    if ARGS.connect is not None:
+        run_workers(ARGS.connect, ARGS.workers)
+        raise SystemExit(0)
+    try:
+        analyze_games(ARGS.games, ARGS.algorithm, ARGS.depth,
+                      **run_options(ARGS))
+    except ValueError as error:
+        raise SystemExit(f"Error: {error}") from None
@@ -1,8 +1,16 @@
 """play_game.py contains code to execute playing the game using various algorithms"""
 
+import argparse
+from algorithms.batched import get_engine
 from algorithms.expectiminimax import get_best_move_expectiminimax
 from algorithms.depth_one_move import depth_one_move
+from algorithms.parallel import get_best_move_parallel
+from algorithms.position_cache import PositionCache, settings_hash
+from algorithms.search_context import SearchContext
 from game import Game2048
+from measure import (add_search_arguments, check_search_arguments,
+                     describe_search, with_defaults)
+from spawns import SpawnStream
 
 UP = "up"
 DOWN = "down"
@@ -10,14 +18,54 @@ RIGHT = "right"
 LEFT = "left"
 
 
-def play_game_ai(algorithm="expectiminimax", depth=3):
+# Keyword options of play_game_ai and their defaults
+PLAY_OPTIONS = {
+    'time_per_move': None,
+    'depth_policy': None,
+    'root_workers': None,
+    'engine': None,
+    'position_cache': None
+}
+
+
+def play_game_ai(algorithm="expectiminimax", depth=3, seed=None, **options):
     """
     Play a game using the specified AI algorithm
     Args:
         algorithm: str - "depth_one" or "expectiminimax"
         depth: int - search depth for expectiminimax (ignored for depth_one)
+        seed: int - draw the tile spawns from SpawnStream(seed), the same
+            seed gives the same spawns to every algorithm
+        options: settings of the search, PLAY_OPTIONS has the defaults
+            time_per_move: float - milliseconds per expectiminimax move,
+                replaces depth with iterative deepening
+            depth_policy: function(bits, depth) -> int - board dependent
+                depth
+            root_workers: int - search the root moves in this many processes
+            engine: str - expectiminimax search engine, see batched.ENGINES
+            position_cache: str - warm start from and add to this position
+                cache file
+    Raises TypeError for an unknown option
     """
-    game = Game2048()
+    options = with_defaults(PLAY_OPTIONS, options)
+    rng = SpawnStream(seed) if seed is not None else None
+    context = SearchContext()
+    context.depth_policy = options['depth_policy']
+    if options['position_cache'] is not None:
+        context.position_cache = PositionCache(options['position_cache'],
+                                               settings_hash(context))
+    try:
+        _play(context, algorithm, depth, rng, options)
+    finally:
+        if context.position_cache is not None:
+            context.position_cache.close()
+
+
+def _play(context, algorithm, depth, rng, options):
+    """Play and print one game with the given search context"""
+    game = Game2048(rng=rng)
+    engine = options['engine']
+    search = get_engine(engine) if engine is not None else None
     moves = 0
     win_move = None
 
@@ -26,8 +74,13 @@ def play_game_ai(algorithm="expectiminimax", depth=3):
         print(f"Move {moves}")
 
         # Get move based on algorithm
-        if algorithm == "expectiminimax":
-            move = get_best_move_expectiminimax(game, depth)
+        if algorithm == "expectiminimax" and options['root_workers']:
+            move = get_best_move_parallel(game, depth, options['root_workers'],
+                                          context=context)
+        elif algorithm == "expectiminimax":
+            move = get_best_move_expectiminimax(
+                game, depth, context=context,
+                time_limit_ms=options['time_per_move'], engine=search)
         elif algorithm == "depth_one":
             move = depth_one_move(game)
         else:
@@ -46,26 +99,33 @@ def play_game_ai(algorithm="expectiminimax", depth=3):
 
     game.print_board()
     print(f"Played with {algorithm} algorithm" +
-          (f" (depth={depth})" if algorithm == "expectiminimax" else ""))
+          describe_search(algorithm, depth, options['time_per_move'],
+                          options['depth_policy'], engine))
 
     if win_move is not None:
         print(f"Won in {win_move} moves!")
     print(f"Game over after {moves} moves!")
 
 
-if __name__ == "__main__":
-    import sys
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Watch an algorithm play 2048")
+    add_search_arguments(parser)
+    parser.add_argument("--position-cache", default=None, metavar="FILE",
+                        help="warm start from a persistent cache of searched "
+                        "positions and add new ones to it")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the tile spawns")
+    args = parser.parse_args(argv)
+    check_search_arguments(parser, args)
+    return args
 
-    # Default algorithm
-    PLAY_ALGORTYHM = "expectiminimax"
-    PLAY_DEPTH = 3
 
-    # Command line arguments
-    if len(sys.argv) > 1:
-        PLAY_ALGORTYHM = sys.argv[1]
-    if len(sys.argv) > 2:
-        PLAY_DEPTH = int(sys.argv[2])
+if __name__ == "__main__":
+    ARGS = parse_args()
 
-    print(f"Playing with {PLAY_ALGORTYHM} algorithm" +
-          (f" (depth={PLAY_DEPTH})" if PLAY_ALGORTYHM == "expectiminimax" else ""))
-    play_game_ai(PLAY_ALGORTYHM, PLAY_DEPTH)
+    print(f"Playing with {ARGS.algorithm} algorithm" +
+          describe_search(ARGS.algorithm, ARGS.depth, ARGS.time_per_move,
+                          ARGS.depth_policy, ARGS.engine))
+    play_game_ai(ARGS.algorithm, ARGS.depth, ARGS.seed,
+                 **{name: getattr(ARGS, name) for name in PLAY_OPTIONS})
@@ -0,0 +1,55 @@
+"""spawns.py contains reproducible streams of tile spawns
+
+A spawn picks an empty cell and a tile value. random.Random uses a varying
+number of draws to pick from a list, so two games from the same seed drift
+apart as soon as they have a different number of empty cells once.
+SpawnStream uses exactly two numbers per spawn: the k-th spawn of every game
+on a stream gets the same numbers however the games were played, so two
+players are compared on as similar games as possible (common random
+numbers).
+
+A stream can be passed anywhere a random.Random is accepted for spawns, for
+example Game2048(rng=SpawnStream(seed)).
+"""
+import random
+
+
+class SpawnStream:
+    """Numbers for tile spawns, two per spawn, from a seed or a list"""
+
+    def __init__(self, seed=None, draws=None):
+        """
+        Args:
+            seed: seed of the generator (random if not given)
+            draws: iterable of floats in [0, 1) - pre-generated numbers used
+                instead of the generator, two per spawn
+        """
+        self.seed = seed
+        if draws is not None:
+            self._draws = iter(draws)
+        else:
+            generator = random.Random(seed)
+            self._draws = iter(generator.random, None)
+
+    @classmethod
+    def pregenerate(cls, seed, spawns):
+        """
+        Numbers for a fixed number of spawns, for storing or sharing
+        Returns: list of floats for the draws argument
+        """
+        generator = random.Random(seed)
+        return [generator.random() for _ in range(2 * spawns)]
+
+    def random(self):
+        """
+        Next number of the stream
+        Raises ValueError when pre-generated numbers run out
+        """
+        try:
+            return next(self._draws)
+        except StopIteration:
+            raise ValueError("Spawn stream is exhausted") from None
+
+    def choice(self, sequence):
+        """Pick an item with one number of the stream"""
+        return sequence[int(self.random() * len(sequence))]
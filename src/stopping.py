@@ -0,0 +1,149 @@
+"""stopping.py contains rules that end a measurement run early
+
+A rule looks at the GameSummary after every game and returns the reason to
+stop, or None to keep playing. Games must be fed in seed order: results in
+the order they finish favour short games.
+
+PrecisionRule stops when the 95 % confidence interval of the metric is
+narrow enough. SprtRule is Wald's sequential probability ratio test of
+H0: metric = baseline against H1: metric = baseline + delta. It stops as
+soon as the games are clearly more likely under one of them, with error
+rates alpha (accepting H1 when H0 holds) and beta.
+"""
+import math
+
+METRIC_WIN_RATE = "win_rate"
+METRIC_SCORE = "score"
+METRIC_MOVES = "moves"
+METRICS = (METRIC_WIN_RATE, METRIC_SCORE, METRIC_MOVES)
+
+# Two sided 95 % normal quantile
+Z_95 = 1.959963984540054
+# Games before any rule may stop, the normal approximations need a sample
+MIN_GAMES = 30
+
+
+def _metric_stat(summary, metric):
+    """RunningStat of a numeric metric"""
+    if metric == METRIC_SCORE:
+        return summary.score
+    if metric == METRIC_MOVES:
+        return summary.moves
+    raise ValueError(f"Unknown metric: {metric}")
+
+
+def metric_value(summary, metric):
+    """Current estimate of the metric"""
+    if metric == METRIC_WIN_RATE:
+        return summary.win_rate
+    return _metric_stat(summary, metric).mean
+
+
+def confidence_interval(summary, metric, z=Z_95):
+    """
+    Confidence interval of the metric, Wilson score interval for the win
+    rate and the normal interval of the mean otherwise
+    Returns: tuple (low, high)
+    """
+    games = summary.games
+    if not games:
+        return (-math.inf, math.inf)
+    if metric == METRIC_WIN_RATE:
+        rate = summary.win_rate
+        center = (rate + z * z / (2 * games)) / (1 + z * z / games)
+        half = (z / (1 + z * z / games)) * math.sqrt(
+            rate * (1 - rate) / games + z * z / (4 * games * games))
+        return (center - half, center + half)
+    stat = _metric_stat(summary, metric)
+    half = z * stat.stdev / math.sqrt(games)
+    return (stat.mean - half, stat.mean + half)
+
+
+class PrecisionRule:
+    """Stop once the confidence interval is at most 2 * half_width wide"""
+
+    def __init__(self, metric, half_width, min_games=MIN_GAMES):
+        """
+        Args:
+            metric: str - one of METRICS
+            half_width: float - wanted precision, for the win rate as a
+                fraction (0.02 is +-2 percentage points)
+            min_games: int - never stop before this many games
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        self.metric = metric
+        self.half_width = half_width
+        self.min_games = min_games
+
+    def check(self, summary):
+        """Reason to stop or None"""
+        if summary.games < self.min_games:
+            return None
+        low, high = confidence_interval(summary, self.metric)
+        if (high - low) / 2 > self.half_width:
+            return None
+        return (f"{self.metric} {metric_value(summary, self.metric):.4g} "
+                f"(95% CI {low:.4g} .. {high:.4g}) is within "
+                f"+-{self.half_width:g}")
+
+
+class SprtRule:
+    """Sequential probability ratio test against a baseline value"""
+
+    def __init__(self, metric, baseline, delta, errors=(0.05, 0.05),
+                 min_games=MIN_GAMES):
+        """
+        Args:
+            metric: str - one of METRICS
+            baseline: float - value of the metric under H0, for example from
+                an earlier run (win rate as a fraction)
+            delta: float - smallest difference worth detecting, negative to
+                test for a drop
+            errors: tuple (alpha, beta) - error rates of the test
+            min_games: int - never stop before this many games
+        Raises ValueError for a win rate outside (0, 1)
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        if not delta:
+            raise ValueError("SPRT needs a non-zero delta")
+        if metric == METRIC_WIN_RATE and not (
+                0 < baseline < 1 and 0 < baseline + delta < 1):
+            raise ValueError("Win rates of the SPRT must be between 0 and 1")
+        self.metric = metric
+        self.baseline = baseline
+        self.delta = delta
+        self.min_games = min_games
+        alpha, beta = errors
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+
+    def log_likelihood_ratio(self, summary):
+        """Log of P(games | H1) / P(games | H0)"""
+        alternative = self.baseline + self.delta
+        if self.metric == METRIC_WIN_RATE:
+            losses = summary.games - summary.wins
+            return (summary.wins * math.log(alternative / self.baseline)
+                    + losses * math.log((1 - alternative) / (1 - self.baseline)))
+        # Normal approximation with the sample variance
+        stat = _metric_stat(summary, self.metric)
+        if not stat.variance:
+            return 0.0
+        return (self.delta / stat.variance
+                * (stat.total - summary.games * (self.baseline + alternative) / 2))
+
+    def check(self, summary):
+        """Reason to stop or None"""
+        if summary.games < self.min_games:
+            return None
+        ratio = self.log_likelihood_ratio(summary)
+        value = metric_value(summary, self.metric)
+        alternative = self.baseline + self.delta
+        if ratio >= self.upper:
+            return (f"SPRT accepts {self.metric} = {alternative:g} over "
+                    f"{self.baseline:g} (estimate {value:.4g})")
+        if ratio <= self.lower:
+            return (f"SPRT accepts {self.metric} = {self.baseline:g} over "
+                    f"{alternative:g} (estimate {value:.4g})")
+        return None
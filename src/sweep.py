@@ -0,0 +1,327 @@
+"""sweep.py measures every cell of a grid of configurations
+
+A cell is one configuration (see compare.make_configuration), and every
+cell plays the same game seeds. The unit of work is a single game. A free
+worker always takes a game of the cell with the largest estimated CPU time
+per game, so deep cells start first and the last games to finish are cheap
+ones (longest processing time first). The time of a cell is guessed from
+its depth until its first game has finished, then taken from its finished
+games, and the guesses of the other cells are rescaled by what the finished
+cells cost.
+
+Every finished game is appended to a cache log (see CheckpointLog). Running
+the sweep again only plays the games missing from it, and sweeps over
+overlapping grids share the cells they have in common. The log header holds
+the seed and the settings hash of the default search (see settings_hash), a
+log written with other default evaluation weights is refused. Weights of the
+weights axis are in the labels of their cells, so a weight sweep shares one
+log.
+
+Run from the repository root:
+python src/sweep.py 50 --depths 2 3 4 --engines recursive batched --workers 4
+"""
+import argparse
+import itertools
+import statistics
+import sys
+import time
+from collections import deque
+from algorithms.batched import ENGINES
+from algorithms.depth_policy import DEPTH_POLICIES
+from algorithms.position_cache import settings_hash
+from algorithms.search_context import SearchContext, MIN_PROBABILITY
+from compare import CONFIGURATION_OPTIONS, make_configuration, parse_weights
+from game_results import CheckpointLog, GameSummary, RunningStat, read_checkpoint
+from measure import (game_seed, iter_pool_results, play_seeded_game,
+                     with_defaults)
+from stopping import confidence_interval
+
+CACHE_FILE = "sweep_cache.jsonl"
+# Guessed cost of a cell before it has finished a game: seconds per move at
+# depth d are PRIOR_MOVE_SECONDS * PRIOR_BRANCHING ** d
+PRIOR_MOVES = 1000
+PRIOR_MOVE_SECONDS = 2e-5
+PRIOR_BRANCHING = 8
+# Search setting axes of grid_cells -> option of make_configuration
+AXES = {
+    'engines': 'engine',
+    'depth_policies': 'depth_policy',
+    'times_per_move': 'time_per_move',
+    'min_probabilities': 'min_probability',
+    'weights': 'weights'
+}
+
+
+def grid_cells(algorithms=("expectiminimax",), depths=(3,), **axes):
+    """
+    Every combination of the settings, without the duplicates of settings
+    that do not apply (depth_one has no search settings, a time per move
+    replaces the depth)
+    Args:
+        axes: lists of values of the search settings, keywords of AXES,
+            a missing axis only has the default of its setting
+    Returns: list of configurations in grid order
+    Raises TypeError for an unknown axis
+    """
+    axes = with_defaults({axis: (CONFIGURATION_OPTIONS[option],)
+                          for axis, option in AXES.items()}, axes)
+    cells = {}
+    for algorithm, depth, *values in itertools.product(algorithms, depths,
+                                                       *axes.values()):
+        if algorithm != "expectiminimax":
+            config = make_configuration(algorithm, 1)
+        else:
+            options = dict(zip(AXES.values(), values))
+            if options['time_per_move'] is not None:
+                depth = depths[0]
+            config = make_configuration(algorithm, depth, **options)
+        cells.setdefault(config['label'], config)
+    return list(cells.values())
+
+
+def prior_cost(config):
+    """Guessed CPU seconds per game of a cell"""
+    time_per_move = config['options']['time_per_move']
+    if time_per_move is not None:
+        return PRIOR_MOVES * time_per_move / 1000
+    depth = config['depth'] if config['algorithm'] == "expectiminimax" else 1
+    return PRIOR_MOVES * PRIOR_MOVE_SECONDS * PRIOR_BRANCHING ** depth
+
+
+class CostModel:
+    """Estimated CPU seconds per game of every cell"""
+
+    def __init__(self, cells):
+        self.prior = {config['label']: prior_cost(config) for config in cells}
+        self.measured = {}
+
+    def add(self, label, seconds):
+        """Add the CPU time of a finished game"""
+        self.measured.setdefault(label, RunningStat()).add(seconds)
+
+    def scale(self):
+        """Median ratio of measured to guessed cost, 1.0 before any game"""
+        ratios = [stat.mean / self.prior[label]
+                  for label, stat in self.measured.items()
+                  if label in self.prior]
+        return statistics.median(ratios) if ratios else 1.0
+
+    def estimate(self, label):
+        """CPU seconds per game, measured or rescaled guess"""
+        if label in self.measured:
+            return self.measured[label].mean
+        return self.prior[label] * self.scale()
+
+
+def play_cell_game(seed, config):
+    """Play one game of a cell, the result carries the cell label"""
+    result = play_seeded_game(seed, config['algorithm'], config['depth'],
+                              config['options'])
+    result['cell'] = config['label']
+    return result
+
+
+def _next_game(queues, cells, costs):
+    """Seed and configuration of the most expensive waiting game"""
+    label = max((label for label, seeds in queues.items() if seeds),
+                key=costs.estimate, default=None)
+    if label is None:
+        return None
+    return queues[label].popleft(), cells[label]
+
+
+def iter_scheduled_games(queues, cells, costs, workers=None):
+    """
+    Play the queued games and yield the results as they finish, the game
+    of the most expensive cell first. Only two games per worker are
+    submitted ahead, so the order follows the estimates as they improve.
+    Args:
+        queues: dict label -> deque of seeds still to play
+        cells: dict label -> configuration
+        costs: CostModel - updated by the caller as games finish
+        workers: int - play games in this many processes
+    """
+    def next_job():
+        game = _next_game(queues, cells, costs)
+        return None if game is None else (game[1]['label'], play_cell_game,
+                                          game)
+
+    results = iter_pool_results(next_job, workers)
+    try:
+        for _, result in results:
+            yield result
+    finally:
+        results.close()
+
+
+def cache_identity(seed):
+    """
+    Header of the cache log: the master seed and the settings hash of the
+    default search (evaluation weights and defaults), cell settings and
+    the weights of the weights axis are in the labels of the games
+    """
+    return {'seed': seed, 'settings': settings_hash(SearchContext())}
+
+
+def run_sweep(cells, num_games, workers=None, seed=0, cache=CACHE_FILE):
+    """
+    Play num_games seeds in every cell and print a table of the cells,
+    Ctrl-C stops the sweep and prints the games finished so far
+    Args:
+        cells: list of configurations, see grid_cells
+        workers: int - play games in this many processes
+        seed: int - master seed, the same for every cell
+        cache: str - log of finished games, None to play everything
+    Returns: dict label -> GameSummary in grid order
+    Raises ValueError if the cache was written with another seed or other
+    search settings
+    """
+    by_label = {config['label']: config for config in cells}
+    summaries = {label: GameSummary() for label in by_label}
+    costs = CostModel(cells)
+    seeds = [game_seed(seed, i) for i in range(num_games)]
+    played = _read_cache(cache, seed, seeds, summaries, costs)
+    queues = {label: deque(s for s in seeds if s not in played[label])
+              for label in by_label}
+    total = sum(len(queue) for queue in queues.values())
+    print(f"Sweep of {len(cells)} cells x {num_games} games | Seed: {seed}" +
+          (f" | Workers: {workers}" if workers else ""))
+    if cache is not None:
+        print(f"Cache: {len(cells) * num_games - total} games read from {cache}")
+    print(f"Estimated CPU time: {_remaining(queues, costs):.0f} seconds for "
+          f"{total} games")
+    print("-" * 50)
+
+    log = CheckpointLog(cache, cache_identity(seed)) \
+        if cache is not None else None
+    start_time = time.time()
+    games = iter_scheduled_games(queues, by_label, costs, workers)
+    try:
+        _record_sweep(games, summaries, costs, log, queues)
+    finally:
+        games.close()
+        if log is not None:
+            log.close()
+
+    print_sweep(summaries, time.time() - start_time)
+    return summaries
+
+
+def _read_cache(cache, seed, seeds, summaries, costs):
+    """
+    Add the cached games of the seeds to the summaries and the costs
+    Returns: dict label -> set of the seeds read from the cache
+    Raises ValueError if the cache was written with another seed or other
+    search settings
+    """
+    played = {label: set() for label in summaries}
+    if cache is None:
+        return played
+    logged_run, recorded = read_checkpoint(cache)
+    identity = cache_identity(seed)
+    if logged_run is not None and logged_run.get('seed') != seed:
+        raise ValueError(f"Sweep cache {cache} was written with seed "
+                         f"{logged_run.get('seed')}, not {seed}")
+    if logged_run is not None and \
+            logged_run.get('settings') != identity['settings']:
+        raise ValueError(f"Sweep cache {cache} was written with other "
+                         "evaluation settings, use another --cache file")
+    wanted = set(seeds)
+    for result in recorded:
+        label = result.get('cell')
+        if (label in summaries and result['seed'] in wanted
+                and result['seed'] not in played[label]):
+            played[label].add(result['seed'])
+            summaries[label].add(result)
+            costs.add(label, result.get('cpu_seconds', 0.0))
+    return played
+
+
+def _record_sweep(games, summaries, costs, log, queues):
+    """Add the games to the summaries, the costs and the cache log as they
+    finish, until they run out or Ctrl-C is pressed, see run_sweep"""
+    total = sum(len(queue) for queue in queues.values())
+    finished = 0
+    try:
+        for result in games:
+            summaries[result['cell']].add(result)
+            costs.add(result['cell'], result.get('cpu_seconds', 0.0))
+            if log is not None:
+                log.write(result)
+            finished += 1
+            if finished % 10 == 0:
+                print(f"Progress: {finished}/{total} games, about "
+                      f"{_remaining(queues, costs):.0f} CPU-seconds left")
+    except KeyboardInterrupt:
+        print(f"\nInterrupted after {finished}/{total} games" +
+              (", finished games are cached" if log is not None else ""))
+
+
+def _remaining(queues, costs):
+    """Estimated CPU seconds of the games still queued"""
+    return sum(costs.estimate(label) * len(queue)
+               for label, queue in queues.items())
+
+
+def print_sweep(summaries, elapsed_time):
+    """Print one row per cell, see run_sweep"""
+    width = max(len(label) for label in summaries) + 2
+    print("\n" + "=" * 50)
+    print(f"SWEEP RESULTS ({elapsed_time:.1f} seconds)")
+    print("=" * 50)
+    print(f"{'configuration':<{width}}{'games':>6}{'win rate':>10}"
+          f"{'score':>18}{'moves':>8}{'s/game':>8}{'ms/move':>9}")
+    for label, summary in summaries.items():
+        if not summary.games:
+            print(f"{label:<{width}}{0:>6}")
+            continue
+        low, high = confidence_interval(summary, "score")
+        score = f"{summary.score.mean:.0f} +-{(high - low) / 2:.0f}"
+        ms_per_move = 1000 * summary.cpu_seconds / max(summary.moves.total, 1)
+        print(f"{label:<{width}}{summary.games:>6}{summary.win_rate:>10.1%}"
+              f"{score:>18}{summary.moves.mean:>8.0f}"
+              f"{summary.cpu_seconds / summary.games:>8.2f}"
+              f"{ms_per_move:>9.2f}")
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Measure every combination of the given settings")
+    parser.add_argument("games", type=int, help="games per cell")
+    parser.add_argument("--algorithms", nargs="+", default=["expectiminimax"])
+    parser.add_argument("--depths", type=int, nargs="+", default=[3])
+    parser.add_argument("--engines", nargs="+", choices=ENGINES,
+                        default=[None])
+    parser.add_argument("--depth-policies", nargs="+",
+                        choices=sorted(DEPTH_POLICIES), default=[None])
+    parser.add_argument("--times-per-move", type=float, nargs="+",
+                        default=[None], help="milliseconds per move")
+    parser.add_argument("--min-probabilities", type=float, nargs="+",
+                        default=[MIN_PROBABILITY],
+                        help="chance node cutoffs of the search")
+    parser.add_argument("--weights", type=parse_weights, nargs="+",
+                        default=[None], help="heuristic weights, six comma "
+                        "separated numbers each (see evaluation.WEIGHTS)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="play games in this many processes")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="master seed, the cache only holds one seed")
+    parser.add_argument("--cache", default=CACHE_FILE,
+                        help="log of finished games, reused by later runs")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="play every game and keep no log")
+    args = parser.parse_args(argv)
+    args.cells = grid_cells(args.algorithms, args.depths,
+                            **{axis: getattr(args, axis) for axis in AXES})
+    if args.no_cache:
+        args.cache = None
+    return args
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    try:
+        run_sweep(ARGS.cells, ARGS.games, ARGS.workers, ARGS.seed, ARGS.cache)
+    except ValueError as error:
+        sys.exit(f"Error: {error}")
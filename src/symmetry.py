@@ -0,0 +1,114 @@
+"""symmetry.py contains the rotations and reflections of bitboards
+
+A transformed board has the same expectiminimax value as the original, with
+the moves relabelled. evaluate_board is only symmetric under the reflections
+that keep rows as rows (get_best_weighted_score reads the board row by row
+from each corner), so caches of evaluate_board values use
+EVALUATION_SYMMETRIES. ALL_SYMMETRIES holds all 8 transforms for evaluators
+that are symmetric under transposition as well.
+"""
+from bitboard import transpose, UP, DOWN, LEFT, RIGHT
+
+
+def flip_horizontal(bits):
+    """Mirror the board left to right, column j becomes column 3 - j"""
+    bits = (((bits & 0x0F0F0F0F0F0F0F0F) << 4)
+            | ((bits >> 4) & 0x0F0F0F0F0F0F0F0F))
+    return (((bits & 0x00FF00FF00FF00FF) << 8)
+            | ((bits >> 8) & 0x00FF00FF00FF00FF))
+
+
+def flip_vertical(bits):
+    """Mirror the board top to bottom, row i becomes row 3 - i"""
+    bits = (((bits & 0x0000FFFF0000FFFF) << 16)
+            | ((bits >> 16) & 0x0000FFFF0000FFFF))
+    return ((bits & 0xFFFFFFFF) << 32) | (bits >> 32)
+
+
+def rotate_180(bits):
+    """Rotate the board half a turn"""
+    return flip_vertical(flip_horizontal(bits))
+
+
+def _identity(bits):
+    """The board itself"""
+    return bits
+
+
+def _rotate_clockwise(bits):
+    """Rotate the board a quarter turn clockwise"""
+    return flip_horizontal(transpose(bits))
+
+
+def _rotate_counterclockwise(bits):
+    """Rotate the board a quarter turn counterclockwise"""
+    return flip_vertical(transpose(bits))
+
+
+def _anti_transpose(bits):
+    """Mirror the board over the other diagonal"""
+    return rotate_180(transpose(bits))
+
+
+# Transform name -> (board function, where each move of the original board
+# goes on the transformed board)
+SYMMETRIES = {
+    "identity": (_identity, {UP: UP, DOWN: DOWN, LEFT: LEFT, RIGHT: RIGHT}),
+    "flip_horizontal": (flip_horizontal,
+                        {UP: UP, DOWN: DOWN, LEFT: RIGHT, RIGHT: LEFT}),
+    "flip_vertical": (flip_vertical,
+                      {UP: DOWN, DOWN: UP, LEFT: LEFT, RIGHT: RIGHT}),
+    "rotate_180": (rotate_180, {UP: DOWN, DOWN: UP, LEFT: RIGHT, RIGHT: LEFT}),
+    "transpose": (transpose, {UP: LEFT, DOWN: RIGHT, LEFT: UP, RIGHT: DOWN}),
+    "anti_transpose": (_anti_transpose,
+                       {UP: RIGHT, DOWN: LEFT, LEFT: DOWN, RIGHT: UP}),
+    "rotate_clockwise": (_rotate_clockwise,
+                         {UP: RIGHT, DOWN: LEFT, LEFT: UP, RIGHT: DOWN}),
+    "rotate_counterclockwise": (_rotate_counterclockwise,
+                                {UP: LEFT, DOWN: RIGHT, LEFT: DOWN, RIGHT: UP})
+}
+
+EVALUATION_SYMMETRIES = ("identity", "flip_horizontal", "flip_vertical",
+                         "rotate_180")
+ALL_SYMMETRIES = tuple(SYMMETRIES)
+
+
+def canonical_form(bits, symmetries=EVALUATION_SYMMETRIES):
+    """
+    Pick one representative of the symmetric boards, the smallest int
+    Args:
+        bits: int board (see bitboard.py)
+        symmetries: transform names to consider
+    Returns: tuple (canonical bits, name of the transform that gives it)
+    """
+    best_bits = bits
+    best_name = "identity"
+    for name in symmetries:
+        transformed = SYMMETRIES[name][0](bits)
+        if transformed < best_bits:
+            best_bits = transformed
+            best_name = name
+    return best_bits, best_name
+
+
+def canonical_key(bits, symmetries=EVALUATION_SYMMETRIES):
+    """Only the canonical board of canonical_form, for cache keys"""
+    if symmetries == EVALUATION_SYMMETRIES:
+        # Unrolled for the search hot path
+        flipped = flip_horizontal(bits)
+        mirrored = flip_vertical(bits)
+        return min(bits, flipped, mirrored, flip_vertical(flipped))
+    return canonical_form(bits, symmetries)[0]
+
+
+def transform_move(direction, name):
+    """Move of the transformed board that matches direction on the original"""
+    return SYMMETRIES[name][1][direction]
+
+
+def restore_move(direction, name):
+    """Move of the original board that matches direction on the transformed"""
+    for original, transformed in SYMMETRIES[name][1].items():
+        if transformed == direction:
+            return original
+    raise ValueError(f"Unknown direction: {direction}")
@@ -0,0 +1,20 @@
+"""Boards and helpers shared by the tests"""
+
+from game import Game2048
+
+# A mid-game board with room for spawns, used by the search tests
+BOARD = [[2, 4, 8, 16], [32, 64, 2, 4], [0, 2, 0, 8], [0, 0, 4, 0]]
+
+
+def make_game(board=None):
+    """
+    Create a game with a fixed board
+    Args:
+        board: list of rows or a bitboard int, BOARD by default
+    """
+    game = Game2048()
+    if isinstance(board, int):
+        game.set_bitboard(board)
+    else:
+        game.set_board(board or BOARD)
+    return game
@@ -2,6 +2,7 @@
 
 import random  # pylint: disable=unused-import
 from unittest.mock import patch
+import pytest
 from game import Game2048, UP, DOWN, LEFT, RIGHT
 
 
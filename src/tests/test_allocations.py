@@ -0,0 +1,23 @@
+"""Tests for the allocation benchmark"""
+
+from benchmarks.allocations import measure_allocations, sample_boards
+from evaluation_tables import evaluate_with_tables
+
+
+class TestAllocations:
+    """Test that the search stays on bitboards"""
+
+    def test_no_games_or_boards_per_node(self):
+        """Test that the search builds no games and with the table
+        evaluator no list boards either"""
+        boards = sample_boards(3)
+        result = measure_allocations(boards, 2, evaluate_with_tables)
+        assert result['nodes'] > len(boards)
+        assert result['games_per_node'] == 0
+        assert result['objects_per_node'] == 0
+
+    def test_list_evaluator_builds_one_board_per_leaf(self):
+        """Test that evaluate_board only unpacks the leaves"""
+        result = measure_allocations(sample_boards(2), 2)
+        assert result['games_per_node'] == 0
+        assert 0 < result['boards_per_node'] <= 1
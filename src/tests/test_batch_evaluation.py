@@ -0,0 +1,82 @@
+"""Tests for the NumPy batch evaluator"""
+
+import random
+import pytest
+from bitboard import to_bitboard
+from evaluation import evaluate_board
+from game import Game2048
+
+np = pytest.importorskip("numpy")
+# pylint: disable=wrong-import-position
+from batch_evaluation import evaluate_boards, unpack_bitboards, game_over_mask
+
+
+def random_boards(seed, count):
+    """Random boards of all densities, including tiles above 32768"""
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        density = rng.random()
+        top = rng.choice([3, 11, 15, 17])
+        boards.append([[(1 << rng.randint(1, top)) if rng.random() < density
+                        else 0 for _ in range(4)] for _ in range(4)])
+    return boards
+
+
+class TestEvaluateBoards:
+    """Test that evaluate_boards matches evaluate_board"""
+
+    def test_matches_evaluate_board(self):
+        """Test a batch of random boards"""
+        boards = random_boards(10, 2000)
+        expected = [evaluate_board(board) for board in boards]
+        assert np.allclose(evaluate_boards(np.array(boards)), expected,
+                           rtol=0, atol=1e-12)
+
+    def test_special_boards(self):
+        """Test the empty board, a stuck board and a stuck 32768 pair"""
+        stuck = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+        pair = [row[:] for row in stuck]
+        pair[3][2] = pair[3][3] = 32768
+        boards = [[[0] * 4 for _ in range(4)], stuck, pair]
+        scores = evaluate_boards(boards)
+        assert scores[1] == 0.0
+        for board, score in zip(boards, scores):
+            assert score == pytest.approx(evaluate_board(board))
+
+    def test_flat_input(self):
+        """Test that (N, 16) input gives the same scores"""
+        boards = np.array(random_boards(11, 50))
+        assert np.array_equal(evaluate_boards(boards.reshape(-1, 16)),
+                              evaluate_boards(boards))
+
+    def test_empty_batch(self):
+        """Test that an empty batch gives an empty result"""
+        assert evaluate_boards(np.zeros((0, 4, 4))).shape == (0,)
+
+
+class TestBatchHelpers:
+    """Test unpacking and the game over mask"""
+
+    def test_unpack_bitboards(self):
+        """Test that unpacking agrees with the Game2048 board"""
+        boards = []
+        bits = []
+        for _ in range(20):
+            game = Game2048()
+            for direction in "wasd" * 10:
+                game.make_move(direction)
+            boards.append(game.board)
+            bits.append(to_bitboard(game.board))
+        assert unpack_bitboards(bits).tolist() == boards
+
+    def test_game_over_mask(self):
+        """Test the mask against Game2048.is_game_over"""
+        boards = random_boards(12, 500)
+        boards.append([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]])
+        expected = []
+        for board in boards:
+            game = Game2048()
+            game.set_board(board)
+            expected.append(game.is_game_over())
+        assert game_over_mask(np.array(boards)).tolist() == expected
@@ -0,0 +1,96 @@
+"""Tests for the level synchronous batched search"""
+
+import random
+import pytest
+from bitboard import move, UP, DOWN, LEFT, RIGHT
+from game import Game2048
+
+np = pytest.importorskip("numpy")
+# pylint: disable=wrong-import-position
+from algorithms.batched import (score_root_moves_batched, move_boards,
+                                get_engine, ENGINE_BATCHED, ENGINE_RECURSIVE)
+from algorithms.expectiminimax import (get_best_move_expectiminimax,
+                                       score_root_moves)
+from algorithms.search_context import SearchContext
+from evaluation_tables import evaluate_with_tables
+from tests.helpers import make_game
+
+
+def corpus(seed, count):
+    """Boards from a randomly played game, every few moves"""
+    rng = random.Random(seed)
+    boards = []
+    game = Game2048()
+    while not game.is_game_over() and len(boards) < count:
+        boards.append(game.get_bitboard())
+        for _ in range(7):
+            game.make_move(rng.choice("wasd"))
+    return boards
+
+
+def root_scores(engine, bits, depth, **settings):
+    """Root move values of an engine with a fresh context"""
+    context = SearchContext(**settings)
+    context.root_depth = depth
+    return engine(make_game(bits), depth, context, [UP, DOWN, LEFT, RIGHT])
+
+
+class TestBatchedSearch:
+    """Test that the batched search matches the recursive search"""
+
+    @pytest.mark.parametrize("depth", [1, 2, 3])
+    def test_values_are_identical(self, depth):
+        """Test root values bit for bit on a corpus of boards"""
+        for bits in corpus(1, 15):
+            assert (root_scores(score_root_moves_batched, bits, depth) ==
+                    root_scores(score_root_moves, bits, depth))
+
+    def test_same_move_as_recursive(self):
+        """Test the chosen move through get_best_move_expectiminimax"""
+        for bits in corpus(2, 10):
+            batched = get_best_move_expectiminimax(
+                make_game(bits), depth=3, engine=score_root_moves_batched)
+            assert batched == get_best_move_expectiminimax(make_game(bits), 3)
+
+    def test_search_settings(self):
+        """Test the probability cutoff, 4-spawn limit and custom evaluator"""
+        settings = {"min_probability": 0.01, "four_spawn_max_ply": 1,
+                    "evaluator": evaluate_with_tables}
+        for bits in corpus(3, 5):
+            assert (root_scores(score_root_moves_batched, bits, 4, **settings) ==
+                    root_scores(score_root_moves, bits, 4, **settings))
+
+    def test_time_limit(self):
+        """Test iterative deepening with the batched engine"""
+        context = SearchContext()
+        direction = get_best_move_expectiminimax(
+            make_game(corpus(4, 1)[0]), context=context, time_limit_ms=20,
+            engine=score_root_moves_batched)
+        assert direction in (UP, DOWN, LEFT, RIGHT)
+        assert context.completed_depth >= 1
+
+    def test_no_valid_moves(self):
+        """Test a stuck board"""
+        game = Game2048()
+        game.set_board([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]])
+        assert get_best_move_expectiminimax(
+            game, engine=score_root_moves_batched) == UP
+
+
+class TestBatchHelpers:
+    """Test the vectorized moves and engine lookup"""
+
+    def test_move_boards(self):
+        """Test all directions against bitboard.move"""
+        boards = corpus(5, 40)
+        bits = np.array(boards, dtype=np.uint64)
+        for direction in (UP, DOWN, LEFT, RIGHT):
+            expected = [move(board, direction)[0] for board in boards]
+            assert move_boards(bits, direction).tolist() == expected
+
+    def test_get_engine(self):
+        """Test the engine names"""
+        assert get_engine(ENGINE_RECURSIVE) is score_root_moves
+        assert get_engine(ENGINE_BATCHED) is score_root_moves_batched
+        with pytest.raises(ValueError):
+            get_engine("quantum")
@@ -0,0 +1,76 @@
+"""Tests for the benchmark suite"""
+
+import json
+from unittest.mock import patch
+from benchmarks.corpus import CORPUS, PHASES
+from benchmarks.suite import (benchmarks, run_suite, append_history, compare,
+                              save_record, main)
+from bitboard import count_empty, is_game_over
+
+
+def record(**times):
+    """Run record with the given best times"""
+    return {'results': {name: {'best': best, 'median': best}
+                        for name, best in times.items()}}
+
+
+class TestCorpus:
+    """Test the frozen boards"""
+
+    def test_boards_are_playable(self):
+        """Test that no corpus board is already lost"""
+        assert len(set(CORPUS)) == len(CORPUS)
+        assert not any(is_game_over(bits) for bits in CORPUS)
+
+    def test_phases(self):
+        """Test that the phases get fuller"""
+        empty = {phase: min(count_empty(bits) for bits in boards)
+                 for phase, boards in PHASES.items()}
+        assert empty['opening'] > empty['midgame'] > empty['endgame']
+
+
+class TestSuite:
+    """Test running and comparing benchmarks"""
+
+    def test_names(self):
+        """Test that micro and macro benchmarks are included"""
+        names = list(benchmarks())
+        assert "combine_row" in names
+        assert "search_depth_5" in names
+        assert "games_depth_2" in names
+
+    def test_run_selected(self):
+        """Test that a name filter only runs the matching benchmarks"""
+        result = run_suite(["has_moves"], repeat=2)
+        assert list(result['results']) == ["has_moves_available"]
+        timing = result['results']['has_moves_available']
+        assert 0 < timing['best'] <= timing['median']
+        assert timing['repeat'] == 2
+
+    def test_history_is_appended(self, tmp_path):
+        """Test that every run adds to the history file"""
+        path = tmp_path / "history.json"
+        append_history(record(a=1.0), path)
+        append_history(record(a=2.0), path)
+        history = json.loads(path.read_text())
+        assert [run['results']['a']['best'] for run in history] == [1.0, 2.0]
+
+    def test_compare(self):
+        """Test that only slowdowns over the threshold are regressions"""
+        rows = compare(record(a=1.05, b=1.2, c=1.0),
+                       record(a=1.0, b=1.0), threshold=0.1)
+        assert [row['name'] for row in rows] == ["a", "b"]
+        assert [row['regressed'] for row in rows] == [False, True]
+
+    def test_exit_status(self, tmp_path):
+        """Test that main fails on a regression against the baseline"""
+        baseline = tmp_path / "baseline.json"
+        args = ["--names", "has_moves", "--repeat", "1",
+                "--history", str(tmp_path / "history.json"),
+                "--baseline", str(baseline)]
+        with patch('builtins.print'):
+            save_record(record(has_moves_available=1.0), baseline)
+            assert main(args) == 0
+            save_record(record(has_moves_available=1e-12), baseline)
+            assert main(args) == 1
+            assert main(args + ["--save-baseline"]) == 0
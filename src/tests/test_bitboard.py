@@ -0,0 +1,147 @@
+"""Tests for the bitboard representation"""
+
+import random
+import pytest
+from bitboard import (to_bitboard, to_board, fits_bitboard, get_tile, transpose,
+                      move, move_row_left, empty_cells, count_empty, max_tile,
+                      spawn_tile, add_random_tile, is_game_over, legal_moves,
+                      UP, DOWN, LEFT, RIGHT)
+from evaluation import evaluate_board, evaluate_bitboard
+from game import Game2048
+
+
+def random_board(rng, max_exponent=11):
+    """Create a random board with some empty cells"""
+    return [[(1 << rng.randint(1, max_exponent)) if rng.random() < 0.7 else 0
+             for _ in range(4)] for _ in range(4)]
+
+
+class TestConversion:
+    """Test packing and unpacking boards"""
+
+    def test_round_trip(self):
+        """Test that to_board undoes to_bitboard"""
+        board = [[2, 4, 8, 16], [0, 32, 0, 64], [128, 256, 512, 1024],
+                 [2048, 4096, 0, 32768]]
+        assert to_board(to_bitboard(board)) == board
+
+    def test_layout(self):
+        """Test that cell (i, j) is stored in nibble 4 * i + j"""
+        board = [[0] * 4 for i in range(4)]
+        board[1][2] = 8
+        assert to_bitboard(board) == 3 << (4 * 6)
+        assert get_tile(to_bitboard(board), 1, 2) == 8
+
+    def test_unrepresentable_tile(self):
+        """Test that tiles above 32768 are rejected"""
+        board = [[65536, 0, 0, 0], [0] * 4, [0] * 4, [0] * 4]
+        assert not fits_bitboard(board)
+        with pytest.raises(ValueError):
+            to_bitboard(board)
+
+    def test_game_adapters(self):
+        """Test Game2048 bitboard adapters"""
+        game = Game2048()
+        bits = game.get_bitboard()
+        game.set_bitboard(bits)
+        assert game.get_bitboard() == bits
+        assert to_board(bits) == game.board
+
+    def test_transpose(self):
+        """Test that transpose swaps rows and columns"""
+        board = [[2, 4, 8, 16], [32, 64, 128, 256], [512, 1024, 2048, 4096],
+                 [8192, 16384, 32768, 0]]
+        expected = [list(column) for column in zip(*board)]
+        assert to_board(transpose(to_bitboard(board))) == expected
+
+
+class TestMoves:
+    """Test bitboard moves against Game2048"""
+
+    def test_move_row_left(self):
+        """Test single row combinations"""
+        row = to_bitboard([[2, 2, 4, 4], [0] * 4, [0] * 4, [0] * 4])
+        assert to_board(move_row_left(row))[0] == [4, 8, 0, 0]
+
+    def test_max_tiles_do_not_combine(self):
+        """Test that two 32768 tiles stay apart"""
+        row = to_bitboard([[32768, 32768, 0, 0], [0] * 4, [0] * 4, [0] * 4])
+        assert move_row_left(row) == row
+
+    def test_matches_game_moves(self):
+        """Test all directions on random boards"""
+        rng = random.Random(2048)
+        for _ in range(200):
+            board = random_board(rng)
+            for direction in (UP, DOWN, LEFT, RIGHT):
+                game = Game2048()
+                game.set_board(board)
+                game.add_random_tile = lambda: None
+                moved = game.make_move(direction)
+
+                new_bits, bit_moved = move(to_bitboard(board), direction)
+                assert bit_moved == moved
+                assert to_board(new_bits) == game.board
+
+    def test_legal_moves(self):
+        """Test that only the moves changing the board are listed"""
+        bits = to_bitboard([[2, 0, 0, 0], [0] * 4, [0] * 4, [0] * 4])
+        assert [direction for direction, _ in legal_moves(bits)] == [DOWN, RIGHT]
+        assert legal_moves(bits)[0][1] == move(bits, DOWN)[0]
+        stuck = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+        assert not legal_moves(to_bitboard(stuck))
+
+    def test_invalid_direction(self):
+        """Test that an unknown direction does not move"""
+        bits = to_bitboard([[2, 0, 0, 0], [0] * 4, [0] * 4, [0] * 4])
+        assert move(bits, "x") == (bits, False)
+
+
+class TestBoardQueries:
+    """Test empty cells, max tile, spawns and game over"""
+
+    def test_empty_cells(self):
+        """Test empty cell indexes and counts"""
+        board = [[2, 0, 0, 0], [0, 4, 0, 0], [0, 0, 0, 0], [0, 0, 0, 8]]
+        bits = to_bitboard(board)
+        assert count_empty(bits) == 13
+        assert len(empty_cells(bits)) == 13
+        assert 0 not in empty_cells(bits)
+        assert count_empty(0) == 16
+
+    def test_max_tile(self):
+        """Test max tile lookup"""
+        board = [[2, 0, 0, 0], [0, 1024, 0, 0], [0, 0, 0, 0], [0, 0, 0, 8]]
+        assert max_tile(to_bitboard(board)) == 1024
+        assert max_tile(0) == 0
+
+    def test_spawn_tile(self):
+        """Test placing a tile"""
+        bits = spawn_tile(0, 5, 2)
+        assert get_tile(bits, 1, 1) == 4
+
+    def test_add_random_tile(self):
+        """Test that a random tile lands on an empty cell"""
+        bits = to_bitboard([[2, 2, 2, 2]] * 3 + [[2, 2, 2, 0]])
+        new_bits = add_random_tile(bits)
+        assert get_tile(new_bits, 3, 3) in (2, 4)
+        full = to_bitboard([[2] * 4] * 4)
+        assert add_random_tile(full) == full
+
+    def test_is_game_over(self):
+        """Test game over detection"""
+        stuck = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+        assert is_game_over(to_bitboard(stuck))
+        stuck[3][3] = 4
+        assert not is_game_over(to_bitboard(stuck))
+        assert not is_game_over(0)
+        # Two 32768 tiles are still a move in the game rules
+        stuck[3][2] = stuck[3][3] = 32768
+        assert not is_game_over(to_bitboard(stuck))
+
+    def test_evaluate_bitboard(self):
+        """Test that bitboard evaluation matches evaluate_board"""
+        rng = random.Random(7)
+        for _ in range(20):
+            board = random_board(rng)
+            assert evaluate_bitboard(to_bitboard(board)) == evaluate_board(board)
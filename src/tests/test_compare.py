@@ -0,0 +1,110 @@
+"""Tests for the paired comparison of two configurations"""
+
+from unittest.mock import patch
+import pytest
+from algorithms.depth_policy import empty_cells_depth
+from compare import (PairedSummary, compare_configurations,
+                     make_configuration, metric_value, parse_args,
+                     parse_configuration, play_paired_game)
+from measure import game_seed
+
+
+def pair(score_a, score_b, moves=100):
+    """Results of one seed for A and B"""
+    return {'seed': 0, 'results': [
+        {'moves': moves, 'score': score, 'max_tile': 256, 'won': False,
+         'cpu_seconds': 0.1} for score in (score_a, score_b)]}
+
+
+class TestConfiguration:
+    """Test parsing configurations"""
+
+    def test_parse(self):
+        """Test the algorithm, depth and options of a configuration"""
+        config = parse_configuration("expectiminimax 4 --engine batched "
+                                     "--depth-policy empty")
+        assert (config['algorithm'], config['depth']) == ("expectiminimax", 4)
+        assert config['options']['engine'] == "batched"
+        assert config['options']['depth_policy'] is empty_cells_depth
+        assert parse_configuration("depth_one")['depth'] == 3
+        config = parse_configuration("expectiminimax 2 --min-probability 0.01")
+        assert config['options']['min_probability'] == 0.01
+
+    def test_weights(self):
+        """Test that the weights are parsed and written back to the label"""
+        config = parse_configuration("expectiminimax 2 --weights 1,0,0,0,0,0.5")
+        assert config['options']['weights'] == (1, 0, 0, 0, 0, 0.5)
+        label = make_configuration("expectiminimax", 2,
+                                   weights=(1.0, 0, 0, 0, 0, 0.5))['label']
+        assert label == "expectiminimax 2 --weights 1,0,0,0,0,0.5"
+        assert parse_configuration(label)['options'] == config['options']
+        with pytest.raises(SystemExit):
+            parse_configuration("expectiminimax 2 --weights 1,0")
+
+    def test_command_line(self):
+        """Test that both configurations are parsed"""
+        args = parse_args(["20", "depth_one", "expectiminimax 2", "--seed", "1"])
+        assert [config['label'] for config in args.configurations] == \
+            ["depth_one", "expectiminimax 2"]
+
+
+class TestPairedSummary:
+    """Test the paired differences"""
+
+    def test_paired_interval_is_narrower(self):
+        """Test that a constant difference is found exactly"""
+        summary = PairedSummary()
+        for score in (500, 900, 1300, 700):
+            summary.add(pair(score, score + 50))
+        assert summary.difference['score'].mean == 50
+        assert summary.interval('score') == (50, 50)
+        assert summary.independent_half_width('score') > 100
+
+    def test_interval(self):
+        """Test the normal interval of the mean difference"""
+        summary = PairedSummary()
+        for difference in (10, 20, 30, 40):
+            summary.add(pair(1000, 1000 + difference))
+        low, high = summary.interval('score')
+        assert (low + high) / 2 == 25
+        assert (high - low) / 2 == pytest.approx(1.96 * 12.91 / 2, rel=1e-3)
+
+    def test_metric_values(self):
+        """Test the derived metrics"""
+        result = {'moves': 200, 'score': 1, 'max_tile': 2, 'won': True,
+                  'cpu_seconds': 0.5}
+        assert metric_value(result, 'won') == 1
+        assert metric_value(result, 'ms_per_move') == 2.5
+
+
+class TestPairedGames:
+    """Test playing both configurations on a seed"""
+
+    def test_same_configuration_same_game(self):
+        """Test that both games of a pair get the same spawns"""
+        config = parse_configuration("depth_one")
+        results = play_paired_game(7, [config, config])['results']
+        for result in results:
+            del result['cpu_seconds']
+        assert results[0] == results[1]
+
+    @patch('builtins.print')
+    def test_every_seed_is_played_by_both(self, mock_print):
+        """Test the seeds and the report of a run"""
+        played = []
+
+        def play(seed, algorithm, _depth, _options):
+            played.append((seed, algorithm))
+            return {'moves': 10, 'score': 64 if algorithm == "depth_one" else 96,
+                    'max_tile': 16, 'won': False, 'seed': seed}
+
+        configurations = [parse_configuration("depth_one"),
+                          parse_configuration("expectiminimax 1")]
+        with patch('compare.play_seeded_game', play):
+            summary = compare_configurations(3, configurations, seed=2)
+        assert played == [(game_seed(2, i), algorithm) for i in range(3)
+                          for algorithm in ("depth_one", "expectiminimax")]
+        assert summary.interval('score') == (32, 32)
+        output = '\n'.join(str(call[0][0]) for call in mock_print.call_args_list
+                           if call[0])
+        assert "Seeds played: 3" in output
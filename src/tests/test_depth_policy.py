@@ -0,0 +1,60 @@
+"""Tests for depth policies"""
+
+import pytest
+from algorithms.depth_policy import (fixed_depth, empty_cells_depth,
+                                     distinct_tiles, distinct_tiles_depth,
+                                     get_depth_policy, MAX_POLICY_DEPTH)
+from algorithms.expectiminimax import get_best_move_expectiminimax
+from algorithms.search_context import SearchContext
+from bitboard import to_bitboard
+from game import Game2048
+
+OPEN_BOARD = [[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 4]]
+CROWDED_BOARD = [[2, 4, 8, 16], [32, 64, 128, 256],
+                 [512, 1024, 2, 4], [8, 16, 0, 0]]
+DISTINCT_BOARD = [[2, 4, 8, 16], [32, 64, 128, 256],
+                  [512, 1024, 2048, 4096], [8192, 16384, 32768, 2]]
+
+
+class TestDepthPolicies:
+    """Test the built-in policies"""
+
+    def test_fixed_depth(self):
+        """Test that fixed depth ignores the board"""
+        assert fixed_depth(to_bitboard(OPEN_BOARD), 3) == 3
+
+    def test_empty_cells_depth(self):
+        """Test that crowded boards get more depth"""
+        assert empty_cells_depth(to_bitboard(OPEN_BOARD), 3) == 2
+        assert empty_cells_depth(to_bitboard(CROWDED_BOARD), 3) == 5
+        assert empty_cells_depth(0, 1) == 1
+
+    def test_distinct_tiles_depth(self):
+        """Test that many distinct tiles get more depth"""
+        assert distinct_tiles(to_bitboard(CROWDED_BOARD)) == 10
+        assert distinct_tiles_depth(to_bitboard(CROWDED_BOARD), 3) == 6
+        assert distinct_tiles_depth(to_bitboard(OPEN_BOARD), 3) == 3
+
+    def test_distinct_tiles_depth_cap(self):
+        """Test that a full board of every tile value stays at the cap"""
+        assert distinct_tiles(to_bitboard(DISTINCT_BOARD)) == 15
+        assert distinct_tiles_depth(to_bitboard(DISTINCT_BOARD), 3) == \
+            MAX_POLICY_DEPTH
+        assert distinct_tiles_depth(to_bitboard(DISTINCT_BOARD), 7) == 7
+
+    def test_get_depth_policy(self):
+        """Test looking up policies by name"""
+        assert get_depth_policy("empty") is empty_cells_depth
+        with pytest.raises(ValueError, match="Unknown depth policy: deep"):
+            get_depth_policy("deep")
+
+    def test_custom_policy_in_search(self):
+        """Test that the entry point uses a custom policy"""
+        game = Game2048()
+        game.set_board(OPEN_BOARD)
+        context = SearchContext()
+        context.depth_policy = lambda bits, depth: 1
+
+        get_best_move_expectiminimax(game, depth=3, context=context)
+
+        assert context.completed_depth == 1
@@ -0,0 +1,138 @@
+"""Tests for the TCP work queue of distributed measurement runs"""
+
+import json
+import multiprocessing
+import socket
+import threading
+import pytest
+from distributed import (DONE, Coordinator, JobBoard, parse_address,
+                         run_worker)
+from measure import (game_seed, game_seeds, iter_distributed_results,
+                     iter_game_results, job_options, play_worker)
+from algorithms.depth_policy import empty_cells_depth
+
+
+class Clock:
+    """Time that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def without_cpu(results):
+    """Results by seed without the CPU time, which differs between runs"""
+    return sorted(({key: value for key, value in result.items()
+                    if key != 'cpu_seconds'} for result in results),
+                  key=lambda result: result['seed'])
+
+
+class TestJobBoard:
+    """Test leasing and finishing jobs"""
+
+    def test_take_and_finish(self):
+        """Test that every job is handed out once and then DONE"""
+        board = JobBoard([10, 11])
+        assert board.take("a") == (0, 10)
+        assert board.take("b") == (1, 11)
+        assert board.take("c") is None
+        assert board.finish(0, {'seed': 10}) and board.finish(1, {'seed': 11})
+        assert board.take("c") == DONE
+        assert [board.results.get()[0] for _ in range(2)] == [0, 1]
+
+    def test_expired_lease_is_requeued(self):
+        """Test that a silent worker loses its job and heartbeats keep it"""
+        clock = Clock()
+        board = JobBoard([10, 11], lease_seconds=5, clock=clock)
+        board.take("silent")
+        board.take("busy")
+        clock.now = 4
+        board.heartbeat("busy", 1)
+        clock.now = 6
+        assert board.take("other") == (0, 10)
+        assert board.take("other") is None
+        assert board.requeued == 1
+
+    def test_late_result_counts_once(self):
+        """Test that a job finished by two workers is recorded once"""
+        board = JobBoard([10])
+        board.take("a")
+        board.drop_worker("a")
+        assert board.finish(0, {'seed': 10})
+        assert board.take("b") == DONE
+        assert not board.finish(0, {'seed': 10})
+        assert board.results.qsize() == 1
+
+    def test_close(self):
+        """Test that a closed board hands out nothing"""
+        board = JobBoard([10])
+        board.close()
+        assert board.take("a") == DONE
+
+
+class TestAddresses:
+    """Test the address format and the job settings"""
+
+    def test_parse_address(self):
+        """Test the parts that can be left out"""
+        assert parse_address("example.org:4000") == ("example.org", 4000)
+        assert parse_address(":4000") == ("127.0.0.1", 4000)
+        assert parse_address("example.org")[0] == "example.org"
+
+    def test_job_options(self):
+        """Test that options are sent as JSON"""
+        options = job_options({'depth_policy': empty_cells_depth, 'engine': None})
+        assert json.loads(json.dumps(options)) == {
+            'depth_policy': "empty", 'engine': None, 'cache_readonly': True}
+        with pytest.raises(ValueError):
+            job_options({'shared_table': object()})
+
+
+class TestWorkers:
+    """Test coordinators and workers on this machine"""
+
+    def test_same_results_as_local_games(self):
+        """Test that local worker processes play the same games"""
+        config = {'algorithm': "depth_one", 'depth': 1, 'options': {}}
+        distributed = iter_distributed_results(
+            config, game_seeds(4, 6), ("127.0.0.1", 0), local_workers=2)
+        local = iter_game_results(config, game_seeds(4, 6))
+        assert without_cpu(distributed) == without_cpu(local)
+
+    def test_worker_that_disappears(self):
+        """Test that the job of a dropped connection is played by others"""
+        seeds = [game_seed(2, i) for i in range(3)]
+        board = JobBoard(seeds)
+        config = {'algorithm': "depth_one", 'depth': 1, 'options': {}}
+        with Coordinator(board, config, ("127.0.0.1", 0)) as coordinator:
+            with socket.create_connection(coordinator.address) as doomed:
+                doomed.sendall(b'{"op": "take", "worker": "doomed"}\n')
+                assert json.loads(doomed.makefile().readline())['job'] == 0
+            workers = [multiprocessing.Process(target=play_worker,
+                                               args=(coordinator.address,))
+                       for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            results = [board.results.get(timeout=60)[1] for _ in seeds]
+            for worker in workers:
+                worker.join(timeout=10)
+        assert sorted(result['seed'] for result in results) == seeds
+        assert board.requeued == 1
+
+    def test_failed_game_is_reported(self):
+        """Test that an error on a worker reaches the coordinator"""
+        def play(_seed, _config):
+            raise ValueError("broken")
+
+        board = JobBoard([1])
+        with Coordinator(board, {}, ("127.0.0.1", 0)) as coordinator:
+            thread = threading.Thread(target=run_worker,
+                                      args=(coordinator.address, play, "w"))
+            thread.start()
+            job, error = board.results.get(timeout=10)
+            board.close()
+            thread.join(timeout=10)
+        assert job == 0
+        assert "w: ValueError('broken')" in str(error)
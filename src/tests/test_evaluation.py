@@ -1,6 +1,11 @@
 """Tests for evaluation.py"""
 
-from evaluation import evaluate_board
+import pickle
+import pytest
+from algorithms.position_cache import settings_hash
+from algorithms.search_context import SearchContext
+from bitboard import to_bitboard
+from evaluation import evaluate_board, WeightedEvaluator, WEIGHTS
 
 
 class TestEvaluateBoard:
@@ -210,3 +215,32 @@ class TestHeuristicComponents:
         # All corner positions should score similarly and better than center
         for corner_score in corner_scores:
             assert corner_score > center_score
+
+
+class TestWeightedEvaluator:
+    """Test the evaluator with other heuristic weights"""
+
+    BOARD = [[2, 4, 8, 16], [0, 2, 4, 8], [0, 0, 2, 4], [0, 0, 0, 2]]
+
+    def test_default_weights(self):
+        """Test that the default weights give the evaluate_board score"""
+        evaluator = WeightedEvaluator(WEIGHTS)
+        assert evaluator(to_bitboard(self.BOARD)) == evaluate_board(self.BOARD)
+
+    def test_single_term(self):
+        """Test that only the weighted terms count"""
+        evaluator = WeightedEvaluator((1, 0, 0, 0, 0, 0))
+        assert evaluator(to_bitboard(self.BOARD)) == 6 / 16
+
+    def test_picklable_and_hashed(self):
+        """Test that workers and the position cache can tell weights apart"""
+        evaluator = pickle.loads(pickle.dumps(WeightedEvaluator(WEIGHTS)))
+        assert evaluator.weights == WEIGHTS
+        assert settings_hash(SearchContext(evaluator=evaluator)) != \
+            settings_hash(SearchContext(
+                evaluator=WeightedEvaluator((1, 0, 0, 0, 0, 0))))
+
+    def test_wrong_number_of_weights(self):
+        """Test that every term needs a weight"""
+        with pytest.raises(ValueError, match="Expected 6 weights"):
+            WeightedEvaluator((0.5, 0.5))
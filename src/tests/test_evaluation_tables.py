@@ -0,0 +1,43 @@
+"""Tests for the lookup table evaluator"""
+
+import random
+from bitboard import to_bitboard
+from evaluation import evaluate_board
+from evaluation_tables import evaluate_with_tables
+from algorithms.expectiminimax import expectiminimax
+from algorithms.search_context import SearchContext
+from game import Game2048
+
+
+class TestEvaluateWithTables:
+    """Test that the table evaluator matches evaluate_board"""
+
+    def test_matches_evaluate_board(self):
+        """Test random boards of all densities"""
+        rng = random.Random(4)
+        for _ in range(2000):
+            density = rng.random()
+            top = rng.choice([3, 11, 15])
+            board = [[(1 << rng.randint(1, top)) if rng.random() < density else 0
+                      for _ in range(4)] for _ in range(4)]
+            assert evaluate_with_tables(to_bitboard(board)) == evaluate_board(board)
+
+    def test_empty_board(self):
+        """Test the empty board"""
+        board = [[0] * 4 for i in range(4)]
+        assert evaluate_with_tables(0) == evaluate_board(board)
+
+    def test_game_over(self):
+        """Test that a stuck board scores zero"""
+        board = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+        assert evaluate_with_tables(to_bitboard(board)) == 0.0
+
+    def test_search_evaluator(self):
+        """Test that the search gives the same value with the table evaluator"""
+        board = [[2, 4, 8, 16], [32, 64, 2, 4], [0, 2, 0, 8], [0, 0, 4, 0]]
+        game = Game2048()
+        game.set_board(board)
+        context = SearchContext(evaluator=evaluate_with_tables)
+
+        assert expectiminimax(game, 2, False, context=context) == \
+            expectiminimax(game, 2, False)
@@ -2,7 +2,15 @@
 
 from unittest.mock import Mock, patch
 import pytest
-from algorithms.expectiminimax import expectiminimax, get_best_move_expectiminimax, UP
+from algorithms.search_context import SearchContext
+from algorithms.transposition import TranspositionTable
+from algorithms.expectiminimax import (expectiminimax, get_best_move_expectiminimax,
+                                       apply_move, score_root_moves, search,
+                                       DIRECTIONS, UP, DOWN, LEFT, RIGHT)
+from algorithms.depth_one_move import depth_one_move
+from bitboard import empty_cells, legal_moves, move, spawn_tile
+from game import Game2048
+from tests.helpers import make_game
 
 
 class TestExpectiminimax:
@@ -21,13 +29,15 @@ class TestExpectiminimax:
     def test_base_case_game_over(self):
         """Test that game over returns evaluation score"""
         mock_game = Mock()
-        mock_game.is_game_over.return_value = True
-        mock_game.board = [[2, 4], [8, 16]]
+        mock_game.board = [[2, 4, 2, 4], [4, 2, 4, 2],
+                           [2, 4, 2, 4], [4, 2, 4, 2]]
 
-        with patch('algorithms.expectiminimax.evaluate_board', return_value=50):
+        with patch('algorithms.expectiminimax.evaluate_board',
+                   return_value=50) as mock_eval:
             result = expectiminimax(mock_game, depth=3, is_player_turn=True)
 
         assert result == 50
+        assert mock_eval.call_count == 1
 
 
 class TestGetBestMoveExpectiminimax:
@@ -35,61 +45,40 @@ class TestGetBestMoveExpectiminimax:
 
     def test_only_considers_valid_moves(self):
         """Test that only valid moves are evaluated"""
-        mock_game = Mock()
-        mock_game.get_board_copy.return_value = [[2, 4, 8, 16]] * 4
-
-        with patch('algorithms.expectiminimax.Game2048') as mockgame:
-            mock_temp_game = Mock()
-            # Simulate that only some moves change the board
+        game = Game2048()
+        game.set_board([[2, 4, 8, 16], [16, 8, 4, 2],
+                       [2, 4, 8, 16], [16, 8, 4, 2]])
 
-            def mock_combine_row(row):
-                return row  # No change, simulating invalid move
-            mock_temp_game.combine_row.side_effect = mock_combine_row
-            mock_temp_game.board = [[2, 4, 8, 16]] * 4
-            mockgame.return_value = mock_temp_game
-
-            result = get_best_move_expectiminimax(mock_game, depth=2)
+        with patch('algorithms.expectiminimax.search') as mock_search:
+            result = get_best_move_expectiminimax(game, depth=2)
 
             # Should return fallback since no moves are valid
             assert result == "up"
+            assert not mock_search.called
 
     def test_default_depth(self):
         """Test that default depth is used when not specified"""
-        mock_game = Mock()
-        mock_game.get_board_copy.return_value = [[0] * 4 for i in range(4)]
+        game = Game2048()
+        game.set_board([[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
 
-        with patch('algorithms.expectiminimax.Game2048') as mockgame:
-            mock_temp_game = Mock()
-            mock_temp_game.combine_row.side_effect = lambda x: [
-                1] + x[1:]  # Valid move
-            mock_temp_game.board = [[0] * 4 for i in range(4)]
-            mockgame.return_value = mock_temp_game
+        with patch('algorithms.expectiminimax.search',
+                   return_value=10) as mock_search:
+            get_best_move_expectiminimax(game)  # No depth specified
 
-            with patch('algorithms.expectiminimax.expectiminimax',
-                       return_value=10) as mock_expectiminimax:
-                get_best_move_expectiminimax(mock_game)  # No depth specified
-
-                # Should be called with depth-1 = 2 (default depth is 3)
-                mock_expectiminimax.assert_called_with(
-                    mock_temp_game, 2, False)
+            # Should be called with depth-1 = 2 (default depth is 3)
+            args = mock_search.call_args[0]
+            assert args[1:3] == (2, False)
 
     def test_handles_tie_scores(self):
         """Test behavior when multiple moves have same score"""
-        mock_game = Mock()
-        mock_game.get_board_copy.return_value = [[0] * 4 for i in range(4)]
+        game = Game2048()
+        game.set_board([[0, 0, 0, 0], [0, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
 
-        with patch('algorithms.expectiminimax.Game2048') as mockgame:
-            mock_temp_game = Mock()
-            mock_temp_game.combine_row.side_effect = lambda x: [
-                1] + x[1:]  # Valid move
-            mock_temp_game.board = [[0] * 4 for i in range(4)]
-            mockgame.return_value = mock_temp_game
+        with patch('algorithms.expectiminimax.search', return_value=10):
+            result = get_best_move_expectiminimax(game, depth=2)
 
-            with patch('algorithms.expectiminimax.expectiminimax', return_value=10):
-                result = get_best_move_expectiminimax(mock_game, depth=2)
-
-                # Should return first move that achieves the best score
-                assert result == "up"
+            # Should return first move that achieves the best score
+            assert result == "up"
 
 
 class TestExpectiminimaxPlayerTurn:
@@ -102,20 +91,13 @@ class TestExpectiminimaxPlayerTurn:
         mock_game.board = [[0, 2, 0, 0], [
             0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
 
-        with patch('algorithms.expectiminimax.apply_move') as mock_apply:
-            mock_apply.side_effect = [
-                [[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],  # UP
-                [[0, 0, 0, 0], [2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],  # DOWN
-                [[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],  # LEFT
-                [[0, 0, 2, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],  # RIGHT
-            ]
-
+        with patch('algorithms.expectiminimax.move', wraps=move) as mock_move:
             with patch('algorithms.expectiminimax.evaluate_board', return_value=50):
                 result = expectiminimax(
                     mock_game, depth=1, is_player_turn=True)
 
         assert result == 50
-        assert mock_apply.call_count == 4  # All 4 directions tested
+        assert mock_move.call_count == 4  # All 4 directions tested
 
     def test_player_turn_no_valid_moves(self):
         """Test player turn when no moves are valid"""
@@ -142,18 +124,52 @@ class TestExpectiminimaxRandomTurn:
         mock_game.board = [[2, 0, 0, 0], [
             0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
 
-        with patch('algorithms.expectiminimax.evaluate_board', return_value=100):
-            with patch('algorithms.expectiminimax.random.sample') as mock_sample:
-                # Mock sampling to return 7 cells (set to 7 in code to reduce
-                # time)
-                mock_sample.return_value = [
-                    (0, 1), (0, 2), (0, 3), (1, 0), (1, 1), (1, 2), (1, 3)]
-                result = expectiminimax(
-                    mock_game, depth=1, is_player_turn=False)
+        with patch('algorithms.expectiminimax.evaluate_board',
+                   return_value=100) as mock_eval:
+            result = expectiminimax(
+                mock_game, depth=1, is_player_turn=False)
 
-        # Should calculate weighted average across sampled cells
+        # Every empty cell is expanded with both tiles, no sampling
         assert pytest.approx(result) == 100
-        assert mock_sample.called
+        assert mock_eval.call_count == 15 * 2
+        assert mock_game.board[0] == [2, 0, 0, 0]
+
+    def test_probability_cutoff(self):
+        """Test that unlikely paths are evaluated without expanding"""
+        game = Game2048()
+        game.set_board([[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
+        context = SearchContext(min_probability=0.5)
+
+        with patch('algorithms.expectiminimax.evaluate_board',
+                   return_value=100) as mock_eval:
+            expectiminimax(game, depth=3, is_player_turn=False,
+                           context=context)
+
+        # Every child has probability below 0.5, so only 30 leaf evaluations
+        assert mock_eval.call_count == 15 * 2
+
+    def test_four_spawn_cutoff(self):
+        """Test that 4-spawns are skipped deeper than the configured ply"""
+        game = Game2048()
+        game.set_board([[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
+        context = SearchContext(four_spawn_max_ply=0)
+        context.root_depth = 2
+
+        with patch('algorithms.expectiminimax.evaluate_board',
+                   return_value=100) as mock_eval:
+            expectiminimax(game, depth=1, is_player_turn=False,
+                           context=context)
+
+        assert mock_eval.call_count == 15
+
+    def test_deterministic(self):
+        """Test that repeated searches give the same value"""
+        game = Game2048()
+        game.set_board([[2, 0, 4, 0], [0, 8, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]])
+
+        values = {expectiminimax(game, 3, False) for _ in range(3)}
+
+        assert len(values) == 1
 
     def test_random_turn_no_empty_cells(self):
         """Test random turn when board is full"""
@@ -168,47 +184,31 @@ class TestExpectiminimaxRandomTurn:
         assert result == 75  # No empty cells, returns evaluation
 
 
-class TestExpectiminimaxMoveSimulation:
-    """Test the actual move simulation logic"""
+class TestApplyMove:
+    """Test the table driven move simulation"""
 
-    def test_left_move_simulation(self):
+    def test_left_move(self):
         """Test LEFT move board transformation"""
-        mock_game = Mock()
-        mock_game.is_game_over.return_value = False
-        mock_game.board = [[2, 2, 0, 0], [
-            0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
-
-        with patch('algorithms.expectiminimax._cached_game') as mock_cached:
-            mock_cached.combine_row.side_effect = lambda row: [
-                4, 0, 0, 0] if row == [2, 2, 0, 0] else row
-            mock_cached.board = [[2, 2, 0, 0], [
-                0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+        board = [[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
 
-            with patch('algorithms.expectiminimax.evaluate_board', return_value=100):
-                expectiminimax(mock_game, depth=1, is_player_turn=True)
-
-            # Verify combine_row was called for LEFT
-            assert mock_cached.combine_row.called
+        assert apply_move(board, LEFT) == [
+            [4, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+        assert board[0] == [2, 2, 0, 0]  # Original is untouched
 
     def test_up_down_move_transformations(self):
         """Test UP and DOWN move board transformations"""
-        mock_game = Mock()
-        board = [[2, 0, 0, 0], [2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
-        mock_game.get_board_copy.return_value = board
-        mock_game.is_game_over.return_value = False
-        mock_game.board = board
-        mock_game.set_board = Mock()
+        board = [[2, 0, 0, 0], [2, 0, 0, 0], [0, 0, 0, 0], [0, 4, 0, 0]]
 
-        with patch('algorithms.expectiminimax._cached_game') as mock_cached_game:
-            mock_cached_game.board = board
-            mock_cached_game.combine_row = Mock(
-                side_effect=lambda col: [4, 0, 0, 0] if col == [2, 2, 0, 0] else col)
+        assert apply_move(board, UP) == [
+            [4, 4, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+        assert apply_move(board, DOWN) == [
+            [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [4, 4, 0, 0]]
 
-            with patch('algorithms.expectiminimax.evaluate_board', return_value=100):
-                expectiminimax(mock_game, depth=1, is_player_turn=True)
+    def test_right_move(self):
+        """Test RIGHT move board transformation"""
+        board = [[2, 2, 2, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
 
-            # Should have called combine_row for column operations
-            assert mock_cached_game.combine_row.call_count > 0
+        assert apply_move(board, RIGHT)[0] == [0, 0, 2, 4]
 
 
 class TestGetBestMoveAllDirections:
@@ -216,18 +216,10 @@ class TestGetBestMoveAllDirections:
 
     def test_all_moves_invalid_returns_up(self):
         """Test that UP is returned when all moves are invalid"""
-        mock_game = Mock()
-        full_board = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
-        mock_game.get_board_copy.return_value = full_board
-
-        with patch('algorithms.expectiminimax.Game2048') as mockgame2048:
-            mock_temp_game = Mock()
-            mock_temp_game.board = full_board
-            # No changes possible = board stays the same
-            mock_temp_game.combine_row = Mock(side_effect=lambda row: row)
-            mockgame2048.return_value = mock_temp_game
+        game = Game2048()
+        game.set_board([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]])
 
-            result = get_best_move_expectiminimax(mock_game, depth=1)
+        result = get_best_move_expectiminimax(game, depth=1)
 
         assert result == UP  # Default fallback
 
@@ -236,29 +228,138 @@ class TestRecursiveDepth:
     """Test recursive depth behavior"""
 
     def test_recursive_depth_calculation(self):
-        """Test that recursion properly decrements depth"""
-        mock_game = Mock()
-        mock_game.is_game_over.return_value = False
-        mock_game.get_board_copy.return_value = [
-            [2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
-        mock_game.board = [[2, 0, 0, 0], [
-            0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
-        mock_game.make_move.return_value = True
-        mock_game.set_board = Mock()
-
-        with patch('algorithms.expectiminimax.Game2048') as mockgame2048:
-            mock_temp_game = Mock()
-            mock_temp_game.board = [[2, 0, 0, 0], [
-                0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
-            mock_temp_game.combine_row = Mock(
-                side_effect=lambda row: [
-                    2, 0, 0, 0] if row[0] == 2 else row)
-            mockgame2048.return_value = mock_temp_game
+        """Test that recursion reaches depth 0 without building games"""
+        game = Game2048()
+        game.set_board([[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
 
+        with patch.object(Game2048, '__init__',
+                          side_effect=AssertionError("game created")):
             with patch('algorithms.expectiminimax.evaluate_board', return_value=50):
                 # Call with depth=2 to verify it reaches depth 0
-                result = expectiminimax(
-                    mock_game, depth=2, is_player_turn=True)
-
-        # The function should return a value
-        assert isinstance(result, (int, float))
+                result = expectiminimax(game, depth=2, is_player_turn=True)
+                direction = get_best_move_expectiminimax(game, depth=3)
+
+        assert result == pytest.approx(50)
+        assert direction in (UP, DOWN, LEFT, RIGHT)
+
+
+class TestTranspositionTableSearch:
+    """Test expectiminimax with a transposition table"""
+
+    def test_same_result_with_table(self):
+        """Test that caching does not change the value"""
+        board = [[2, 4, 8, 16], [32, 64, 2, 4], [0, 2, 0, 8], [0, 0, 4, 0]]
+        game = Game2048()
+        game.set_board(board)
+        context = SearchContext(table=TranspositionTable())
+
+        plain = expectiminimax(game, 3, False)
+        cached = expectiminimax(game, 3, False, context=context)
+
+        assert pytest.approx(cached) == plain
+        assert game.board == board
+        assert context.table.stats()['hits'] > 0
+
+    @pytest.mark.parametrize("settings", [{'min_probability': 0.05},
+                                          {'four_spawn_max_ply': 1}])
+    def test_warm_table_same_values(self, settings):
+        """Test that entries of other searches do not change the values"""
+        game = make_game()
+        plain = SearchContext(**settings)
+        plain.root_depth = 6
+        expected = score_root_moves(game, 6, plain, DIRECTIONS)
+
+        # The boards after the first spawns, searched as roots first: more
+        # likely and closer to the root than in the search of the game
+        context = SearchContext(table=TranspositionTable(), **settings)
+        context.root_depth = 4
+        for _, bits in legal_moves(game.get_bitboard()):
+            for cell in empty_cells(bits):
+                for exponent in (1, 2):
+                    search(spawn_tile(bits, cell, exponent), 4, True, context)
+        context.root_depth = 6
+        assert score_root_moves(game, 6, context, DIRECTIONS) == expected
+
+    def test_best_move_uses_table(self):
+        """Test that the entry point fills the table"""
+        game = Game2048()
+        game.set_board([[2, 4, 8, 16], [32, 64, 2, 4],
+                       [0, 2, 0, 8], [0, 0, 4, 0]])
+        context = SearchContext(table=TranspositionTable())
+
+        get_best_move_expectiminimax(game, depth=3, context=context)
+
+        assert context.table.stats()['stores'] > 0
+
+
+class TestIterativeDeepening:
+    """Test the time limited search"""
+
+    def test_returns_valid_move(self):
+        """Test that a time limited search returns a legal move"""
+        game = Game2048()
+        game.set_board([[2, 4, 8, 16], [16, 8, 4, 2],
+                       [2, 4, 8, 16], [0, 0, 0, 0]])
+        context = SearchContext()
+
+        result = get_best_move_expectiminimax(game, context=context,
+                                              time_limit_ms=20)
+
+        assert result == DOWN
+        assert context.completed_depth >= 1
+        assert context.deadline is None
+
+    def test_timeout_keeps_last_finished_depth(self):
+        """Test that an unfinished iteration is abandoned"""
+        game = Game2048()
+        game.set_board([[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 4], [0, 0, 0, 0]])
+        context = SearchContext()
+
+        with patch('algorithms.expectiminimax.time.perf_counter',
+                   side_effect=[0.0] + [10.0] * 1000):
+            result = get_best_move_expectiminimax(game, context=context,
+                                                  time_limit_ms=5)
+
+        assert context.completed_depth == 1
+        assert result in (UP, DOWN, LEFT, RIGHT)
+
+    def test_matches_fixed_depth(self):
+        """Test that a generous budget agrees with the fixed depth search"""
+        board = [[2, 4, 8, 16], [32, 64, 2, 4], [0, 2, 0, 8], [0, 0, 4, 0]]
+        game = Game2048()
+        game.set_board(board)
+        context = SearchContext()
+
+        with patch('algorithms.expectiminimax.MAX_ITERATIVE_DEPTH', 3):
+            timed = get_best_move_expectiminimax(game, context=context,
+                                                 time_limit_ms=60000)
+
+        assert context.completed_depth == 3
+        assert timed == get_best_move_expectiminimax(game, depth=3)
+
+
+class TestLargeTiles:
+    """Test boards with a tile above 32768, which does not fit a bitboard"""
+
+    def test_search_after_65536(self):
+        """Test that the search keeps playing after two 32768 tiles merge"""
+        game = Game2048()
+        game.set_board([[32768, 32768, 0, 0], [2, 4, 8, 16],
+                        [0, 0, 0, 0], [0, 0, 0, 0]])
+        assert game.make_move(LEFT)
+        assert game.board[0][0] == 65536
+
+        assert get_best_move_expectiminimax(game, depth=2) in (UP, DOWN, LEFT, RIGHT)
+        assert get_best_move_expectiminimax(game, time_limit_ms=20) in \
+            (UP, DOWN, LEFT, RIGHT)
+
+    def test_only_real_moves(self):
+        """Test that 65536 next to 32768 is not searched as a merge"""
+        game = Game2048()
+        game.set_board([[65536, 32768, 2, 4], [4, 2, 4, 2],
+                        [2, 4, 2, 8], [4, 2, 4, 8]])
+        assert game.legal_directions() == [UP, DOWN]
+
+        assert get_best_move_expectiminimax(game, depth=2) in (UP, DOWN)
+        assert get_best_move_expectiminimax(game, time_limit_ms=20) in (UP, DOWN)
+        assert depth_one_move(game) in (UP, DOWN)
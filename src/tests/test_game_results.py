@@ -0,0 +1,164 @@
+"""Tests for the online result aggregation and the result sinks"""
+
+import csv
+import json
+import statistics
+import pytest
+from game_results import (RunningStat, GameSummary, open_sink, CsvSink,
+                          CheckpointLog, read_checkpoint)
+
+
+def result(moves, score, max_tile=256, won=False, **extra):
+    """Game result like run_single_game returns"""
+    return {'moves': moves, 'score': score, 'max_tile': max_tile,
+            'won': won, **extra}
+
+
+class TestRunningStat:
+    """Test the running mean and variance"""
+
+    def test_matches_statistics(self):
+        """Test against the statistics module"""
+        values = [3, 1, 4, 1, 5, 9, 2, 6]
+        stat = RunningStat()
+        for value in values:
+            stat.add(value)
+        assert stat.mean == statistics.mean(values)
+        assert stat.variance == pytest.approx(statistics.variance(values))
+        assert (stat.minimum, stat.maximum) == (1, 9)
+
+    def test_merge(self):
+        """Test that merged halves equal one stat of all numbers"""
+        values = [2.5, 7, 1, 8, 2, 8, 1.5]
+        whole, first, second = RunningStat(), RunningStat(), RunningStat()
+        for index, value in enumerate(values):
+            whole.add(value)
+            (first if index < 3 else second).add(value)
+        first.merge(second)
+        assert first.count == whole.count
+        assert first.mean == pytest.approx(whole.mean)
+        assert first.variance == pytest.approx(whole.variance)
+        assert (first.minimum, first.maximum) == (whole.minimum, whole.maximum)
+
+    def test_empty(self):
+        """Test the values before any number"""
+        stat = RunningStat()
+        assert stat.mean == stat.variance == 0.0
+        assert stat.minimum is None
+
+
+class TestGameSummary:
+    """Test the aggregation of game results"""
+
+    def test_totals(self):
+        """Test wins, averages, tiles and depth"""
+        summary = GameSummary()
+        summary.add(result(100, 2048, 512, avg_depth=3.0))
+        summary.add(result(300, 4096, 2048, won=True, avg_depth=5.0))
+        assert summary.games == 2
+        assert summary.win_rate == 0.5
+        assert summary.moves.total == 400
+        assert summary.score.mean == 3072
+        assert summary.tile_counts == {512: 1, 2048: 1}
+        assert summary.avg_depth == 4.5
+
+    def test_search_stats_are_merged(self):
+        """Test that the node counters of every game are added"""
+        stats = {'nodes': 5, 'player_nodes': 1, 'chance_nodes': 1,
+                 'leaf_evaluations': 3, 'game_over_checks': 2,
+                 'cache_hits': 0, 'pruned_branches': 0,
+                 'depths': {2: [1, 0.1, 5]}}
+        summary = GameSummary()
+        summary.add(result(10, 64, search_stats=stats))
+        summary.add(result(10, 64, search_stats=stats))
+        assert summary.search_stats.nodes == 10
+        assert summary.search_stats.depths == {2: [2, 0.2, 10]}
+
+    def test_move_latencies_are_merged(self):
+        """Test that the latency histograms of every game are added"""
+        latency = {'by_empty': {'4': {'counts': {'80': 3}, 'count': 3,
+                                      'total': 0.003, 'maximum': 0.0011}},
+                   'by_depth': {}}
+        summary = GameSummary()
+        summary.add(result(10, 64))
+        assert summary.move_latency is None
+        summary.add(result(10, 64, move_latency=latency))
+        summary.add(result(10, 64, move_latency=latency))
+        assert summary.move_latency.overall().count == 6
+        assert summary.move_latency.by_empty[4].counts == {80: 6}
+
+
+class TestSinks:
+    """Test writing results as they arrive"""
+
+    def test_jsonl_is_flushed(self, tmp_path):
+        """Test that every line is readable before the sink is closed"""
+        path = str(tmp_path / "results.jsonl")
+        sink = open_sink(path)
+        sink.write(result(10, 64, seed=1))
+        with open(path, encoding="utf-8") as file:
+            assert json.loads(file.readline())['seed'] == 1
+        sink.close()
+
+    def test_csv(self, tmp_path):
+        """Test that a CSV sink keeps the flat fields only"""
+        path = str(tmp_path / "results.csv")
+        sink = open_sink(path)
+        assert isinstance(sink, CsvSink)
+        sink.write(result(10, 64, seed=1, search_stats={'nodes': 1}))
+        sink.write(result(20, 128, seed=2))
+        sink.close()
+        with open(path, encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))
+        assert [row['seed'] for row in rows] == ["1", "2"]
+        assert "search_stats" not in rows[0]
+
+    def test_append(self, tmp_path):
+        """Test that an appending sink keeps the rows and the one header"""
+        for name in ("results.csv", "results.jsonl"):
+            path = str(tmp_path / name)
+            sink = open_sink(path)
+            sink.write(result(10, 64, seed=1))
+            sink.close()
+            sink = open_sink(path, append=True)
+            sink.write(result(20, 128, seed=2))
+            sink.close()
+            with open(path, encoding="utf-8") as file:
+                if name.endswith(".csv"):
+                    seeds = [row['seed'] for row in csv.DictReader(file)]
+                else:
+                    seeds = [str(json.loads(line)['seed']) for line in file]
+            assert seeds == ["1", "2"]
+
+
+class TestCheckpointLog:
+    """Test the append-only log of a run"""
+
+    def test_reopen_appends(self, tmp_path):
+        """Test that the run is written once and results are appended"""
+        path = str(tmp_path / "run.log")
+        for seed in (1, 2):
+            log = CheckpointLog(path, {'seed': 5})
+            log.write(result(10, 64, seed=seed))
+            log.close()
+        run, results = read_checkpoint(path)
+        assert run == {'seed': 5}
+        assert [game['seed'] for game in results] == [1, 2]
+
+    def test_torn_line(self, tmp_path):
+        """Test that a line cut by a crash is ignored and then replaced"""
+        path = str(tmp_path / "run.log")
+        log = CheckpointLog(path, {'seed': 5})
+        log.write(result(10, 64, seed=1))
+        log.close()
+        with open(path, "a", encoding="utf-8") as file:
+            file.write('{"result": {"mov')
+        assert len(read_checkpoint(path)[1]) == 1
+        log = CheckpointLog(path, {'seed': 5})
+        log.write(result(10, 64, seed=2))
+        log.close()
+        assert [game['seed'] for game in read_checkpoint(path)[1]] == [1, 2]
+
+    def test_missing(self, tmp_path):
+        """Test reading a log that does not exist"""
+        assert read_checkpoint(str(tmp_path / "none.log")) == (None, [])
@@ -0,0 +1,87 @@
+"""Tests for the move latency histograms"""
+
+import json
+import random
+import pytest
+from latency import (BUCKETS_PER_DOUBLING, LatencyHistogram, MoveLatencies,
+                     bucket_bounds, bucket_index)
+from measure import run_single_game
+from spawns import SpawnStream
+
+# Relative width of a bucket
+WIDTH = 2 ** (1 / BUCKETS_PER_DOUBLING)
+
+
+def histogram_of(times):
+    """Histogram of a list of times"""
+    histogram = LatencyHistogram()
+    for seconds in times:
+        histogram.add(seconds)
+    return histogram
+
+
+class TestLatencyHistogram:
+    """Test the log buckets and the percentiles"""
+
+    def test_bucket_holds_the_time(self):
+        """Test that a time falls inside the bounds of its bucket"""
+        for seconds in (3e-6, 0.00042, 0.0157, 2.5):
+            low, high = bucket_bounds(bucket_index(seconds))
+            assert low <= seconds < high
+            assert high / low == pytest.approx(WIDTH)
+
+    def test_percentiles_within_a_bucket(self):
+        """Test against exact percentiles of random times"""
+        rng = random.Random(1)
+        times = sorted(rng.lognormvariate(-6, 1.5) for _ in range(5000))
+        histogram = histogram_of(times)
+        for percent in (50, 90, 99):
+            exact = times[int(percent / 100 * len(times)) - 1]
+            assert exact <= histogram.percentile(percent) <= exact * WIDTH ** 2
+        assert histogram.percentile(100) == histogram.maximum == times[-1]
+
+    def test_merge_and_json(self):
+        """Test that merged halves equal one histogram, also through JSON"""
+        times = [0.001 * (1 + index % 17) for index in range(100)]
+        whole = histogram_of(times)
+        merged = histogram_of(times[:30])
+        merged.merge(LatencyHistogram.from_dict(
+            json.loads(json.dumps(histogram_of(times[30:]).as_dict()))))
+        assert merged.counts == whole.counts
+        assert merged.count == 100 and merged.maximum == whole.maximum
+        assert merged.mean == pytest.approx(whole.mean)
+
+    def test_empty(self):
+        """Test the values before any time"""
+        assert LatencyHistogram().percentile(99) == 0.0
+
+
+class TestMoveLatencies:
+    """Test the breakdown by empty cells and depth"""
+
+    def test_breakdown(self):
+        """Test that every move is counted by empty cells and by depth"""
+        latencies = MoveLatencies()
+        latencies.add(0.001, 10, 2)
+        latencies.add(0.004, 3, 3)
+        latencies.add(0.002, 3)
+        assert latencies.overall().count == 3
+        assert sorted(latencies.by_empty) == [3, 10]
+        assert latencies.by_empty[3].count == 2
+        assert {depth: h.count for depth, h in latencies.by_depth.items()} == \
+            {2: 1, 3: 1}
+        restored = MoveLatencies.from_dict(json.loads(json.dumps(latencies.as_dict())))
+        restored.merge(latencies)
+        assert restored.overall().count == 6
+        dump = latencies.dump()
+        assert sum(count for _, _, count in dump['all']) == 3
+
+    def test_game_records_every_move(self):
+        """Test the latencies of a played game"""
+        result = run_single_game("depth_one", rng=SpawnStream(2),
+                                 collect_latency=True)
+        latencies = MoveLatencies.from_dict(result['move_latency'])
+        assert latencies.overall().count >= result['moves']
+        assert list(latencies.by_depth) == [1]
+        assert 'move_latency' not in run_single_game("depth_one",
+                                                     rng=SpawnStream(2))
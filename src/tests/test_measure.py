@@ -1,7 +1,24 @@
 """Tests for measure.py code"""
+import csv
+import json
+import time
+from concurrent.futures import Future
 from unittest.mock import Mock, patch
 import pytest  # pylint: disable=unused-import
-from measure import run_single_game, analyze_games
+from algorithms.depth_policy import empty_cells_depth
+from measure import (run_single_game, analyze_games, describe_search, parse_args,
+                     game_seed, game_seeds, iter_game_results,
+                     iter_seeded_results)
+from stopping import PrecisionRule, SprtRule
+
+DEPTH_ONE = {'algorithm': "depth_one", 'depth': 1, 'options': {}}
+
+
+def finish_time(seed, slow_seed):
+    """Game stand-in: the slow seed takes a second, returns when it ended"""
+    if seed == slow_seed:
+        time.sleep(1)
+    return seed, time.monotonic()
 
 
 class TestRunSingleGame:
@@ -21,12 +38,17 @@ class TestRunSingleGame:
 
         result = run_single_game("expectiminimax", depth=3)
 
+        assert result.pop('cpu_seconds') >= 0
         assert result == {
             'moves': 2,
             'score': 4096,
             'max_tile': 2048,
-            'won': True}
-        mock_get_move.assert_called_with(mock_game, 3)
+            'won': True,
+            'avg_depth': None}
+        args, kwargs = mock_get_move.call_args
+        assert args == (mock_game, 3)
+        assert kwargs['time_limit_ms'] is None
+        assert kwargs['context'].depth_policy is None
 
     @patch('measure.Game2048')
     @patch('measure.depth_one_move')
@@ -43,17 +65,33 @@ class TestRunSingleGame:
 
         result = run_single_game("depth_one")
 
+        assert result.pop('cpu_seconds') >= 0
         assert result == {
             'moves': 1,
             'score': 2048,
             'max_tile': 1024,
-            'won': False}
+            'won': False,
+            'avg_depth': 1.0}
         mock_depth_move.assert_called_with(mock_game)
 
     def test_invalid_algorithm(self):
         with pytest.raises(ValueError, match="Unknown algorithm: invalid"):
             run_single_game("invalid")
 
+    @patch('measure.Game2048')
+    @patch('measure.get_best_move_expectiminimax', return_value='up')
+    def test_weights_reach_the_evaluator(self, mock_get_move, mock_game_class):
+        mock_game = mock_game_class.return_value
+        mock_game.is_game_over.side_effect = [False, True]
+        mock_game.board = [[2, 0, 0, 0], [0] * 4, [0] * 4, [0] * 4]
+        run_single_game("expectiminimax", depth=1, weights=(1, 0, 0, 0, 0, 0))
+        evaluator = mock_get_move.call_args[1]['context'].evaluator
+        assert evaluator.weights == (1, 0, 0, 0, 0, 0)
+
+    def test_unknown_option(self):
+        with pytest.raises(TypeError, match="Unknown options: tabel"):
+            run_single_game("depth_one", tabel="shared")
+
     @patch('measure.Game2048')
     @patch('measure.get_best_move_expectiminimax')
     def test_invalid_moves_not_counted(self, mock_get_move, mock_game_class):
@@ -65,6 +103,7 @@ class TestRunSingleGame:
         mock_game.get_board_sum.return_value = 1024
         mock_game.board = [[512, 0, 0, 0], [
             0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+        mock_get_move.return_value = 'up'
 
         result = run_single_game("expectiminimax")
 
@@ -99,6 +138,44 @@ class TestAnalyzeGames:
         assert "Min score: 2048 | Max score: 8192" in output
         assert "Min moves: 100 | Max moves: 200" in output
 
+    @patch('measure.run_single_game')
+    @patch('builtins.print')
+    @patch('time.time')
+    def test_average_depth(self, mock_time, mock_print, mock_run_single):
+        mock_time.side_effect = [0, 10]
+        mock_run_single.side_effect = [
+            {'moves': 100, 'score': 2048, 'max_tile': 512, 'won': False,
+             'avg_depth': 3.0},
+            {'moves': 300, 'score': 4096, 'max_tile': 1024, 'won': False,
+             'avg_depth': 5.0}
+        ]
+
+        analyze_games(num_games=2, depth=3, depth_policy=empty_cells_depth)
+
+        output = '\n'.join(str(
+            call[0][0]) for call in mock_print.call_args_list if call[0] and len(call[0]) > 0)
+        assert "policy=empty_cells_depth" in output
+        assert "Average search depth: 4.50" in output
+
+    @patch('measure.Game2048')
+    def test_depth_policy_is_reported(self, mock_game_class):
+        mock_game = Mock()
+        mock_game_class.return_value = mock_game
+        mock_game.is_game_over.side_effect = [False, False, True]
+        mock_game.make_move.return_value = True
+        mock_game.is_won.return_value = False
+        mock_game.get_board_sum.return_value = 8
+        mock_game.board = [[4, 4, 0, 0], [0] * 4, [0] * 4, [0] * 4]
+
+        with patch('measure.get_best_move_expectiminimax') as mock_get_move:
+            def fake_search(game, depth, context, **kwargs):  # pylint: disable=unused-argument
+                context.completed_depth = context.depth_policy(0, depth)
+                return 'up'
+            mock_get_move.side_effect = fake_search
+            result = run_single_game(depth=3, depth_policy=empty_cells_depth)
+
+        assert result['avg_depth'] == 2.0
+
     @patch('measure.run_single_game')
     @patch('builtins.print')
     @patch('time.time')
@@ -118,5 +195,259 @@ class TestAnalyzeGames:
         assert "  512:   2 games ( 66.7%)" in output
 
 
+class TestSeededGames:
+    """Tests for seeded and multi-process game runs"""
+
+    def test_game_seeds_are_unique(self):
+        seeds = {game_seed(master, i) for master in range(3) for i in range(100)}
+        assert len(seeds) == 300
+
+    def test_results_do_not_depend_on_workers(self):
+        serial = list(iter_game_results(DEPTH_ONE, game_seeds(3, 5)))
+        parallel = list(iter_game_results(DEPTH_ONE, game_seeds(3, 5),
+                                          workers=2))
+
+        def by_seed(results):
+            results = [{key: value for key, value in result.items()
+                        if key != 'cpu_seconds'} for result in results]
+            return sorted(results, key=lambda result: result['seed'])
+        assert by_seed(serial) == by_seed(parallel)
+        assert [r['seed'] for r in by_seed(serial)] == \
+            [game_seed(5, i) for i in range(3)]
+
+    def test_ordered_results(self):
+        results = iter_game_results(DEPTH_ONE, game_seeds(6, 2), workers=2,
+                                    ordered=True)
+        assert [result['seed'] for result in results] == \
+            [game_seed(2, i) for i in range(6)]
+
+    def test_slow_game_does_not_stall_the_workers(self):
+        results = list(iter_seeded_results(finish_time, (0,), range(20),
+                                           workers=2, ordered=True))
+        assert [seed for seed, _ in results] == list(range(20))
+        slow_end = results[0][1]
+        # Far more games than the queue holds finish during the slow one
+        assert sum(end < slow_end for _, end in results[1:]) > 10
+
+    @patch('measure.run_single_game')
+    @patch('builtins.print')
+    def test_progress_counts_finished_games(self, mock_print, mock_run_single):
+        mock_run_single.return_value = {
+            'moves': 10, 'score': 64, 'max_tile': 16, 'won': False}
+
+        analyze_games(num_games=20, algorithm="depth_one", seed=1)
+
+        output = '\n'.join(str(
+            call[0][0]) for call in mock_print.call_args_list if call[0] and len(call[0]) > 0)
+        assert "Seed: 1" in output
+        assert "Progress: 10/20 games completed..." in output
+        assert "Progress: 20/20 games completed..." in output
+
+    @patch('measure.run_single_game')
+    @patch('builtins.print')
+    def test_interrupt_prints_partial_summary(self, mock_print, mock_run_single):
+        result = {'moves': 10, 'score': 64, 'max_tile': 16, 'won': False}
+        mock_run_single.side_effect = [result, result, KeyboardInterrupt]
+
+        summary = analyze_games(num_games=5, algorithm="depth_one", seed=1)
+
+        output = '\n'.join(str(
+            call[0][0]) for call in mock_print.call_args_list if call[0] and len(call[0]) > 0)
+        assert summary.games == 2
+        assert "Interrupted after 2/5 games" in output
+        assert "Games played: 2" in output
+
+    @patch('measure.run_single_game')
+    @patch('builtins.print')
+    def test_stop_rule_ends_the_run(self, mock_print, mock_run_single):
+        mock_run_single.return_value = {
+            'moves': 10, 'score': 64, 'max_tile': 16, 'won': False,
+            'cpu_seconds': 0.5}
+
+        summary = analyze_games(num_games=100, algorithm="depth_one", seed=1,
+                                stop_rule=PrecisionRule("score", 1, 20))
+
+        output = '\n'.join(str(
+            call[0][0]) for call in mock_print.call_args_list if call[0] and len(call[0]) > 0)
+        assert summary.games == mock_run_single.call_count == 20
+        assert "Stopped after 20/100 games" in output
+        assert "Saved 80 games, about 40 CPU-seconds" in output
+
+    @patch('builtins.print')
+    def test_resume_skips_recorded_games(self, _, tmp_path):
+        path = str(tmp_path / "run.log")
+        with patch('measure.run_single_game', side_effect=[
+                {'moves': 10, 'score': 64, 'max_tile': 16, 'won': False},
+                KeyboardInterrupt]):
+            analyze_games(num_games=3, algorithm="depth_one", seed=4,
+                          checkpoint=path)
+        with patch('measure.play_seeded_game',
+                   side_effect=lambda seed, *_: {
+                       'moves': 20, 'score': 128, 'max_tile': 32,
+                       'won': False, 'seed': seed}) as mock_play:
+            summary = analyze_games(num_games=3, algorithm="depth_one",
+                                    checkpoint=path, resume=True)
+        assert [call[0][0] for call in mock_play.call_args_list] == \
+            [game_seed(4, 1), game_seed(4, 2)]
+        assert summary.games == 3
+        assert summary.score.total == 64 + 2 * 128
+
+    @patch('builtins.print')
+    def test_resume_appends_to_the_output(self, _, tmp_path):
+        path = str(tmp_path / "run.log")
+        output = str(tmp_path / "results.csv")
+        with patch('measure.run_single_game', side_effect=[
+                {'moves': 10, 'score': 64, 'max_tile': 16, 'won': False},
+                KeyboardInterrupt]):
+            analyze_games(num_games=3, algorithm="depth_one", seed=4,
+                          checkpoint=path, output=output)
+        with patch('measure.play_seeded_game',
+                   side_effect=lambda seed, *_: {
+                       'moves': 20, 'score': 128, 'max_tile': 32,
+                       'won': False, 'seed': seed}):
+            analyze_games(num_games=3, algorithm="depth_one",
+                          checkpoint=path, output=output, resume=True)
+        with open(output, encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))
+        assert [row['score'] for row in rows] == ["64", "128", "128"]
+        assert [row['seed'] for row in rows[1:]] == \
+            [str(game_seed(4, 1)), str(game_seed(4, 2))]
+
+    @patch('measure.run_single_game')
+    @patch('builtins.print')
+    def test_checkpoint_of_another_run(self, _, mock_run_single, tmp_path):
+        mock_run_single.return_value = {
+            'moves': 10, 'score': 64, 'max_tile': 16, 'won': False}
+        path = str(tmp_path / "run.log")
+        analyze_games(num_games=1, algorithm="depth_one", seed=4,
+                      checkpoint=path)
+        with pytest.raises(ValueError, match="--resume"):
+            analyze_games(num_games=1, algorithm="depth_one", checkpoint=path)
+        with pytest.raises(ValueError, match="seed"):
+            analyze_games(num_games=1, algorithm="depth_one", seed=5,
+                          checkpoint=path, resume=True)
+
+    @patch('measure.run_single_game')
+    @patch('builtins.print')
+    def test_checkpoint_of_other_settings(self, _, mock_run_single, tmp_path):
+        mock_run_single.return_value = {
+            'moves': 10, 'score': 64, 'max_tile': 16, 'won': False}
+        path = str(tmp_path / "run.log")
+        analyze_games(num_games=1, depth=3, seed=4, checkpoint=path,
+                      depth_policy=empty_cells_depth, table="local")
+        for other, differs in (({'depth_policy': None}, "depth_policy"),
+                               ({'table_entries': 64}, "table_entries"),
+                               ({'min_probability': 0.01}, "min_probability")):
+            settings = dict({'depth_policy': empty_cells_depth,
+                             'table': "local"}, **other)
+            with pytest.raises(ValueError, match=differs):
+                analyze_games(num_games=1, depth=3, checkpoint=path,
+                              resume=True, **settings)
+        summary = analyze_games(num_games=1, depth=3, checkpoint=path,
+                                resume=True, depth_policy=empty_cells_depth,
+                                table="local")
+        assert summary.games == 1
+
+    @patch('builtins.print')
+    def test_latency_dump(self, mock_print, tmp_path):
+        path = tmp_path / "latency.json"
+        analyze_games(num_games=2, algorithm="depth_one", seed=1,
+                      latency_dump=str(path))
+        dump = json.loads(path.read_text(encoding="utf-8"))
+        assert sum(count for _, _, count in dump['all']) >= 2
+        output = '\n'.join(str(call[0][0]) for call in mock_print.call_args_list
+                           if call[0])
+        assert "Move latency (ms):" in output
+
+    def test_queued_games_are_bounded(self):
+        """Only two games per worker wait in the pool at any time"""
+        queued = []
+
+        class Pool:
+            """Plays a submitted game at once and counts the queue"""
+
+            def __init__(self, **_):
+                self._processes = {}
+
+            def submit(self, function, *args):
+                future = Future()
+                future.set_result(function(*args))
+                queued.append(len(queued) - yielded[0] + 1)
+                return future
+
+            def shutdown(self, **_):
+                pass
+
+        yielded = [0]
+        with patch('measure.ProcessPoolExecutor', Pool), \
+                patch('measure.play_seeded_game', lambda seed, *_: seed):
+            for _ in iter_game_results(DEPTH_ONE, game_seeds(50), workers=3):
+                yielded[0] += 1
+        assert yielded[0] == 50
+        assert max(queued) <= 6
+
+
+class TestCommandLine:
+    """Tests for argument parsing"""
+
+    def test_positional_arguments(self):
+        args = parse_args(["50", "depth_one", "4"])
+        assert (args.games, args.algorithm, args.depth) == (50, "depth_one", 4)
+        assert args.time_per_move is None
+
+    def test_time_per_move(self):
+        args = parse_args(["10", "--time-per-move", "25",
+                           "--depth-policy", "empty"])
+        assert args.depth_policy is empty_cells_depth
+        assert args.time_per_move == 25
+        assert describe_search("expectiminimax", 3, 25) == \
+            " (time per move=25 ms)"
+        assert describe_search("expectiminimax", 3) == " (depth=3)"
+        assert describe_search("depth_one", 3) == ""
+
+    def test_root_workers_needs_fixed_depth(self):
+        assert parse_args(["10", "--root-workers", "4"]).root_workers == 4
+        with pytest.raises(SystemExit):
+            with patch('sys.stderr'):
+                parse_args(["10", "--root-workers", "4",
+                            "--time-per-move", "20"])
+
+    def test_engine(self):
+        args = parse_args(["10", "expectiminimax", "2", "--engine", "batched"])
+        assert args.engine == "batched"
+        assert describe_search("expectiminimax", 2, engine="batched") == \
+            " (depth=2, engine=batched)"
+        with pytest.raises(SystemExit):
+            with patch('sys.stderr'):
+                parse_args(["10", "--engine", "batched", "--root-workers", "2"])
+
+    def test_latency_flags(self):
+        assert not parse_args(["10"]).latency
+        args = parse_args(["10", "--latency-dump", "latency.json"])
+        assert args.latency_dump == "latency.json"
+
+    def test_resume_needs_checkpoint(self):
+        args = parse_args(["10", "--checkpoint", "run.log", "--resume"])
+        assert (args.checkpoint, args.resume) == ("run.log", True)
+        with pytest.raises(SystemExit):
+            with patch('sys.stderr'):
+                parse_args(["10", "--resume"])
+
+    def test_stop_rules(self):
+        assert parse_args(["10"]).stop_rule is None
+        rule = parse_args(["10", "--metric", "score", "--precision", "100"]).stop_rule
+        assert isinstance(rule, PrecisionRule)
+        assert (rule.metric, rule.half_width) == ("score", 100)
+        rule = parse_args(["10", "--baseline", "0.5", "--delta", "0.1",
+                           "--min-games", "5"]).stop_rule
+        assert isinstance(rule, SprtRule)
+        assert (rule.baseline, rule.delta, rule.min_games) == (0.5, 0.1, 5)
+        for argv in (["--baseline", "0.5"], ["--baseline", "1.5", "--delta", "0.1"],
+                     ["--precision", "0.1", "--baseline", "0.5", "--delta", "0.1"]):
+            with pytest.raises(SystemExit):
+                with patch('sys.stderr'):
+                    parse_args(["10"] + argv)
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,61 @@
+"""Tests for the root parallel search"""
+
+import pytest
+from algorithms.expectiminimax import (get_best_move_expectiminimax, score_root_moves,
+                                       UP, DOWN, LEFT, RIGHT)
+from algorithms.parallel import (get_best_move_parallel, score_root_moves_parallel,
+                                 get_pool, shutdown_pool, SPLIT_MOVES, SPLIT_SPAWNS)
+from algorithms.search_context import SearchContext
+from algorithms.transposition import TranspositionTable
+from evaluation_tables import evaluate_with_tables
+from tests.helpers import BOARD, make_game
+
+BOARDS = [
+    BOARD,
+    [[0, 0, 0, 2], [0, 0, 4, 0], [0, 8, 0, 0], [2, 0, 0, 0]],
+    [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 0]],
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def pool():
+    """Share one pool between the tests and stop it afterwards"""
+    yield get_pool(2)
+    shutdown_pool()
+
+
+class TestParallelRoot:
+    """Test that the parallel root matches the serial search"""
+
+    @pytest.mark.parametrize("split", [SPLIT_MOVES, SPLIT_SPAWNS])
+    def test_same_move_as_serial(self, split):
+        """Test the chosen move on a few boards"""
+        for board in BOARDS:
+            serial = get_best_move_expectiminimax(make_game(board), depth=3)
+            parallel = get_best_move_parallel(make_game(board), depth=3,
+                                              workers=2, split=split)
+            assert parallel == serial
+
+    @pytest.mark.parametrize("split", [SPLIT_MOVES, SPLIT_SPAWNS])
+    def test_values_are_identical(self, split):
+        """Test that the root values match the serial search bit for bit"""
+        for board in BOARDS:
+            context = SearchContext(evaluator=evaluate_with_tables,
+                                    table=TranspositionTable(max_entries=1024))
+            parallel = score_root_moves_parallel(make_game(board), 3, 2,
+                                                 context, split)
+
+            serial_context = SearchContext(evaluator=evaluate_with_tables)
+            serial_context.root_depth = 3
+            serial = score_root_moves(make_game(board), 3, serial_context,
+                                      [UP, DOWN, LEFT, RIGHT])
+            assert parallel == serial
+
+    def test_pool_is_reused(self):
+        """Test that the pool survives between moves"""
+        assert get_pool(2) is get_pool(2)
+
+    def test_no_valid_moves(self):
+        """Test the fallback when nothing moves"""
+        board = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+        assert get_best_move_parallel(make_game(board), workers=2) == "up"
@@ -1,6 +1,6 @@
 """Tests for play_game.py"""
 
-from unittest.mock import Mock, patch
+from unittest.mock import ANY, Mock, patch
 import sys  # pylint: disable=unused-import
 from io import StringIO
 import pytest
@@ -24,7 +24,8 @@ class TestPlayGameAI:
                     play_game_ai(algorithm="expectiminimax", depth=3)
 
                 assert mock_algo.call_count == 2
-                mock_algo.assert_called_with(mock_game, 3)
+                mock_algo.assert_called_with(mock_game, 3, context=ANY,
+                                             time_limit_ms=None, engine=None)
 
     def test_depth_one_algorithm(self):
         """Test game plays with depth_one algorithm"""
@@ -0,0 +1,139 @@
+"""Tests for the persistent position cache"""
+
+import os
+from unittest.mock import patch
+import pytest
+from algorithms.expectiminimax import get_best_move_expectiminimax
+from algorithms.position_cache import PositionCache, settings_hash, MAGIC
+from algorithms.search_context import SearchContext
+from bitboard import to_bitboard, UP, DOWN, LEFT, RIGHT
+from evaluation_tables import evaluate_with_tables
+from measure import run_single_game
+from symmetry import flip_horizontal
+from tests.helpers import BOARD, make_game
+
+SETTINGS = settings_hash(SearchContext())
+
+
+@pytest.fixture(name="path")
+def cache_path(tmp_path):
+    """Path of a cache file in a temporary directory"""
+    return str(tmp_path / "positions.cache")
+
+
+class TestPositionCache:
+    """Test storing and finding positions"""
+
+    def test_round_trip(self, path):
+        """Test that a stored position is found again after reopening"""
+        bits = to_bitboard(BOARD)
+        cache = PositionCache(path, SETTINGS)
+        cache.store(bits, 3, 0.5, LEFT)
+        assert cache.lookup(bits, 3) == (0.5, LEFT)
+        assert cache.lookup(bits, 2) is None
+        cache.close()
+
+        cache = PositionCache(path, SETTINGS)
+        assert cache.lookup(bits, 3) == (0.5, LEFT)
+        assert len(cache) == 1
+        cache.close()
+
+    def test_mirrored_board(self, path):
+        """Test that the move is mapped to the orientation of the board"""
+        bits = to_bitboard(BOARD)
+        cache = PositionCache(path, SETTINGS)
+        cache.store(bits, 3, 0.5, LEFT)
+        assert cache.lookup(flip_horizontal(bits), 3) == (0.5, RIGHT)
+        cache.store(flip_horizontal(bits), 3, 0.25, UP)
+        assert cache.lookup(bits, 3) == (0.25, UP)
+        assert len(cache) == 1
+        cache.close()
+
+    def test_readers_see_the_writer(self, path):
+        """Test that read only caches share the file with the writer"""
+        assert PositionCache(path, SETTINGS, readonly=True).lookup(0x21, 2) is None
+        writer = PositionCache(path, SETTINGS)
+        reader = PositionCache(path, SETTINGS, readonly=True)
+        writer.store(0x21, 2, 0.5, DOWN)
+        assert reader.lookup(0x21, 2) == (0.5, DOWN)
+        with pytest.raises(ValueError):
+            reader.store(0x21, 2, 0.5, DOWN)
+        reader.close()
+        writer.close()
+
+    def test_settings_change_invalidates(self, path):
+        """Test that a file written with other settings is not used"""
+        cache = PositionCache(path, SETTINGS)
+        cache.store(0x21, 2, 0.5, DOWN)
+        cache.close()
+
+        other = settings_hash(SearchContext(evaluator=evaluate_with_tables))
+        assert other != SETTINGS
+        assert PositionCache(path, other, readonly=True).lookup(0x21, 2) is None
+        cache = PositionCache(path, other)
+        assert len(cache) == 0
+        cache.close()
+        with open(path, "rb") as file:
+            assert file.read(len(MAGIC)) == MAGIC
+
+    def test_one_writer(self, path):
+        """Test that a second writer gets a read only cache"""
+        writer = PositionCache(path, SETTINGS)
+        second = PositionCache(path, SETTINGS)
+        assert second.readonly and not writer.readonly
+        second.close()
+        writer.close()
+        cache = PositionCache(path, SETTINGS)
+        assert not cache.readonly
+        cache.close()
+
+    def test_reader_keeps_the_replaced_file(self, path):
+        """Test that clearing a stale file does not shrink it under a reader"""
+        cache = PositionCache(path, SETTINGS)
+        cache.store(0x21, 2, 0.5, DOWN)
+        cache.close()
+        reader = PositionCache(path, SETTINGS, readonly=True)
+
+        other = settings_hash(SearchContext(evaluator=evaluate_with_tables))
+        PositionCache(path, other, max_bytes=4096).close()
+        assert os.path.getsize(path) <= 4096
+        assert reader.lookup(0x21, 2) == (0.5, DOWN)
+        reader.close()
+
+    def test_size_cap(self, path):
+        """Test that the file never grows past the cap"""
+        cache = PositionCache(path, SETTINGS, max_bytes=4096)
+        for bits in range(1, 2000):
+            cache.store(bits << 4, 2, 0.5, UP)
+        cache.close()
+        assert os.path.getsize(path) <= 4096
+
+
+class TestWarmStart:
+    """Test the search and measure with a position cache"""
+
+    def test_second_search_is_cached(self, path):
+        """Test that a cached root is not searched again"""
+        game = make_game()
+        context = SearchContext()
+        context.position_cache = PositionCache(path, settings_hash(context))
+        first = get_best_move_expectiminimax(game, depth=2, context=context)
+
+        with patch('algorithms.expectiminimax.score_root_moves') as mock_search:
+            second = get_best_move_expectiminimax(game, depth=2, context=context,
+                                                  engine=mock_search)
+        assert not mock_search.called
+        assert second == first
+        assert context.completed_depth == 2
+        context.position_cache.close()
+
+    def test_measure_warm_start(self, path):
+        """Test that a replayed game is answered from the cache"""
+        with patch('random.random', return_value=0.5):
+            with patch('random.choice', side_effect=lambda cells: cells[0]):
+                cold = run_single_game(depth=1, position_cache=path)
+                warm = run_single_game(depth=1, position_cache=path,
+                                       cache_readonly=True)
+        assert cold['moves'] == warm['moves']
+        assert warm['cache_hits'] == warm['moves']
+        assert cold['cache_hits'] < cold['moves']
@@ -0,0 +1,125 @@
+"""Tests for the search instrumentation"""
+
+from unittest.mock import patch
+import pytest
+from algorithms.batched import score_root_moves_batched
+from algorithms.expectiminimax import (get_best_move_expectiminimax,
+                                       score_root_moves, DIRECTIONS)
+from algorithms.parallel import (score_root_moves_parallel, shutdown_pool,
+                                 SPLIT_MOVES, SPLIT_SPAWNS)
+from algorithms.search_context import SearchContext
+from algorithms.search_stats import SearchStats, effective_branching_factor
+from algorithms.transposition import TranspositionTable
+from measure import analyze_games, run_single_game
+from tests.helpers import make_game
+
+
+def root_stats(engine, depth, **settings):
+    """Counters of one root search with the given engine"""
+    context = SearchContext(stats=SearchStats(), **settings)
+    context.root_depth = depth
+    engine(make_game(), depth, context, DIRECTIONS)
+    return context.stats.as_dict()
+
+
+class TestSearchStats:
+    """Test the node counters"""
+
+    def test_depth_one(self):
+        """Test that a depth 1 search only evaluates the afterstates"""
+        stats = root_stats(score_root_moves, 1)
+        moves = len(score_root_moves(make_game(), 1, SearchContext(),
+                                     DIRECTIONS))
+        assert stats['nodes'] == stats['leaf_evaluations'] == moves
+        assert stats['player_nodes'] == stats['chance_nodes'] == 0
+
+    def test_node_types_add_up(self):
+        """Test that every node is a leaf, an inner node or a cache hit"""
+        context = SearchContext(stats=SearchStats(),
+                                table=TranspositionTable(max_entries=1024))
+        context.root_depth = 4
+        score_root_moves(make_game(), 4, context, DIRECTIONS)
+        stats = context.stats
+        assert stats.cache_hits > 0
+        # Chance nodes without an empty cell are evaluated as well
+        assert stats.nodes <= (stats.player_nodes + stats.chance_nodes +
+                               stats.leaf_evaluations + stats.cache_hits)
+
+    def test_pruned_branches(self):
+        """Test that cut off paths and skipped 4-spawns are counted"""
+        assert root_stats(score_root_moves, 3)['pruned_branches'] == 0
+        assert root_stats(score_root_moves, 3,
+                          min_probability=0.05)['pruned_branches'] > 0
+        assert root_stats(score_root_moves, 3,
+                          four_spawn_max_ply=0)['pruned_branches'] > 0
+
+    @pytest.mark.parametrize("settings", [{}, {'four_spawn_max_ply': 1},
+                                          {'min_probability': 0.05}])
+    def test_batched_engine_counts_the_same(self, settings):
+        """Test that the batched engine counts nodes like the recursive one"""
+        assert (root_stats(score_root_moves_batched, 3, **settings) ==
+                root_stats(score_root_moves, 3, **settings))
+
+    @pytest.mark.parametrize("split", [SPLIT_MOVES, SPLIT_SPAWNS])
+    def test_parallel_search_counts_the_same(self, split):
+        """Test that the stats of the worker processes are collected"""
+        context = SearchContext(stats=SearchStats())
+        try:
+            score_root_moves_parallel(make_game(), 3, 2, context, split)
+        finally:
+            shutdown_pool()
+        assert context.stats.as_dict() == root_stats(score_root_moves, 3)
+
+    def test_depth_times(self):
+        """Test that iterative deepening records every finished depth"""
+        context = SearchContext(stats=SearchStats())
+        get_best_move_expectiminimax(make_game(), context=context,
+                                     time_limit_ms=50)
+        depths = context.stats.depths
+        assert sorted(depths)[:context.completed_depth] == list(
+            range(1, context.completed_depth + 1))
+        assert sum(entry[2] for entry in depths.values()) <= context.stats.nodes
+
+    def test_merge_and_dict(self):
+        """Test that merged stats survive the dict round trip"""
+        first = SearchStats()
+        first.nodes = 3
+        first.record_depth(2, 0.5, 3)
+        second = SearchStats.from_dict(first.as_dict())
+        second.merge(first)
+        assert second.nodes == 6
+        assert second.depths == {2: [2, 1.0, 6]}
+        assert second.summary()[0]['nodes_per_second'] == 6
+
+
+class TestBranchingFactor:
+    """Test the effective branching factor"""
+
+    def test_full_tree(self):
+        """Test a tree of 2 + 4 + 8 nodes"""
+        assert effective_branching_factor(14, 3) == pytest.approx(2)
+
+    def test_empty_search(self):
+        """Test that no nodes give 0"""
+        assert effective_branching_factor(0, 3) == 0.0
+
+
+class TestMeasureStats:
+    """Test the stats in game analysis"""
+
+    def test_game_result(self):
+        """Test that a game reports its counters when asked to"""
+        assert 'search_stats' not in run_single_game(depth=1)
+        stats = run_single_game(depth=1, collect_stats=True)['search_stats']
+        assert stats['nodes'] > 0
+        assert list(stats['depths']) == [1]
+
+    @patch('builtins.print')
+    def test_summary(self, mock_print):
+        """Test that analyze_games prints the combined counters"""
+        analyze_games(num_games=2, depth=1, seed=0, stats=True)
+        output = '\n'.join(str(call[0][0]) for call in mock_print.call_args_list
+                           if call[0])
+        assert "Search nodes:" in output
+        assert "leaf evaluations" in output
+        assert "branching" in output
@@ -0,0 +1,97 @@
+"""Tests for the shared memory transposition table"""
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from algorithms.expectiminimax import score_root_moves, DIRECTIONS
+from algorithms.parallel import _get_worker_context, _settings
+from algorithms.search_context import SearchContext
+from algorithms.shared_table import SharedTranspositionTable, _SLOT, _attached
+from algorithms.transposition import TranspositionTable
+from measure import run_single_game
+from tests.helpers import make_game
+
+
+@pytest.fixture(name="table")
+def shared_table():
+    """A small shared table that is freed afterwards"""
+    table = SharedTranspositionTable(max_entries=64)
+    yield table
+    table.close()
+
+
+def store_in_child(table, bits, value):
+    """Worker: store a value through an unpickled table"""
+    table.store(bits, 2, True, value)
+    return table.lookup(bits, 2, True)
+
+
+class TestSharedTable:
+    """Test the lockless shared table"""
+
+    def test_lookup_after_store(self, table):
+        """Test that a stored value is found with the same key"""
+        table.store(0x1234, 3, True, 0.5)
+        assert table.lookup(0x1234, 3, True) == 0.5
+        assert table.lookup(0x1234, 2, True) is None
+        assert table.lookup(0x1234, 3, False) is None
+        assert len(table) == 1
+
+    def test_pickled_table_shares_memory(self, table):
+        """Test that a copy in this process sees the same entries"""
+        copy = pickle.loads(pickle.dumps(table))
+        copy.store(0x99, 2, False, 0.25)
+        assert table.lookup(0x99, 2, False) == 0.25
+        assert not copy.owner
+
+    def test_other_process_stores(self, table):
+        """Test that a store in a worker process is seen here"""
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            assert pool.submit(store_in_child, table, 0x4321, 0.75).result() == 0.75
+        assert table.lookup(0x4321, 2, True) == 0.75
+
+    def test_worker_detaches_old_table(self, table):
+        """Test that a root worker unmaps a table it no longer uses"""
+        other = SharedTranspositionTable(max_entries=64)
+        try:
+            for current in (table, other):
+                _get_worker_context(_settings(SearchContext(table=current)), 2)
+            assert table.name not in _attached
+            assert other.name in _attached
+            _get_worker_context(_settings(SearchContext()), 2)
+            assert other.name not in _attached
+        finally:
+            other.close()
+
+    def test_torn_slot_is_a_miss(self, table):
+        """Test that a slot mixing two writes fails the verification key"""
+        table.store(0x1234, 3, True, 0.5)
+        offset = next(offset for offset in range(0, 64 * _SLOT.size, _SLOT.size)
+                      if table._read(offset) is not None)  # pylint: disable=protected-access
+        check, _, meta = _SLOT.unpack_from(table._memory.buf, offset)  # pylint: disable=protected-access
+        # Value of another write next to the check of the first one
+        _SLOT.pack_into(table._memory.buf, offset, check, 0.9, meta)  # pylint: disable=protected-access
+        assert table.lookup(0x1234, 3, True) is None
+
+    def test_deeper_results_are_preferred(self, table):
+        """Test that a shallow store goes to the always replace slot"""
+        table.store(0x1234, 5, True, 0.5)
+        table.store(0x1234, 1, True, 0.25)
+        assert table.lookup(0x1234, 5, True) == 0.5
+        assert table.lookup(0x1234, 1, True) == 0.25
+
+    def test_search_values(self, table):
+        """Test that the search gives the same values as a local table"""
+        game = make_game()
+        scores = []
+        for search_table in (TranspositionTable(max_entries=64), table):
+            context = SearchContext(table=search_table)
+            context.root_depth = 3
+            scores.append(score_root_moves(game, 3, context, DIRECTIONS))
+        assert scores[0] == scores[1]
+
+    def test_measure_counts_table_hits(self, table):
+        """Test that run_single_game reports the table usage"""
+        result = run_single_game(depth=2, shared_table=table)
+        assert result['table_lookups'] > 0
+        assert 0 <= result['table_hits'] <= result['table_lookups']
@@ -0,0 +1,80 @@
+"""Tests for reproducible tile spawns"""
+
+import random
+import pytest
+from bitboard import add_random_tile, to_bitboard
+from game import Game2048
+from measure import run_single_game, play_seeded_game
+from spawns import SpawnStream
+
+
+def play(game, moves):
+    """Make the moves and return the boards after them"""
+    boards = []
+    for direction in moves:
+        game.make_move(direction)
+        boards.append(game.get_board_copy())
+    return boards
+
+
+class TestSpawnStream:
+    """Test the spawn stream"""
+
+    def test_same_seed_same_game(self):
+        """Test that a seed fixes the whole game"""
+        moves = ["left", "up", "right", "down"] * 5
+        assert (play(Game2048(rng=SpawnStream(7)), moves) ==
+                play(Game2048(rng=SpawnStream(7)), moves))
+        assert (play(Game2048(rng=SpawnStream(7)), moves) !=
+                play(Game2048(rng=SpawnStream(8)), moves))
+
+    def test_two_draws_per_spawn(self):
+        """Test that the k-th spawn uses the same numbers in any game"""
+        streams = [SpawnStream(3), SpawnStream(3)]
+        crowded, empty = [Game2048(rng=stream) for stream in streams]
+        crowded.set_board([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 0, 0]])
+        empty.set_board([[0] * 4 for _ in range(4)])
+        crowded.add_random_tile()
+        empty.add_random_tile()
+        draws = SpawnStream.pregenerate(3, 4)
+        assert [stream.random() for stream in streams] == [draws[6]] * 2
+
+    def test_pregenerated_draws(self):
+        """Test that stored numbers replay the seeded stream"""
+        seeded = Game2048(rng=SpawnStream(5))
+        replayed = Game2048(rng=SpawnStream(draws=SpawnStream.pregenerate(5, 2)))
+        assert seeded.board == replayed.board
+        with pytest.raises(ValueError):
+            replayed.add_random_tile()
+
+    def test_bitboard_spawns_match_the_game(self):
+        """Test that bitboard.add_random_tile draws like Game2048"""
+        game = Game2048(rng=SpawnStream(draws=[0.99, 0.5] * 2 + [0.3, 0.95]))
+        bits = add_random_tile(game.get_bitboard(),
+                               SpawnStream(draws=[0.3, 0.95]))
+        game.add_random_tile()
+        assert bits == to_bitboard(game.board)
+
+    def test_random_instance(self):
+        """Test that a random.Random can be used as well"""
+        assert (Game2048(rng=random.Random(1)).board ==
+                Game2048(rng=random.Random(1)).board)
+
+
+class TestSeededGames:
+    """Test the seeded games of measure.py"""
+
+    def test_global_random_is_untouched(self):
+        """Test that a seeded game leaves the random module alone"""
+        random.seed(11)
+        expected = random.random()
+        random.seed(11)
+        play_seeded_game(1, "depth_one", 1, {})
+        assert random.random() == expected
+
+    def test_same_stream_same_result(self):
+        """Test that a stream replays the same game"""
+        first = run_single_game("depth_one", rng=SpawnStream(4))
+        second = run_single_game("depth_one", rng=SpawnStream(4))
+        del first['cpu_seconds'], second['cpu_seconds']
+        assert first == second
@@ -0,0 +1,97 @@
+"""Tests for the early stopping rules"""
+
+import random
+import pytest
+from game_results import GameSummary
+from stopping import (PrecisionRule, SprtRule, confidence_interval,
+                      metric_value)
+
+
+def summary_of(wins, games, score=1000):
+    """Summary of games of which the first wins are won"""
+    summary = GameSummary()
+    for index in range(games):
+        summary.add({'moves': 100, 'score': score + index % 7,
+                     'max_tile': 512, 'won': index < wins})
+    return summary
+
+
+def games_until_stop(rule, win_rate, limit=5000, seed=0):
+    """Feed random games to a rule, returns (games, reason)"""
+    rng = random.Random(seed)
+    summary = GameSummary()
+    while summary.games < limit:
+        summary.add({'moves': 100, 'score': 1000, 'max_tile': 512,
+                     'won': rng.random() < win_rate})
+        reason = rule.check(summary)
+        if reason is not None:
+            return summary.games, reason
+    return summary.games, None
+
+
+class TestConfidenceInterval:
+    """Test the intervals the rules use"""
+
+    def test_wilson_interval(self):
+        """Test a known Wilson interval and the edge of zero wins"""
+        low, high = confidence_interval(summary_of(50, 100), "win_rate")
+        assert (low, high) == (pytest.approx(0.4038, abs=1e-4),
+                               pytest.approx(0.5962, abs=1e-4))
+        low, high = confidence_interval(summary_of(0, 20), "win_rate")
+        assert low == pytest.approx(0.0) and 0 < high < 0.2
+
+    def test_mean_interval(self):
+        """Test that the interval of a mean is centered on it"""
+        summary = summary_of(0, 40)
+        low, high = confidence_interval(summary, "score")
+        assert (low + high) / 2 == pytest.approx(metric_value(summary, "score"))
+        assert high - low < 2
+
+
+class TestPrecisionRule:
+    """Test stopping on a narrow enough interval"""
+
+    def test_waits_for_min_games(self):
+        """Test that a constant metric still needs min_games games"""
+        rule = PrecisionRule("score", 1, min_games=30)
+        assert rule.check(summary_of(0, 29, score=5)) is None
+
+    def test_stops_when_precise(self):
+        """Test that +-5 points of win rate needs about 380 games at 50 %"""
+        games, reason = games_until_stop(PrecisionRule("win_rate", 0.05), 0.5)
+        assert 330 < games < 420
+        assert "win_rate" in reason
+
+    def test_unknown_metric(self):
+        """Test that an unknown metric is rejected"""
+        with pytest.raises(ValueError):
+            PrecisionRule("tiles", 1)
+
+
+class TestSprtRule:
+    """Test the sequential probability ratio test"""
+
+    def test_accepts_the_true_hypothesis(self):
+        """Test both outcomes of the test"""
+        rule = SprtRule("win_rate", 0.5, 0.15)
+        _, reason = games_until_stop(rule, 0.65)
+        assert "= 0.65 over 0.5" in reason
+        _, reason = games_until_stop(rule, 0.5)
+        assert "= 0.5 over 0.65" in reason
+
+    def test_fewer_games_than_fixed_sample(self):
+        """Test that a clear difference is found early"""
+        games, reason = games_until_stop(SprtRule("win_rate", 0.2, 0.3), 0.6)
+        assert reason is not None and games < 100
+
+    def test_score_metric(self):
+        """Test the normal approximation for a mean"""
+        rule = SprtRule("score", 990, 10, min_games=10)
+        assert "= 1000 over 990" in rule.check(summary_of(0, 200, score=997))
+
+    def test_invalid_arguments(self):
+        """Test that a zero delta or impossible win rates are rejected"""
+        with pytest.raises(ValueError):
+            SprtRule("win_rate", 0.5, 0)
+        with pytest.raises(ValueError):
+            SprtRule("win_rate", 0.95, 0.1)
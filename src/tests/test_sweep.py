@@ -0,0 +1,127 @@
+"""Tests for the parameter sweep"""
+
+from collections import deque
+from unittest.mock import patch
+import pytest
+from measure import game_seed
+from sweep import (CostModel, grid_cells, iter_scheduled_games, parse_args,
+                   prior_cost, run_sweep)
+
+
+def fake_game(cost_by_depth, played):
+    """play_seeded_game stand-in recording (seed, depth)"""
+    def play(seed, algorithm, depth, _options):
+        played.append((seed, depth))
+        return {'moves': 10, 'score': 100 * depth, 'max_tile': 16,
+                'won': False, 'seed': seed, 'algorithm': algorithm,
+                'cpu_seconds': cost_by_depth[depth]}
+    return play
+
+
+class TestGrid:
+    """Test building the cells"""
+
+    def test_product_without_duplicates(self):
+        """Test that settings that do not apply give one cell"""
+        cells = grid_cells(["depth_one", "expectiminimax"], [2, 3],
+                           times_per_move=[None, 50])
+        assert [cell['label'] for cell in cells] == [
+            "depth_one 1", "expectiminimax 2",
+            "expectiminimax 2 --time-per-move 50", "expectiminimax 3"]
+
+    def test_command_line(self):
+        """Test the axes and the cache switch"""
+        args = parse_args(["5", "--depths", "2", "3", "--engines", "recursive",
+                           "batched", "--no-cache"])
+        assert len(args.cells) == 4
+        assert args.cache is None
+        assert args.cells[1]['options']['engine'] == "batched"
+
+    def test_weights_axis(self):
+        """Test that every weight set is a cell of its own"""
+        args = parse_args(["5", "--weights", "1,0,0,0,0,0", "0,1,0,0,0,0"])
+        assert [cell['label'] for cell in args.cells] == [
+            "expectiminimax 3 --weights 1,0,0,0,0,0",
+            "expectiminimax 3 --weights 0,1,0,0,0,0"]
+        assert args.cells[1]['options']['weights'] == (0, 1, 0, 0, 0, 0)
+
+
+class TestCostModel:
+    """Test the per game cost estimates"""
+
+    def test_prior_grows_with_depth(self):
+        """Test that deeper cells are guessed to cost more"""
+        cells = grid_cells(depths=[2, 4])
+        assert prior_cost(cells[1]) > 10 * prior_cost(cells[0])
+
+    def test_measured_cells_rescale_the_guesses(self):
+        """Test that finished games correct the other cells too"""
+        cells = grid_cells(depths=[2, 3])
+        costs = CostModel(cells)
+        labels = [cell['label'] for cell in cells]
+        costs.add(labels[0], 2 * costs.prior[labels[0]])
+        assert costs.estimate(labels[0]) == 2 * costs.prior[labels[0]]
+        assert costs.estimate(labels[1]) == pytest.approx(2 * costs.prior[labels[1]])
+
+
+class TestScheduling:
+    """Test the longest first order"""
+
+    def test_most_expensive_cell_first(self):
+        """Test that estimates from finished games change the order"""
+        cells = {cell['label']: cell for cell in grid_cells(depths=[2, 3])}
+        costs = CostModel(cells.values())
+        queues = {label: deque([1, 2, 3]) for label in cells}
+        costs.add("expectiminimax 2", 1.0)
+        played = []
+        # Depth 3 is guessed dearer, but its first game shows it is cheap
+        with patch('sweep.play_seeded_game', fake_game({2: 1.0, 3: 1e-6}, played)):
+            for result in iter_scheduled_games(queues, cells, costs):
+                costs.add(result['cell'], result['cpu_seconds'])
+        assert [depth for _, depth in played] == [3, 2, 2, 2, 3, 3]
+
+
+class TestSweep:
+    """Test running and resuming a sweep"""
+
+    @patch('builtins.print')
+    def test_cache_resumes_the_sweep(self, mock_print, tmp_path):
+        """Test that a rerun only plays the missing games"""
+        cache = str(tmp_path / "sweep.jsonl")
+        played = []
+        with patch('sweep.play_seeded_game', fake_game({2: 0.1, 3: 0.2}, played)):
+            run_sweep(grid_cells(depths=[2]), 2, cache=cache)
+            played.clear()
+            summaries = run_sweep(grid_cells(depths=[2, 3]), 3, cache=cache)
+        assert sorted(played) == sorted([(game_seed(0, 2), 2)] + [
+            (game_seed(0, i), 3) for i in range(3)])
+        assert [summary.games for summary in summaries.values()] == [3, 3]
+        output = '\n'.join(str(call[0][0]) for call in mock_print.call_args_list
+                           if call[0])
+        assert "Cache: 2 games read" in output
+        assert "SWEEP RESULTS" in output
+        with pytest.raises(ValueError, match="seed"):
+            run_sweep(grid_cells(depths=[2]), 2, seed=1, cache=cache)
+
+    @patch('builtins.print')
+    def test_cache_of_other_weights(self, _, tmp_path):
+        """Test that a cache written with other evaluation weights is refused"""
+        cache = str(tmp_path / "sweep.jsonl")
+        with patch('sweep.play_seeded_game', fake_game({2: 0.1}, [])):
+            run_sweep(grid_cells(depths=[2]), 1, cache=cache)
+            with patch('evaluation.EMPTY_WEIGHT', 0.5):
+                with pytest.raises(ValueError, match="evaluation settings"):
+                    run_sweep(grid_cells(depths=[2]), 1, cache=cache)
+
+    @patch('builtins.print')
+    def test_weights_share_the_cache(self, _, tmp_path):
+        """Test that cells of other weights are cached by their labels"""
+        cache = str(tmp_path / "sweep.jsonl")
+        played = []
+        cells = grid_cells(depths=[2], weights=[None, (1, 0, 0, 0, 0, 0)])
+        with patch('sweep.play_seeded_game', fake_game({2: 0.1}, played)):
+            run_sweep(cells[1:], 2, cache=cache)
+            played.clear()
+            summaries = run_sweep(cells, 2, cache=cache)
+        assert len(played) == 2
+        assert [summary.games for summary in summaries.values()] == [2, 2]
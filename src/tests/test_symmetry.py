@@ -0,0 +1,106 @@
+"""Tests for board symmetries and canonical forms"""
+
+import random
+import pytest
+from algorithms.expectiminimax import score_root_moves, DIRECTIONS
+from algorithms.search_context import SearchContext
+from algorithms.transposition import TranspositionTable
+from bitboard import to_bitboard, to_board, move, transpose, UP, DOWN, LEFT, RIGHT
+from evaluation import evaluate_board
+from evaluation_tables import evaluate_with_tables
+from symmetry import (SYMMETRIES, EVALUATION_SYMMETRIES, ALL_SYMMETRIES,
+                      flip_horizontal, flip_vertical, canonical_form,
+                      canonical_key, transform_move, restore_move)
+from tests.helpers import BOARD, make_game
+
+
+def random_bitboards(seed, count):
+    """Random bitboards with some empty cells"""
+    rng = random.Random(seed)
+    return [to_bitboard([[(1 << rng.randint(1, 11)) if rng.random() < 0.6
+                          else 0 for _ in range(4)] for _ in range(4)])
+            for _ in range(count)]
+
+
+class TestTransforms:
+    """Test the board transforms and move relabelling"""
+
+    def test_flips(self):
+        """Test the reflections on a list board"""
+        bits = to_bitboard(BOARD)
+        assert to_board(flip_horizontal(bits)) == [row[::-1] for row in BOARD]
+        assert to_board(flip_vertical(bits)) == BOARD[::-1]
+
+    def test_moves_commute_with_transforms(self):
+        """Test that moving then transforming equals transforming then
+        making the relabelled move"""
+        for bits in random_bitboards(1, 50):
+            for name, (function, _) in SYMMETRIES.items():
+                for direction in (UP, DOWN, LEFT, RIGHT):
+                    assert function(move(bits, direction)[0]) == \
+                        move(function(bits), transform_move(direction, name))[0]
+
+    def test_restore_move(self):
+        """Test that restore_move undoes transform_move"""
+        for name in ALL_SYMMETRIES:
+            for direction in (UP, DOWN, LEFT, RIGHT):
+                assert restore_move(transform_move(direction, name), name) == \
+                    direction
+
+    def test_evaluation_symmetries(self):
+        """Test that evaluate_board is unchanged by the row keeping
+        reflections but not by transposition"""
+        for bits in random_bitboards(2, 50):
+            for name in EVALUATION_SYMMETRIES:
+                transformed = SYMMETRIES[name][0](bits)
+                assert evaluate_board(to_board(transformed)) == \
+                    pytest.approx(evaluate_board(to_board(bits)), abs=1e-12)
+        bits = to_bitboard(BOARD)
+        assert evaluate_board(to_board(transpose(bits))) != \
+            pytest.approx(evaluate_board(BOARD))
+
+
+class TestCanonicalForm:
+    """Test the canonical representatives"""
+
+    def test_symmetric_boards_share_a_form(self):
+        """Test that every transform of a board has the same canonical form"""
+        for bits in random_bitboards(3, 50):
+            for symmetries in (EVALUATION_SYMMETRIES, ALL_SYMMETRIES):
+                canonical, _ = canonical_form(bits, symmetries)
+                for name in symmetries:
+                    other = SYMMETRIES[name][0](bits)
+                    assert canonical_form(other, symmetries)[0] == canonical
+                assert canonical_key(bits, symmetries) == canonical
+
+    def test_move_back_to_the_real_board(self):
+        """Test mapping a move of the canonical board back"""
+        bits = to_bitboard(BOARD)
+        canonical, name = canonical_form(bits, ALL_SYMMETRIES)
+        for direction in (UP, DOWN, LEFT, RIGHT):
+            original = restore_move(direction, name)
+            assert SYMMETRIES[name][0](move(bits, original)[0]) == \
+                move(canonical, direction)[0]
+
+
+class TestSymmetricTable:
+    """Test the transposition table keyed by canonical boards"""
+
+    def test_mirrored_board_hits(self):
+        """Test that a mirrored board finds the stored value"""
+        table = TranspositionTable(max_entries=64,
+                                   symmetries=EVALUATION_SYMMETRIES)
+        bits = to_bitboard(BOARD)
+        table.store(bits, 2, True, 0.5)
+        assert table.lookup(flip_horizontal(bits), 2, True) == 0.5
+        assert table.lookup(transpose(bits), 2, True) is None
+
+    def test_search_values(self):
+        """Test that the root values match a search without a table"""
+        game = make_game()
+        scores = []
+        for table in (None, TranspositionTable(symmetries=EVALUATION_SYMMETRIES)):
+            context = SearchContext(table=table, evaluator=evaluate_with_tables)
+            context.root_depth = 3
+            scores.append(score_root_moves(game, 3, context, DIRECTIONS))
+        assert scores[1] == pytest.approx(scores[0], abs=1e-12)
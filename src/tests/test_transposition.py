@@ -0,0 +1,62 @@
+"""Tests for the transposition table"""
+
+from algorithms.transposition import TranspositionTable, ENTRY_BYTES
+
+
+class TestTranspositionTable:
+    """Test storing, replacing and counting"""
+
+    def test_lookup_after_store(self):
+        """Test that a stored value is found with the same key"""
+        table = TranspositionTable(max_entries=64)
+        table.store(0x1234, 3, True, 0.5)
+
+        assert table.lookup(0x1234, 3, True) == 0.5
+        assert table.stats()['hits'] == 1
+
+    def test_key_includes_depth_and_node_type(self):
+        """Test that depth and node type are part of the key"""
+        table = TranspositionTable(max_entries=64)
+        table.store(0x1234, 3, True, 0.5)
+
+        assert table.lookup(0x1234, 2, True) is None
+        assert table.lookup(0x1234, 3, False) is None
+        assert table.stats()['misses'] == 2
+
+    def test_deeper_results_are_preferred(self):
+        """Test that a shallow store does not replace a deep entry"""
+        table = TranspositionTable(max_entries=4)
+        # Two buckets: fill one bucket with colliding keys
+        keys = [key for key in range(1, 200)
+                if table._index(key << 1) == table._index(2 << 1)][:3]  # pylint: disable=protected-access
+        table.store(keys[0], 5, False, 1.0)
+        table.store(keys[1], 1, False, 2.0)
+        table.store(keys[2], 1, False, 3.0)
+
+        assert table.lookup(keys[0], 5, False) == 1.0
+        assert table.lookup(keys[1], 1, False) is None
+        assert table.lookup(keys[2], 1, False) == 3.0
+        assert table.stats()['evictions'] == 1
+
+    def test_size_bounds(self):
+        """Test that the table never holds more than max_entries"""
+        table = TranspositionTable(max_entries=16)
+        for key in range(1000):
+            table.store(key, 1, True, float(key))
+
+        assert len(table) <= 16
+        assert table.stats()['stores'] == 1000
+
+    def test_memory_cap(self):
+        """Test that max_bytes limits the entry count"""
+        table = TranspositionTable(max_bytes=ENTRY_BYTES * 64)
+        assert table.bucket_count * 2 <= 64
+
+    def test_clear(self):
+        """Test that clear drops all entries"""
+        table = TranspositionTable(max_entries=64)
+        table.store(1, 1, True, 1.0)
+        table.clear()
+
+        assert len(table) == 0
+        assert table.lookup(1, 1, True) is None
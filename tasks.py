@@ -25,12 +25,64 @@ def autopep(c):
 
 
 @task
-def play(c, algorithm="expectiminimax", depth=3):
+def play(c, algorithm="expectiminimax", depth=3, options=""):
     """
-    Run the play_game.py file
+    Run the play_game.py file, options are passed on as they are
     Example: invoke play --algorithm=expectiminimax --depth=4
+    Example: invoke play --options="--time-per-move 50"
+    Example: invoke play --depth=3 --options="--depth-policy empty"
+    Example: invoke play --depth=4 --options="--engine batched"
+    Example: invoke play --depth=4 --options="--position-cache positions.cache"
+    Example: invoke play --options="--seed 42"
     """
-    c.run(f"python src/play_game.py {algorithm} {depth}")
+    c.run(f"python src/play_game.py {algorithm} {depth} {options}".strip())
+
+
+@task
+def worker(c, connect, workers=None):
+    """
+    Play games for a measure coordinator on another machine
+    Example: invoke worker --connect=192.168.1.10:50700 --workers=8
+    """
+    options = f" --workers {workers}" if workers else ""
+    c.run(f"python src/measure.py --connect {connect}{options}", pty=True)
+
+
+@task
+def compare(c, games=100, a="expectiminimax 3", b="expectiminimax 4",
+            workers=None, seed=None):
+    """
+    Play two configurations on the same seeds and compare them
+    Example: invoke compare --games=200 --a="expectiminimax 3" --b="expectiminimax 4"
+    Example: invoke compare --a="expectiminimax 3" --b="expectiminimax 3 --engine batched"
+    """
+    options = ""
+    if workers:
+        options += f" --workers {workers}"
+    if seed is not None:
+        options += f" --seed {seed}"
+    c.run(f'python src/compare.py {games} "{a}" "{b}"{options}', pty=True)
+
+
+@task
+def sweep(c, games=20, options=""):
+    """
+    Measure every combination of settings, see src/sweep.py
+    Example: invoke sweep --games=50 --options="--depths 2 3 4 --workers 4"
+    Example: invoke sweep --options="--min-probabilities 0.0001 0.001 0.01"
+    """
+    c.run(f"python src/sweep.py {games} {options}".strip(), pty=True)
+
+
+@task
+def benchmark(c, name="allocations", options=""):
+    """
+    Run a benchmark from src/benchmarks
+    Example: invoke benchmark --name=allocations
+    Example: invoke benchmark --name=suite --options="--save-baseline"
+    """
+    c.run(f"python -m benchmarks.{name} {options}".strip(),
+          env={"PYTHONPATH": "src"})
 
 
 @task
@@ -40,10 +92,24 @@ def run(c, file):
 
 
 @task
-def measure(c, games=100, algorithm="expectiminimax", depth=3):
+def measure(c, games=100, algorithm="expectiminimax", depth=3, options=""):
     """
-    Run game analysis with specified parameters.
+    Run game analysis, options are passed on to src/measure.py as they are
 
     Example: invoke measure --games=500 --algorithm=expectiminimax --depth=4
+    Example: invoke measure --games=100 --options="--time-per-move 20"
+    Example: invoke measure --games=100 --options="--depth-policy distinct"
+    Example: invoke measure --games=500 --options="--workers 8 --seed 42"
+    Example: invoke measure --games=100 --depth=4 --options="--engine batched"
+    Example: invoke measure --games=100 --options="--position-cache positions.cache"
+    Example: invoke measure --games=100 --options="--workers 4 --table shared"
+    Example: invoke measure --games=10 --options="--stats"
+    Example: invoke measure --games=20 --options="--latency --latency-dump latency.json"
+    Example: invoke measure --games=100000 --options="--output results.jsonl"
+    Example: invoke measure --games=2000 --options="--metric score --precision 100"
+    Example: invoke measure --games=2000 --options="--baseline 0.6 --delta 0.05"
+    Example: invoke measure --games=2000 --depth=4 --options="--checkpoint d4.log --resume"
+    Example: invoke measure --games=2000 --depth=4 --options="--listen 0.0.0.0:50700"
     """
-    c.run(f"python src/measure.py {games} {algorithm} {depth}", pty=True)
+    c.run(f"python src/measure.py {games} {algorithm} {depth} {options}".strip(),
+          pty=True)